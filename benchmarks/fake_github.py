@@ -0,0 +1,438 @@
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import random
+import re
+import tarfile
+import threading
+import urllib.request
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.ingestion.cache import git_blob_sha
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class RepoShape:
+    name: str = "bench/repo"
+    files: int = 200
+    depth: int = 3
+    fanout: int = 4
+    file_size: int = 2048
+    commits: int = 50
+    # Share of files the crawler filters out by extension (images, binaries)
+    skipped_ratio: float = 0.1
+    # GitHub truncates recursive listings past this many entries
+    max_tree_entries: int = 100_000
+    seed: int = 0
+
+
+class SyntheticRepo:
+    def __init__(self, shape: RepoShape):
+        self.shape = shape
+        rng = random.Random(shape.seed)
+        self.files: dict[str, bytes] = {}
+        for i in range(shape.files):
+            levels = rng.randint(0, shape.depth)
+            directory = "/".join(f"pkg{rng.randrange(shape.fanout)}" for _ in range(levels))
+            skipped = rng.random() < shape.skipped_ratio
+            name = f"asset_{i}.png" if skipped else f"module_{i}.py"
+            path = f"{directory}/{name}" if directory else name
+            self.files[path] = self._content(rng, i, shape.file_size, skipped)
+
+        self.blobs = {git_blob_sha(data): data for data in self.files.values()}
+        self.head_sha = hashlib.sha1(f"{shape.name}:{shape.seed}".encode()).hexdigest()
+        self.commit_shas = [
+            hashlib.sha1(f"{self.head_sha}:{i}".encode()).hexdigest()
+            for i in range(max(shape.commits, 1))
+        ]
+        # Each file was last touched by one commit, newest commits first
+        self.last_commit = {
+            path: rng.randrange(len(self.commit_shas)) for path in self.files
+        }
+        self._dirs = self._directories()
+        self._archive: bytes | None = None
+
+    @staticmethod
+    def _content(rng: random.Random, i: int, size: int, binary: bool) -> bytes:
+        if binary:
+            return bytes(rng.randrange(256) for _ in range(min(size, 256)))
+        lines = []
+        while sum(len(line) + 1 for line in lines) < size:
+            n = len(lines)
+            lines.append(f"def function_{i}_{n}(value_{n}):\n    return value_{n} * {n}\n")
+        return "\n".join(lines).encode("utf-8")[:size]
+
+    def commit_date(self, index: int) -> datetime:
+        return EPOCH - timedelta(hours=index)
+
+    def tree_sha(self, prefix: str) -> str:
+        if not prefix:
+            return self.head_sha
+        return hashlib.sha1(f"{self.head_sha}:{prefix}".encode()).hexdigest()
+
+    def _directories(self) -> dict[str, str]:
+        dirs = {self.head_sha: ""}
+        for path in self.files:
+            parts = path.split("/")[:-1]
+            for depth in range(1, len(parts) + 1):
+                prefix = "/".join(parts[:depth]) + "/"
+                dirs[self.tree_sha(prefix)] = prefix
+        return dirs
+
+    def tree(self, sha: str, recursive: bool) -> dict | None:
+        prefix = self._dirs.get(sha)
+        if prefix is None:
+            return None
+        entries: dict[str, dict] = {}
+        for path, data in self.files.items():
+            if not path.startswith(prefix):
+                continue
+            rest = path[len(prefix) :]
+            if recursive:
+                parts = rest.split("/")
+                for depth in range(1, len(parts)):
+                    sub = "/".join(parts[:depth])
+                    entries[sub] = self._tree_entry(sub, prefix + sub + "/")
+                entries[rest] = self._blob_entry(rest, data)
+            elif "/" in rest:
+                sub = rest.split("/", 1)[0]
+                entries[sub] = self._tree_entry(sub, prefix + sub + "/")
+            else:
+                entries[rest] = self._blob_entry(rest, data)
+
+        listing = sorted(entries.values(), key=lambda e: e["path"])
+        truncated = len(listing) > self.shape.max_tree_entries
+        return {
+            "sha": sha,
+            "tree": listing[: self.shape.max_tree_entries],
+            "truncated": truncated,
+        }
+
+    def _tree_entry(self, path: str, prefix: str) -> dict:
+        return {"path": path, "mode": "040000", "type": "tree", "sha": self.tree_sha(prefix)}
+
+    @staticmethod
+    def _blob_entry(path: str, data: bytes) -> dict:
+        return {
+            "path": path,
+            "mode": "100644",
+            "type": "blob",
+            "sha": git_blob_sha(data),
+            "size": len(data),
+        }
+
+    def archive(self) -> bytes:
+        if self._archive is None:
+            owner, _, name = self.shape.name.partition("/")
+            root = f"{owner}-{name}-{self.head_sha[:7]}"
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+                for path, data in self.files.items():
+                    info = tarfile.TarInfo(f"{root}/{path}")
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+            self._archive = buffer.getvalue()
+        return self._archive
+
+
+class FakeGitHub:
+    # Serves the REST and GraphQL endpoints the crawler uses for a set of
+    # synthetic repos, counting calls and bytes per endpoint
+    ROUTES = [
+        ("user", re.compile(r"^/user$")),
+        ("user_repos", re.compile(r"^/user/repos$")),
+        ("repo", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)$")),
+        ("branch", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/branches/(?P<branch>[^/]+)$")),
+        ("tree", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/git/trees/(?P<sha>[^/]+)$")),
+        ("blob", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/git/blobs/(?P<sha>[^/]+)$")),
+        ("commits", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/commits$")),
+        ("commit", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/commits/(?P<sha>[^/]+)$")),
+        ("languages", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/languages$")),
+        ("tarball", re.compile(r"^/repos/(?P<repo>[^/]+/[^/]+)/tarball(?:/(?P<ref>.+))?$")),
+        ("codeload", re.compile(r"^/_codeload/(?P<repo>[^/]+/[^/]+)$")),
+        ("graphql", re.compile(r"^/graphql$")),
+    ]
+
+    def __init__(self, shapes: list[RepoShape]):
+        self.repos = {shape.name: SyntheticRepo(shape) for shape in shapes}
+        self.calls: Counter[str] = Counter()
+        self.bytes_sent: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever(poll_interval=0.05)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "api_calls": sum(self.calls.values()),
+                "bytes_sent": sum(self.bytes_sent.values()),
+                "calls_by_endpoint": dict(self.calls),
+                "bytes_by_endpoint": dict(self.bytes_sent),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent.clear()
+
+    def handle(self, method: str, target: str, body: bytes) -> tuple[str, int, dict, bytes]:
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        for endpoint, pattern in self.ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                params = match.groupdict()
+                repo = None
+                if "repo" in params:
+                    repo = self.repos.get(params.pop("repo"))
+                    if repo is None:
+                        break
+                status, headers, payload = getattr(self, f"_{endpoint}")(
+                    repo, query=query, body=body, **params
+                )
+                return endpoint, status, headers, payload
+        return "unknown", 404, {}, _json({"message": "Not Found"})
+
+    def _user(self, repo, **_):
+        return 200, {}, _json({"login": "bench", "id": 1, "type": "User"})
+
+    def _user_repos(self, repo, query, **_):
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        names = sorted(self.repos)
+        page_names = names[(page - 1) * per_page : page * per_page]
+        items = [self._repo_json(self.repos[n]) for n in page_names]
+        headers = {}
+        if page * per_page < len(names):
+            next_url = f"{self.url}/user/repos?per_page={per_page}&page={page + 1}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return 200, headers, _json(items)
+
+    def _repo(self, repo, **_):
+        return 200, {}, _json(self._repo_json(repo))
+
+    def _branch(self, repo, branch, **_):
+        commit = {"sha": repo.head_sha, "url": self._commit_url(repo, repo.head_sha)}
+        return 200, {}, _json({"name": branch, "commit": commit})
+
+    def _tree(self, repo, sha, query, **_):
+        tree = repo.tree(sha, recursive=query.get("recursive") in ("1", "true"))
+        if tree is None:
+            return 404, {}, _json({"message": "Not Found"})
+        return 200, {}, _json(tree)
+
+    def _blob(self, repo, sha, **_):
+        data = repo.blobs.get(sha)
+        if data is None:
+            return 404, {}, _json({"message": "Not Found"})
+        return 200, {}, _json(
+            {
+                "sha": sha,
+                "size": len(data),
+                "encoding": "base64",
+                "content": base64.b64encode(data).decode("ascii"),
+            }
+        )
+
+    def _commits(self, repo, query, **_):
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        shas = repo.commit_shas[(page - 1) * per_page : page * per_page]
+        start = (page - 1) * per_page
+        items = [self._commit_json(repo, start + i, files=False) for i in range(len(shas))]
+        headers = {}
+        pages = -(-len(repo.commit_shas) // per_page)
+        base = f"{self.url}/repos/{repo.shape.name}/commits?per_page={per_page}"
+        links = [f'<{base}&page={pages}>; rel="last"']
+        if page < pages:
+            links.insert(0, f'<{base}&page={page + 1}>; rel="next"')
+        headers["Link"] = ", ".join(links)
+        return 200, headers, _json(items)
+
+    def _commit(self, repo, sha, **_):
+        if sha not in repo.commit_shas:
+            return 404, {}, _json({"message": "Not Found"})
+        return 200, {}, _json(self._commit_json(repo, repo.commit_shas.index(sha), files=True))
+
+    def _languages(self, repo, **_):
+        return 200, {}, _json({"Python": sum(len(d) for d in repo.files.values())})
+
+    def _tarball(self, repo, ref=None, **_):
+        return 302, {"Location": f"{self.url}/_codeload/{repo.shape.name}"}, b""
+
+    def _codeload(self, repo, **_):
+        return 200, {"Content-Type": "application/x-gzip"}, repo.archive()
+
+    def _graphql(self, repo, body, **_):
+        request = json.loads(body or b"{}")
+        query, variables = request.get("query", ""), request.get("variables") or {}
+        if "object(expression" in query:
+            target = self.repos.get(f"{variables['owner']}/{variables['name']}")
+            commit = {}
+            for key, path in variables.items():
+                if not key.startswith("p") or target is None or path not in target.last_commit:
+                    continue
+                date = target.commit_date(target.last_commit[path]).isoformat()
+                commit[f"f{key[1:]}"] = {"nodes": [{"author": {"date": date}}]}
+            return 200, {}, _json({"data": {"repository": {"object": commit} if target else None}})
+
+        data = {}
+        for key, owner in variables.items():
+            if not key.startswith("o"):
+                continue
+            i = key[1:]
+            target = self.repos.get(f"{owner}/{variables[f'n{i}']}")
+            if target is None:
+                data[f"r{i}"] = None
+                continue
+            size = sum(map(len, target.files.values()))
+            history = {"totalCount": len(target.commit_shas)}
+            data[f"r{i}"] = {
+                "languages": {"edges": [{"size": size, "node": {"name": "Python"}}]},
+                "defaultBranchRef": {"target": {"history": history}},
+            }
+        return 200, {}, _json({"data": data})
+
+    def _repo_json(self, repo: SyntheticRepo) -> dict:
+        owner, _, name = repo.shape.name.partition("/")
+        return {
+            "id": abs(hash(repo.shape.name)) % 10**8,
+            "name": name,
+            "full_name": repo.shape.name,
+            "owner": {"login": owner},
+            "private": False,
+            "html_url": f"https://github.com/{repo.shape.name}",
+            "url": f"{self.url}/repos/{repo.shape.name}",
+            "description": f"Synthetic repo with {repo.shape.files} files",
+            "default_branch": "main",
+            "topics": ["benchmark"],
+            "created_at": "2020-01-01T00:00:00Z",
+            "updated_at": EPOCH.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+    def _commit_url(self, repo: SyntheticRepo, sha: str) -> str:
+        return f"{self.url}/repos/{repo.shape.name}/commits/{sha}"
+
+    def _commit_json(self, repo: SyntheticRepo, index: int, files: bool) -> dict:
+        sha = repo.commit_shas[index]
+        date = repo.commit_date(index).strftime("%Y-%m-%dT%H:%M:%SZ")
+        commit = {
+            "sha": sha,
+            "url": self._commit_url(repo, sha),
+            "commit": {
+                "author": {"name": "bench", "email": "bench@example.com", "date": date},
+                "committer": {"name": "bench", "email": "bench@example.com", "date": date},
+                "message": f"Commit {index}",
+            },
+        }
+        if files:
+            commit["files"] = [
+                {"filename": path, "status": "modified"}
+                for path, last in repo.last_commit.items()
+                if last == index
+            ]
+        return commit
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; with Nagle on, each
+            # keep-alive response stalls on the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if self.path.startswith("/_stats"):
+                    endpoint, status, headers, payload = None, 200, {}, _json(fake.stats())
+                elif self.path.startswith("/_reset"):
+                    fake.reset()
+                    endpoint, status, headers, payload = None, 200, {}, b"{}"
+                else:
+                    endpoint, status, headers, payload = fake.handle(
+                        self.command, self.path, body
+                    )
+
+                self.send_response(status)
+                headers.setdefault("Content-Type", "application/json")
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                if endpoint:
+                    with fake._lock:
+                        fake.calls[endpoint] += 1
+                        fake.bytes_sent[endpoint] += len(payload)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _json(value) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def _serve(shapes: list[dict], conn) -> None:
+    fake = FakeGitHub([RepoShape(**shape) for shape in shapes])
+    conn.send(fake.url)
+    conn.close()
+    fake.serve_forever()
+
+
+class FakeGitHubProcess:
+    # Runs FakeGitHub in a child process so its allocations and CPU time
+    # stay out of the crawler's measurements
+    def __init__(self, shapes: list[RepoShape]):
+        self.shapes = shapes
+        self.url: str | None = None
+        self._process: multiprocessing.Process | None = None
+
+    def start(self) -> "FakeGitHubProcess":
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=([asdict(s) for s in self.shapes], child), daemon=True
+        )
+        self._process.start()
+        self.url = parent.recv()
+        return self
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.url}/_stats") as response:
+            return json.loads(response.read())
+
+    def reset(self) -> None:
+        urllib.request.urlopen(f"{self.url}/_reset").close()
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
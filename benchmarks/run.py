@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.fake_github import FakeGitHubProcess, RepoShape
+from src.ingestion.cache import RepoCache
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.rate_limit import RateLimitScheduler
+from src.ingestion.repo_crawler import RepoCrawler
+
+logger = logging.getLogger(__name__)
+
+# Lower is better for every compared metric
+COMPARED_METRICS = [
+    ("cold", "wall_seconds"),
+    ("cold", "api_calls"),
+    ("cold", "bytes"),
+    ("warm", "wall_seconds"),
+    ("warm", "api_calls"),
+    ("cache", "save_seconds"),
+    ("cache", "load_seconds"),
+    ("memory", "peak_bytes"),
+]
+
+
+def make_client(url: str, max_workers: int) -> GitHubClient:
+    # The fake server has no rate limit, pacing would only add noise
+    scheduler = RateLimitScheduler(requests_per_second=1e9, burst=10**9)
+    return GitHubClient(
+        token="benchmark", base_url=url, pool_size=max_workers, scheduler=scheduler
+    )
+
+
+def crawl(client: GitHubClient, cache_dir: Path, mode: str, max_workers: int) -> int:
+    with RepoCrawler(
+        client, use_cache=True, mode=mode, max_workers=max_workers, cache_dir=cache_dir
+    ) as crawler:
+        return sum(1 for _ in crawler.iter_all_repos())
+
+
+def measure_crawl(
+    server: FakeGitHubProcess, cache_dir: Path, mode: str, max_workers: int
+) -> dict:
+    client = make_client(server.url, max_workers)
+    try:
+        server.reset()
+        started = time.perf_counter()
+        files = crawl(client, cache_dir, mode, max_workers)
+        wall = time.perf_counter() - started
+    finally:
+        client.close()
+
+    stats = server.stats()
+    return {
+        "wall_seconds": wall,
+        "files": files,
+        "api_calls": stats["api_calls"],
+        "bytes": stats["bytes_sent"],
+        "calls_by_endpoint": stats["calls_by_endpoint"],
+    }
+
+
+def measure_peak_memory(server: FakeGitHubProcess, mode: str, max_workers: int) -> dict:
+    # Separate cold run, tracemalloc slows the crawl too much to time it
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(server.url, max_workers)
+        tracemalloc.start()
+        try:
+            crawl(client, Path(tmp), mode, max_workers)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            client.close()
+    return {"peak_bytes": peak}
+
+
+def measure_cache(cache_dir: Path, repo_names: list[str]) -> dict:
+    # Round-trips the crawled snapshots through a fresh cache
+    source = RepoCache(cache_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        target = RepoCache(Path(tmp))
+        save_seconds = load_seconds = 0.0
+        for name in repo_names:
+            snapshot = source.load_snapshot(name)
+            files = list(source.iter_files(name))
+
+            started = time.perf_counter()
+            target.save(name, files, snapshot.metadata, commit_sha=snapshot.commit_sha)
+            save_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            sum(len(f.content) for f in target.iter_files(name))
+            load_seconds += time.perf_counter() - started
+        target.close()
+    source.close()
+    return {"save_seconds": save_seconds, "load_seconds": load_seconds}
+
+
+def run_suite(
+    shape: RepoShape,
+    repos: int = 1,
+    modes: tuple[str, ...] = ("tree", "archive"),
+    workers: tuple[int, ...] = (1, 8),
+    memory: bool = True,
+) -> dict:
+    shapes = [replace(shape, name=f"bench/repo{i}", seed=shape.seed + i) for i in range(repos)]
+    results = []
+    with FakeGitHubProcess(shapes) as server:
+        for mode in modes:
+            for max_workers in workers:
+                name = f"{mode}-w{max_workers}"
+                logger.info(f"Running {name}")
+                with tempfile.TemporaryDirectory() as tmp:
+                    cache_dir = Path(tmp)
+                    result = {
+                        "scenario": name,
+                        "mode": mode,
+                        "max_workers": max_workers,
+                        "cold": measure_crawl(server, cache_dir, mode, max_workers),
+                        "warm": measure_crawl(server, cache_dir, mode, max_workers),
+                        "cache": measure_cache(cache_dir, [s.name for s in shapes]),
+                    }
+                if memory:
+                    result["memory"] = measure_peak_memory(server, mode, max_workers)
+                results.append(result)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repos": repos,
+            "shape": asdict(shape),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    # Returns one line per metric that got worse by more than threshold
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        for group, metric in COMPARED_METRICS:
+            new = result.get(group, {}).get(metric)
+            old = before.get(group, {}).get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(
+                    f"{result['scenario']} {group}.{metric}: {old:.4g} -> {new:.4g} "
+                    f"(+{change:.0%})"
+                )
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmarks")
+    parser.add_argument("--repos", type=int, default=1)
+    parser.add_argument("--files", type=int, default=RepoShape.files)
+    parser.add_argument("--depth", type=int, default=RepoShape.depth)
+    parser.add_argument("--file-size", type=int, default=RepoShape.file_size)
+    parser.add_argument("--commits", type=int, default=RepoShape.commits)
+    parser.add_argument("--modes", nargs="+", default=["tree", "archive"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run")
+    parser.add_argument("--output", type=Path, help="Write results as JSON here")
+    parser.add_argument("--compare", type=Path, help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    shape = RepoShape(
+        files=args.files, depth=args.depth, file_size=args.file_size, commits=args.commits
+    )
+    results = run_suite(
+        shape,
+        repos=args.repos,
+        modes=tuple(args.modes),
+        workers=tuple(args.workers),
+        memory=not args.no_memory,
+    )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        for line in regressions:
+            logger.warning(f"Regression: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
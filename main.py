@@ -1,13 +1,25 @@
+import json
 import logging
 import os
+from pathlib import Path
 
 import dotenv
-from tree_sitter_language_pack import get_parser
 from rich.logging import RichHandler
 from rich import print
 
 
-from src.ingestion import GitHubClient, RepoCrawler
+from src.indexing import (
+    EmbeddingCache,
+    EmbeddingStage,
+    HashingEmbedder,
+    LexicalIndex,
+    VectorIndex,
+)
+from src.ingestion import Chunker, GitHubClient, RepoCrawler
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.http_cache import HttpCache
+from src.metrics import REGISTRY, stage_throughput
+from src.pipeline import Checkpoint, IngestPipeline
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,86 +28,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+METRICS_DIR = Path(".cache/metrics")
+
 
 def main():
     dotenv.load_dotenv()
 
     gh_token = os.getenv("GH_TOKEN")
 
-    with GitHubClient(token=gh_token) as gh_client:
+    with GitHubClient(token=gh_token, http_cache=HttpCache()) as gh_client:
         logger.info(f"Authenticated as {gh_client.username}")
 
         crawler = RepoCrawler(client=gh_client, use_cache=True)
 
-        all_repos = gh_client.get_repos()
         # repo_names  = ["misobalogh/rudu", "misobalogh/utilities"]
         # repo_names  = ["misobalogh/utilities"]
         repo_names  = ["misobalogh/rudu"]
-        repos = []
-        files = []
-        for repo in all_repos:
-            if repo.full_name in repo_names:
-                repo_metadata = gh_client.get_repo_metadata(repo)
-                repos.append(repo_metadata)
-                files.extend(crawler.crawl_repo(repo))
-
-        # files, repos = crawler.crawl_all_repos(include_private=True, max_repos=3)
-
-        logger.info(f"Crawled {len(repos)} repositories.")
-        logger.info(f"Downloaded {len(files)} files.")
-
+        selected = gh_client.get_repos_by_name(repo_names)
+        repos = gh_client.get_repos_metadata(
+            selected, fields=("languages", "total_commits")
+        )
+        logger.info(f"Crawling {len(repos)} repositories.")
         for repo in repos:
             logger.info(
                 f"  - {repo.name}: {repo.total_commits} commits, "
                 f"languages: {list(repo.languages.keys())}"
             )
 
+        embedding_stage = EmbeddingStage(HashingEmbedder(), cache=EmbeddingCache())
+        vector_index = VectorIndex(dim=embedding_stage.embedder.dim)
+        with LexicalIndex() as lexical_index:
+            chunk_cache = ChunkCache()
+            pipeline = IngestPipeline(
+                crawler,
+                Chunker(),
+                chunk_cache,
+                embedding_stage,
+                vector_index,
+                lexical_index,
+                checkpoint=Checkpoint(),
+            )
+            try:
+                stats = pipeline.run(selected)
+            except KeyboardInterrupt:
+                logger.warning("Interrupted, run again to resume from the checkpoint")
+                return
 
-        rust_parser = get_parser("rust")
-
-
-        def extract_python_chunks(root, source_code: str):
-            chunks = []
-            for child in root.children:
-                if child.type in ("function_definition", "class_definition"):
-                    start_byte = child.start_byte
-                    end_byte = child.end_byte
-                    chunk_text = source_code[start_byte:end_byte]
-                    chunks.append((child.type, chunk_text))
-            return chunks
-
+            logger.info(
+                f"Indexed {stats.files} files into {stats.chunks} chunks "
+                f"({stats.resumed} already indexed, {chunk_cache.hits} cached, "
+                f"{chunk_cache.misses} parsed)."
+            )
+            embedding_stage.log_stats()
 
-        def extract_rust_chunks(root, source_code: str):
-            chunks = []
-            for child in root.children:
-                if child.type in ("use_declaration", "line_comment"):
-                    start_byte = child.start_byte
-                    end_byte = child.end_byte
-                    chunk_text = source_code[start_byte:end_byte]
-                    chunks.append((child.type, chunk_text))
-            return chunks
+            vector_index.compact()
+            logger.info(f"Indexed {len(vector_index)} vectors in {vector_index.path}")
+            lexical_index.compact()
+            logger.info(
+                f"Indexed {len(lexical_index)} chunks, "
+                f"{lexical_index.vocabulary_size} terms in {lexical_index.path}"
+            )
 
+    write_metrics()
 
-        for file in files:
-            if file.language == "Rust":
-                tree = rust_parser.parse(file.content.encode("utf8"))
-                root = tree.root_node
-                logger.info(f"Parsed AST for {file.path} in {file.repo_name}")
-                logger.info(f"  - Root node type: {root.type}, children: {root.children}")
 
-                chunks = extract_rust_chunks(root, file.content)
-                for chunk_type, chunk_text in chunks:
-                    logger.info(f"Chunk type: {chunk_type}\n{chunk_text}\n")
+def write_metrics():
+    for stage, rate in stage_throughput().items():
+        logger.info(f"  - {stage}: {rate:.0f} items/s")
 
-            if file.language == "Python":
-                tree = rust_parser.parse(file.content.encode("utf8"))
-                root = tree.root_node
-                logger.info(f"Parsed AST for {file.path} in {file.repo_name}")
-                logger.info(f"  - Root node type: {root.type}, children: {root.children}")
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    (METRICS_DIR / "metrics.json").write_text(json.dumps(REGISTRY.snapshot(), indent=2))
+    (METRICS_DIR / "metrics.prom").write_text(REGISTRY.to_prometheus())
+    logger.info(f"Wrote metrics to {METRICS_DIR}")
 
-                chunks = extract_python_chunks(root, file.content)
-                for chunk_type, chunk_text in chunks:
-                    logger.info(f"Chunk type: {chunk_type}\n{chunk_text}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,18 @@
+from .doc_table import DocFilter, SearchHit
+from .embedder import EmbeddingStage, HashingEmbedder
+from .embedding_cache import EmbeddingCache
+from .hybrid import HybridRetriever, reciprocal_rank_fusion
+from .lexical_index import LexicalIndex
+from .vector_index import VectorIndex
+
+__all__ = [
+    "DocFilter",
+    "EmbeddingCache",
+    "EmbeddingStage",
+    "HashingEmbedder",
+    "HybridRetriever",
+    "LexicalIndex",
+    "SearchHit",
+    "VectorIndex",
+    "reciprocal_rank_fusion",
+]
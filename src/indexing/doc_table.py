@@ -0,0 +1,357 @@
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from src.ingestion.instrumentation import DEDUP_HITS
+from src.ingestion.models import Chunk
+
+# Fixed-width row per indexed chunk; strings are interned into StringTable.
+# repo and path are the location the content was first indexed under, any
+# other file with the same blob is recorded in the LocationTable instead
+DOC_FIELDS = [
+    ("repo", "<u4"),
+    ("path", "<u4"),
+    ("blob", "<u4"),
+    ("language", "<u2"),
+    ("start_byte", "<u4"),
+    ("end_byte", "<u4"),
+    ("start_line", "<u4"),
+    ("end_line", "<u4"),
+    ("deleted", "u1"),
+]
+
+
+@dataclass
+class SearchHit:
+    row: int
+    score: float
+    repo_name: str
+    path: str
+    language: str | None
+    start_byte: int
+    end_byte: int
+    start_line: int
+    end_line: int
+    blob_sha: str | None = None
+    # Every (repo, path) holding this content, starting with the hit's own
+    locations: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def key(self) -> tuple:
+        # Identical content is one result, whichever location it came from
+        if self.blob_sha:
+            return (self.blob_sha, self.language, self.start_byte, self.end_byte)
+        return (self.repo_name, self.path, self.start_byte, self.end_byte)
+
+
+@dataclass(frozen=True)
+class DocFilter:
+    repo_name: str | None = None
+    language: str | None = None
+    path_prefix: str | None = None
+
+    def __bool__(self) -> bool:
+        return any((self.repo_name, self.language, self.path_prefix))
+
+    def mask(
+        self,
+        docs: np.ndarray,
+        strings: "StringTable",
+        locations: "LocationTable | None" = None,
+    ) -> np.ndarray | None:
+        # Boolean mask over doc rows, None when nothing is filtered. A row
+        # matches the repo and path filters through any of its locations
+        if not self:
+            return None
+        mask = np.ones(len(docs), dtype=bool)
+        if self.language is not None:
+            language_id = strings.lookup("languages", self.language)
+            mask &= docs["language"] == language_id if language_id is not None else False
+        if self.repo_name is None and not self.path_prefix:
+            return mask
+
+        at = np.ones(len(docs), dtype=bool)
+        repo_id = path_ids = None
+        if self.repo_name is not None:
+            repo_id = strings.lookup("repos", self.repo_name)
+            at &= docs["repo"] == repo_id if repo_id is not None else False
+        if self.path_prefix:
+            path_ids = [
+                i for i, path in enumerate(strings.values("paths"))
+                if path.startswith(self.path_prefix)
+            ]
+            at &= np.isin(docs["path"], path_ids)
+        if locations and (self.repo_name is None or repo_id is not None):
+            units = locations.units(repo_id, path_ids)
+            if units:
+                at |= np.isin(unit_keys(docs), [_pack(unit) for unit in units])
+        return mask & at
+
+    def matches(self, repo_name: str, path: str) -> bool:
+        return (self.repo_name is None or repo_name == self.repo_name) and (
+            not self.path_prefix or path.startswith(self.path_prefix)
+        )
+
+
+class StringTable:
+    TABLES = ("repos", "paths", "languages", "blobs")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._values: dict[str, list[str]] | None = None
+        self._ids: dict[str, dict[str, int]] | None = None
+
+    def values(self, table: str) -> list[str]:
+        return self._load()[table]
+
+    def lookup(self, table: str, value: str) -> int | None:
+        return self._index()[table].get(value)
+
+    def intern(self, table: str, value: str) -> int:
+        ids = self._index()[table]
+        if value not in ids:
+            ids[value] = len(ids)
+            self._values[table].append(value)
+        return ids[value]
+
+    def save(self) -> None:
+        # Nothing to write if the table was never touched
+        if self._values is not None:
+            atomic_write(self.path, json.dumps(self._values).encode("utf-8"))
+
+    def _load(self) -> dict[str, list[str]]:
+        # Only needed to resolve hits and updates, so read on first use
+        if self._values is None:
+            values = json.loads(self.path.read_text()) if self.path.exists() else {}
+            self._values = {table: values.get(table, []) for table in self.TABLES}
+        return self._values
+
+    def _index(self) -> dict[str, dict[str, int]]:
+        if self._ids is None:
+            self._ids = {
+                table: {value: i for i, value in enumerate(values)}
+                for table, values in self._load().items()
+            }
+        return self._ids
+
+
+# A unit is (blob id, language id): the same bytes under another extension
+# are chunked differently, so they are not shared
+Unit = tuple[int, int]
+Location = tuple[int, int]
+
+
+def _pack(unit: Unit) -> int:
+    return unit[0] << 16 | unit[1]
+
+
+def unit_keys(docs: np.ndarray) -> np.ndarray:
+    return docs["blob"].astype(np.int64) << 16 | docs["language"]
+
+
+class LocationTable:
+    # The other (repo id, path id) locations of indexed content. Rows are
+    # only written for the first file holding a blob; later copies (forks,
+    # vendored code) are recorded here so retrieval can list them all.
+    # Read on first use, like StringTable.
+    def __init__(self, path: Path):
+        self.path = path
+        self._refs: dict[Unit, list[Location]] | None = None
+
+    def __len__(self) -> int:
+        return sum(len(refs) for refs in self._load().values())
+
+    def refs(self, unit: Unit) -> list[Location]:
+        return self._load().get(unit, [])
+
+    def add(self, unit: Unit, location: Location) -> bool:
+        refs = self._load().setdefault(unit, [])
+        if location in refs:
+            return False
+        refs.append(location)
+        return True
+
+    def pop(self, unit: Unit) -> Location | None:
+        # Next location to own the unit's rows, if any is left
+        refs = self._load().get(unit)
+        if not refs:
+            return None
+        location = refs.pop(0)
+        if not refs:
+            del self._refs[unit]
+        return location
+
+    def remove(self, repo_id: int, path_id: int | None = None) -> int:
+        removed = 0
+        refs_by_unit = self._load()
+        for unit in list(refs_by_unit):
+            refs = refs_by_unit[unit]
+            kept = [
+                (r, p) for r, p in refs
+                if r != repo_id or (path_id is not None and p != path_id)
+            ]
+            removed += len(refs) - len(kept)
+            if kept:
+                refs_by_unit[unit] = kept
+            else:
+                del refs_by_unit[unit]
+        return removed
+
+    def units(self, repo_id: int | None = None, path_ids=None) -> list[Unit]:
+        # Units with a reference in the repo and/or under the given paths
+        path_ids = set(path_ids) if path_ids is not None else None
+        return [
+            unit
+            for unit, refs in self._load().items()
+            if any(
+                (repo_id is None or r == repo_id) and (path_ids is None or p in path_ids)
+                for r, p in refs
+            )
+        ]
+
+    def save(self) -> None:
+        if self._refs is not None:
+            records = [[blob, language, refs] for (blob, language), refs in self._refs.items()]
+            atomic_write(self.path, json.dumps(records).encode("utf-8"))
+
+    def _load(self) -> dict[Unit, list[Location]]:
+        if self._refs is None:
+            records = json.loads(self.path.read_text()) if self.path.exists() else []
+            self._refs = {
+                (blob, language): [tuple(ref) for ref in refs]
+                for blob, language, refs in records
+            }
+        return self._refs
+
+
+def doc_records(chunks: list[Chunk], strings: StringTable, dtype: np.dtype) -> np.ndarray:
+    records = np.zeros(len(chunks), dtype=dtype)
+    records["repo"] = [strings.intern("repos", c.repo_name) for c in chunks]
+    records["path"] = [strings.intern("paths", c.path) for c in chunks]
+    records["blob"] = [strings.intern("blobs", c.blob_sha or "") for c in chunks]
+    records["language"] = [strings.intern("languages", c.language or "") for c in chunks]
+    records["start_byte"] = [c.start_byte for c in chunks]
+    records["end_byte"] = [c.end_byte for c in chunks]
+    records["start_line"] = [c.start_line for c in chunks]
+    records["end_line"] = [c.end_line for c in chunks]
+    return records
+
+
+def new_content(
+    chunks: list[Chunk], docs: np.ndarray, strings: StringTable, locations: LocationTable
+) -> np.ndarray:
+    # Boolean mask of the chunks to store as rows. Chunks of a blob that is
+    # already indexed, or seen earlier in the batch, under another location
+    # only add that location as a reference
+    keep = np.ones(len(chunks), dtype=bool)
+    units: list[Unit | None] = [
+        (strings.intern("blobs", c.blob_sha), strings.intern("languages", c.language or ""))
+        if c.blob_sha
+        else None
+        for c in chunks
+    ]
+    wanted = {unit for unit in units if unit}
+    if not wanted:
+        return keep
+
+    owners: dict[Unit, Location] = {}
+    live = np.flatnonzero(docs["deleted"] == 0)
+    known = live[np.isin(unit_keys(docs[live]), [_pack(unit) for unit in wanted])]
+    for row in known:
+        doc = docs[row]
+        owners.setdefault(
+            (int(doc["blob"]), int(doc["language"])), (int(doc["repo"]), int(doc["path"]))
+        )
+
+    for i, (chunk, unit) in enumerate(zip(chunks, units)):
+        if unit is None:
+            continue
+        location = (strings.intern("repos", chunk.repo_name), strings.intern("paths", chunk.path))
+        owner = owners.setdefault(unit, location)
+        if owner != location:
+            keep[i] = False
+            if locations.add(unit, location):
+                DEDUP_HITS.inc(stage="index")
+    return keep
+
+
+def file_rows(
+    docs: np.ndarray, strings: StringTable, repo_name: str, path: str | None = None
+) -> np.ndarray:
+    # Boolean mask of live rows for a repo, or for one file in it
+    repo_id = strings.lookup("repos", repo_name)
+    path_id = strings.lookup("paths", path) if path is not None else None
+    if repo_id is None or (path is not None and path_id is None):
+        return np.zeros(len(docs), dtype=bool)
+    rows = (docs["repo"] == repo_id) & (docs["deleted"] == 0)
+    if path_id is not None:
+        rows &= docs["path"] == path_id
+    return rows
+
+
+def release_rows(
+    docs: np.ndarray,
+    strings: StringTable,
+    locations: LocationTable,
+    repo_name: str,
+    path: str | None = None,
+) -> np.ndarray:
+    # Rows to tombstone when a file, or a whole repo, goes away. Its
+    # references are dropped; rows it owns move to the next location of
+    # the same content instead, so the other copies stay searchable
+    rows = file_rows(docs, strings, repo_name, path)
+    repo_id = strings.lookup("repos", repo_name)
+    path_id = strings.lookup("paths", path) if path is not None else None
+    if repo_id is None or (path is not None and path_id is None):
+        return rows
+    locations.remove(repo_id, path_id)
+    if not len(locations) or not rows.any():
+        return rows
+
+    owned = np.flatnonzero(rows)
+    keys = unit_keys(docs[owned])
+    for key in np.unique(keys):
+        unit = (int(key >> 16), int(key & 0xFFFF))
+        location = locations.pop(unit)
+        if location is None:
+            continue
+        moved = owned[keys == key]
+        docs["repo"][moved], docs["path"][moved] = location
+        rows[moved] = False
+    return rows
+
+
+def make_hit(
+    docs: np.ndarray,
+    strings: StringTable,
+    row: int,
+    score: float,
+    locations: LocationTable | None = None,
+) -> SearchHit:
+    doc = docs[row]
+    language = strings.values("languages")[doc["language"]]
+    repos, paths = strings.values("repos"), strings.values("paths")
+    refs = locations.refs((int(doc["blob"]), int(doc["language"]))) if locations else []
+    return SearchHit(
+        row=row,
+        score=score,
+        repo_name=repos[doc["repo"]],
+        path=paths[doc["path"]],
+        language=language or None,
+        start_byte=int(doc["start_byte"]),
+        end_byte=int(doc["end_byte"]),
+        start_line=int(doc["start_line"]),
+        end_line=int(doc["end_line"]),
+        blob_sha=strings.values("blobs")[doc["blob"]] or None,
+        locations=[(repos[doc["repo"]], paths[doc["path"]])]
+        + [(repos[r], paths[p]) for r, p in refs],
+    )
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
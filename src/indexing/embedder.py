@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+
+from src.indexing.tokenizer import tokenize_code
+from src.ingestion.models import Chunk
+from src.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Embedder(Protocol):
+    @property
+    def name(self) -> str: ...
+
+    @property
+    def dim(self) -> int: ...
+
+    def embed(self, texts: list[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    # Offline embedder: code tokens and character n-grams are projected
+    # into dim buckets with signed feature hashing
+    VERSION = 1
+
+    def __init__(self, dim: int = 384, ngram: int = 3):
+        if dim < 1 or ngram < 1:
+            raise ValueError("dim and ngram must be positive")
+        self._dim = dim
+        self.ngram = ngram
+
+    @property
+    def name(self) -> str:
+        return f"hashing-v{self.VERSION}-d{self._dim}-n{self.ngram}"
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows: list[int] = []
+        buckets: list[int] = []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                rows.append(row)
+                buckets.append(zlib.crc32(feature.encode("utf-8")))
+
+        vectors = np.zeros((len(texts), self._dim), dtype=np.float32)
+        if buckets:
+            hashes = np.asarray(buckets, dtype=np.uint64)
+            # Low bits pick the bucket, one high bit the sign, so collisions
+            # cancel out instead of piling up
+            signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors, (np.asarray(rows), hashes % self._dim), signs)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def _features(self, text: str) -> Iterator[str]:
+        for token in tokenize_code(text):
+            yield token
+            padded = f"<{token}>"
+            for i in range(len(padded) - self.ngram + 1):
+                yield padded[i : i + self.ngram]
+
+
+@dataclass
+class EmbeddingStats:
+    chunks: int = 0
+    cache_hits: int = 0
+    embedded: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cache_hits / self.chunks if self.chunks else 0.0
+
+
+class EmbeddingStage:
+    # Same rough estimate the chunker sizes chunks with
+    BYTES_PER_TOKEN = 4
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        cache=None,
+        batch_size: int = 64,
+        max_batch_tokens: int = 16_384,
+    ):
+        if batch_size < 1 or max_batch_tokens < 1:
+            raise ValueError("Batch limits must be positive")
+
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.stats = EmbeddingStats()
+
+    def embed_chunks(
+        self, chunks: Iterable[Chunk]
+    ) -> Iterator[tuple[list[Chunk], np.ndarray]]:
+        # Yields (chunks, vectors) per batch, vectors row-aligned with chunks
+        for batch in self._batches(chunks):
+            started = time.perf_counter()
+            vectors = self._embed_batch(batch)
+            seconds = time.perf_counter() - started
+            self.stats.seconds += seconds
+            record_stage("embed", seconds, len(batch))
+            self.stats.chunks += len(batch)
+            self.stats.batches += 1
+            yield batch, vectors
+
+    def embed_all(self, chunks: Iterable[Chunk]) -> tuple[list[Chunk], np.ndarray]:
+        all_chunks: list[Chunk] = []
+        parts: list[np.ndarray] = []
+        for batch, vectors in self.embed_chunks(chunks):
+            all_chunks.extend(batch)
+            parts.append(vectors)
+        if not parts:
+            return [], np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return all_chunks, np.vstack(parts)
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"Embedded {self.stats.chunks} chunks in {self.stats.batches} batches "
+            f"({self.stats.chunks_per_second:.0f} chunks/s, "
+            f"cache hit rate {self.stats.hit_rate:.1%})"
+        )
+
+    def _batches(self, chunks: Iterable[Chunk]) -> Iterator[list[Chunk]]:
+        batch: list[Chunk] = []
+        tokens = 0
+        for chunk in chunks:
+            chunk_tokens = len(chunk.content.encode("utf-8")) // self.BYTES_PER_TOKEN + 1
+            if batch and (
+                len(batch) >= self.batch_size
+                or tokens + chunk_tokens > self.max_batch_tokens
+            ):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(chunk)
+            tokens += chunk_tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: list[Chunk]) -> np.ndarray:
+        hashes = [content_hash(chunk.content) for chunk in batch]
+        cached = self.cache.get_many(hashes, self.embedder.name) if self.cache else {}
+
+        # Identical chunks within a batch are embedded once
+        todo: dict[str, str] = {}
+        for chunk, key in zip(batch, hashes):
+            if key not in cached and key not in todo:
+                todo[key] = chunk.content
+
+        fresh: dict[str, np.ndarray] = {}
+        if todo:
+            vectors = self.embedder.embed(list(todo.values()))
+            fresh = dict(zip(todo.keys(), vectors))
+            if self.cache:
+                self.cache.put_many(fresh, self.embedder.name)
+
+        self.stats.cache_hits += sum(1 for key in hashes if key in cached)
+        self.stats.embedded += len(todo)
+
+        out = np.empty((len(batch), self.embedder.dim), dtype=np.float32)
+        for row, key in enumerate(hashes):
+            out[row] = cached[key] if key in cached else fresh[key]
+        return out
@@ -0,0 +1,72 @@
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    DEFAULT_CACHE_DIR = Path(".cache/embeddings")
+    DB_NAME = "embeddings.db"
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        content_hash TEXT NOT NULL,
+        model TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (content_hash, model)
+    );
+    """
+
+    def __init__(self, cache_dir: Path | None = None):
+        self.cache_dir = cache_dir or self.DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            self.cache_dir / self.DB_NAME, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def get_many(self, hashes: list[str], model: str) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), self.LOOKUP_BATCH):
+            batch = unique[start : start + self.LOOKUP_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT content_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    (model, *batch),
+                ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray], model: str) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (content_hash, model, vector) "
+                "VALUES (?, ?, ?)",
+                [
+                    (key, model, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in vectors.items()
+                ],
+            )
+
+    def clear(self, model: str | None = None):
+        with self._lock, self._conn:
+            if model:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            else:
+                self._conn.execute("DELETE FROM embeddings")
+        logger.info("Cleared embedding cache")
+
+    def close(self):
+        self._conn.close()
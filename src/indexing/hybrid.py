@@ -0,0 +1,88 @@
+from collections.abc import Sequence
+from dataclasses import replace
+
+import numpy as np
+
+from src.indexing.doc_table import DocFilter, SearchHit
+from src.indexing.embedder import Embedder
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_index import VectorIndex
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[list[SearchHit]], k: int = 10, rrf_k: int = 60
+) -> list[SearchHit]:
+    # Hits are matched across rankings by repo, path and byte range, since
+    # each index numbers its rows independently
+    scores: dict[tuple, float] = {}
+    hits: dict[tuple, SearchHit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            scores[hit.key] = scores.get(hit.key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            hits.setdefault(hit.key, hit)
+
+    fused = sorted(scores, key=lambda key: scores[key], reverse=True)[:k]
+    return [replace(hits[key], score=scores[key]) for key in fused]
+
+
+class HybridRetriever:
+    def __init__(
+        self,
+        embedder: Embedder,
+        vector_index: VectorIndex,
+        lexical_index: LexicalIndex,
+        candidates: int = 50,
+        rrf_k: int = 60,
+    ):
+        self.embedder = embedder
+        self.vector_index = vector_index
+        self.lexical_index = lexical_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def search(
+        self, query: str, k: int = 10, doc_filter: DocFilter | None = None
+    ) -> list[SearchHit]:
+        return self.search_batch([query], k, doc_filter)[0]
+
+    def search_batch(
+        self, queries: list[str], k: int = 10, doc_filter: DocFilter | None = None
+    ) -> list[list[SearchHit]]:
+        if not queries:
+            return []
+        doc_filter = doc_filter or DocFilter()
+        vector_mask = doc_filter.mask(
+            self.vector_index.row_metadata(),
+            self.vector_index.strings,
+            self.vector_index.locations,
+        )
+        lexical_mask = doc_filter.mask(
+            self.lexical_index.docs, self.lexical_index.strings, self.lexical_index.locations
+        )
+
+        vectors = np.asarray(self.embedder.embed(queries), dtype=np.float32)
+        vector_hits = self.vector_index.search_batch(vectors, self.candidates, mask=vector_mask)
+        return [
+            [
+                _located(hit, doc_filter)
+                for hit in reciprocal_rank_fusion(
+                    [semantic, self.lexical_index.search(query, self.candidates, mask=lexical_mask)],
+                    k=k,
+                    rrf_k=self.rrf_k,
+                )
+            ]
+            for query, semantic in zip(queries, vector_hits)
+        ]
+
+
+def _located(hit: SearchHit, doc_filter: DocFilter) -> SearchHit:
+    # Shared content is reported at a location the filter asked for
+    if not doc_filter or doc_filter.matches(hit.repo_name, hit.path):
+        return hit
+    for repo_name, path in hit.locations:
+        if doc_filter.matches(repo_name, path):
+            others = [loc for loc in hit.locations if loc != (repo_name, path)]
+            return replace(
+                hit, repo_name=repo_name, path=path, locations=[(repo_name, path), *others]
+            )
+    return hit
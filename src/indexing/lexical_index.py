@@ -0,0 +1,375 @@
+import io
+import json
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.indexing.doc_table import (
+    DOC_FIELDS,
+    LocationTable,
+    SearchHit,
+    StringTable,
+    atomic_write,
+    doc_records,
+    make_hit,
+    new_content,
+    release_rows,
+)
+from src.indexing.tokenizer import tokenize_code
+from src.ingestion.models import Chunk
+from src.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+DOC_DTYPE = np.dtype(DOC_FIELDS + [("length", "<u4")])
+
+
+@dataclass
+class Postings:
+    # Doc ids are stored as first id plus gaps, in the narrowest unsigned
+    # dtype that fits the largest gap
+    first: int
+    last: int
+    gaps: np.ndarray
+    tfs: np.ndarray
+
+    @classmethod
+    def encode(cls, docs: np.ndarray, tfs: np.ndarray) -> "Postings":
+        return cls(int(docs[0]), int(docs[-1]), _narrow(np.diff(docs)), _clip_tfs(tfs))
+
+    def docs(self) -> np.ndarray:
+        docs = np.empty(len(self.gaps) + 1, dtype=np.int64)
+        docs[0] = self.first
+        np.cumsum(self.gaps, out=docs[1:])
+        docs[1:] += self.first
+        return docs
+
+    def append(self, docs: np.ndarray, tfs: np.ndarray) -> "Postings":
+        gaps = np.diff(np.concatenate([[self.last], docs]))
+        return Postings(
+            self.first,
+            int(docs[-1]),
+            _narrow(np.concatenate([self.gaps.astype(np.int64), gaps])),
+            np.concatenate([self.tfs, _clip_tfs(tfs)]),
+        )
+
+
+def _clip_tfs(tfs: np.ndarray) -> np.ndarray:
+    return np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def _narrow(gaps: np.ndarray) -> np.ndarray:
+    largest = int(gaps.max()) if len(gaps) else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if largest <= np.iinfo(dtype).max:
+            return gaps.astype(dtype)
+    return gaps.astype(np.uint64)
+
+
+class LexicalIndex:
+    VERSION = 2
+    DEFAULT_INDEX_DIR = Path(".cache/index/lexical")
+    HEADER_FILE = "index.json"
+    STRINGS_FILE = "strings.json"
+    LOCATIONS_FILE = "locations.json"
+    DOCS_FILE = "docs.bin"
+    POSTINGS_FILE = "postings.npz"
+
+    K1 = 1.2
+    B = 0.75
+    # Docs buffered in memory before they are folded into the postings
+    FLUSH_DOCS = 4096
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path or self.DEFAULT_INDEX_DIR)
+        self.path.mkdir(parents=True, exist_ok=True)
+        header_path = self.path / self.HEADER_FILE
+        header = json.loads(header_path.read_text()) if header_path.exists() else {}
+        if header and header.get("version") != self.VERSION:
+            raise ValueError(
+                f"Index at {self.path} has version {header.get('version')}, "
+                f"not {self.VERSION}; rebuild it"
+            )
+
+        self.count: int = header.get("count", 0)
+        self.generation: int = header.get("generation", 0)
+        self.strings = StringTable(self.path / self.STRINGS_FILE)
+        self.locations = LocationTable(self.path / self.LOCATIONS_FILE)
+        self._docs = self._load_docs()
+        self._postings = self._load_postings()
+        self._pending: dict[str, tuple[list[int], list[int]]] = {}
+        self._pending_docs: list[np.ndarray] = []
+        self._live_length = int(self._docs["length"][self._docs["deleted"] == 0].sum())
+
+    def __len__(self) -> int:
+        return int(self.count - np.count_nonzero(self._docs["deleted"]))
+
+    @property
+    def docs(self) -> np.ndarray:
+        self._merge_pending()
+        return self._docs
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    def add(self, chunks: Iterable[Chunk]) -> int:
+        # Streams over chunks; postings are buffered and merged every
+        # FLUSH_DOCS docs. Changes are persisted by flush() or close()
+        added = 0
+        batch: list[Chunk] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.FLUSH_DOCS:
+                added += self._add_batch(batch)
+                batch = []
+        if batch:
+            added += self._add_batch(batch)
+        return added
+
+    def delete_file(self, repo_name: str, path: str) -> int:
+        self._merge_pending()
+        return self._tombstone(
+            release_rows(self._docs, self.strings, self.locations, repo_name, path)
+        )
+
+    def delete_repo(self, repo_name: str) -> int:
+        self._merge_pending()
+        return self._tombstone(
+            release_rows(self._docs, self.strings, self.locations, repo_name)
+        )
+
+    def replace_file(self, repo_name: str, path: str, chunks: Iterable[Chunk]) -> int:
+        self.delete_file(repo_name, path)
+        return self.add(chunks)
+
+    def _add_batch(self, chunks: list[Chunk]) -> int:
+        started = time.perf_counter()
+        added = self._index_batch(chunks)
+        record_stage("index_lexical", time.perf_counter() - started, len(chunks))
+        return added
+
+    def _index_batch(self, chunks: list[Chunk]) -> int:
+        # Content already indexed elsewhere only gains a location
+        keep = new_content(chunks, self.docs, self.strings, self.locations)
+        chunks = [chunk for chunk, kept in zip(chunks, keep) if kept]
+        records = doc_records(chunks, self.strings, DOC_DTYPE)
+        for offset, chunk in enumerate(chunks):
+            doc_id = self.count + offset
+            counts: dict[str, int] = {}
+            tokens = tokenize_code(chunk.content)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                docs, tfs = self._pending.setdefault(term, ([], []))
+                docs.append(doc_id)
+                tfs.append(tf)
+            records["length"][offset] = len(tokens)
+
+        self._pending_docs.append(records)
+        self._live_length += int(records["length"].sum())
+        self.count += len(chunks)
+        if sum(len(r) for r in self._pending_docs) >= self.FLUSH_DOCS:
+            self._merge_pending()
+        return len(chunks)
+
+    def _merge_pending(self) -> None:
+        for term, (docs, tfs) in self._pending.items():
+            docs_arr = np.asarray(docs, dtype=np.int64)
+            tfs_arr = np.asarray(tfs)
+            current = self._postings.get(term)
+            self._postings[term] = (
+                current.append(docs_arr, tfs_arr)
+                if current is not None
+                else Postings.encode(docs_arr, tfs_arr)
+            )
+        self._pending = {}
+        if self._pending_docs:
+            self._docs = np.concatenate([self._docs, *self._pending_docs])
+            self._pending_docs = []
+
+    def _tombstone(self, rows: np.ndarray) -> int:
+        removed = int(np.count_nonzero(rows))
+        if removed:
+            self._live_length -= int(self._docs["length"][rows].sum())
+            self._docs["deleted"][rows] = 1
+        return removed
+
+    def search(self, query: str, k: int = 10, mask: np.ndarray | None = None) -> list[SearchHit]:
+        self._merge_pending()
+        live_count = len(self)
+        terms = list(dict.fromkeys(tokenize_code(query)))
+        postings = [self._postings[t] for t in terms if t in self._postings]
+        if not postings or not live_count or k < 1:
+            return []
+
+        avg_length = self._live_length / live_count
+        norms = self.K1 * (1 - self.B + self.B * self._docs["length"] / avg_length)
+        deleted = self._docs["deleted"] != 0
+        if mask is not None:
+            deleted = deleted | ~mask
+
+        # Score terms in order of their best possible contribution (MaxScore):
+        # once the k-th score beats what the remaining terms could add, docs
+        # not seen so far can no longer enter the top k
+        weighted = []
+        for p in postings:
+            df = len(p.tfs)
+            idf = np.log(1 + (live_count - df + 0.5) / (df + 0.5))
+            weighted.append((idf * (self.K1 + 1), idf, p))
+        weighted.sort(key=lambda w: w[0], reverse=True)
+        bounds = np.cumsum([w[0] for w in weighted][::-1])[::-1]
+
+        cand_docs = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0, dtype=np.float64)
+        closed = False
+        for i, (_, idf, p) in enumerate(weighted):
+            if closed:
+                # Only the surviving candidates are looked up and scored; a
+                # list whose id range holds none of them is not even decoded
+                if not len(cand_docs) or p.last < cand_docs[0] or p.first > cand_docs[-1]:
+                    continue
+                docs = p.docs()
+                pos = np.searchsorted(docs, cand_docs)
+                pos[pos == len(docs)] = 0
+                hit = docs[pos] == cand_docs
+                tfs = p.tfs[pos[hit]].astype(np.float64)
+                cand_scores[hit] += (
+                    idf * tfs * (self.K1 + 1) / (tfs + norms[cand_docs[hit]])
+                )
+            else:
+                docs = p.docs()
+                keep = ~deleted[docs]
+                docs, tfs = docs[keep], p.tfs[keep].astype(np.float64)
+                scores = idf * tfs * (self.K1 + 1) / (tfs + norms[docs])
+                merged, inverse = np.unique(
+                    np.concatenate([cand_docs, docs]), return_inverse=True
+                )
+                cand_scores = np.bincount(
+                    inverse, weights=np.concatenate([cand_scores, scores]), minlength=len(merged)
+                )
+                cand_docs = merged
+
+            remaining = bounds[i + 1] if i + 1 < len(bounds) else 0.0
+            if len(cand_docs) >= k:
+                threshold = np.partition(cand_scores, len(cand_scores) - k)[-k]
+                closed = closed or threshold >= remaining
+                if closed:
+                    # Candidates the remaining terms cannot lift to the k-th
+                    # score are dropped, so later lists are probed for fewer
+                    keep = cand_scores + remaining >= threshold
+                    cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+
+        if len(cand_docs) > k:
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            cand_docs, cand_scores = cand_docs[top], cand_scores[top]
+        order = np.lexsort((cand_docs, -cand_scores))
+        return [
+            make_hit(
+                self._docs, self.strings, int(cand_docs[i]), float(cand_scores[i]), self.locations
+            )
+            for i in order
+        ]
+
+    def compact(self) -> None:
+        # Drops tombstoned docs from the postings; doc ids change
+        self._merge_pending()
+        live = self._docs["deleted"] == 0
+        new_ids = np.cumsum(live) - 1
+        postings: dict[str, Postings] = {}
+        for term, p in self._postings.items():
+            docs = p.docs()
+            keep = live[docs]
+            if keep.any():
+                postings[term] = Postings.encode(new_ids[docs[keep]], p.tfs[keep])
+        self._postings = postings
+        self._docs = self._docs[live].copy()
+        self.count = len(self._docs)
+        self.flush()
+
+    def flush(self) -> None:
+        self._merge_pending()
+        terms = list(self._postings)
+        postings = [self._postings[t] for t in terms]
+        term_bytes = [t.encode("utf-8") for t in terms]
+        gap_bytes = [p.gaps.tobytes() for p in postings]
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            terms=np.frombuffer(b"".join(term_bytes), dtype=np.uint8),
+            term_offsets=_offsets(len(b) for b in term_bytes),
+            first=np.asarray([p.first for p in postings], dtype=np.int64),
+            last=np.asarray([p.last for p in postings], dtype=np.int64),
+            widths=np.asarray([p.gaps.itemsize for p in postings], dtype=np.uint8),
+            gaps=np.frombuffer(b"".join(gap_bytes), dtype=np.uint8),
+            gap_offsets=_offsets(len(b) for b in gap_bytes),
+            tfs=np.concatenate([p.tfs for p in postings]) if postings else np.zeros(0, np.uint16),
+            tf_offsets=_offsets(len(p.tfs) for p in postings),
+        )
+        # The files only agree with each other once all are written: the
+        # header says so while they are not, and names a new generation
+        # once they are
+        self._write_header(writing=True)
+        atomic_write(self.path / self.POSTINGS_FILE, buffer.getvalue())
+        atomic_write(self.path / self.DOCS_FILE, self._docs.tobytes())
+        self.strings.save()
+        self.locations.save()
+        self.generation += 1
+        self._write_header()
+
+    def _write_header(self, writing: bool = False) -> None:
+        header = {"version": self.VERSION, "count": self.count, "generation": self.generation}
+        if writing:
+            header["writing"] = True
+        atomic_write(self.path / self.HEADER_FILE, json.dumps(header).encode("utf-8"))
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _load_docs(self) -> np.ndarray:
+        docs_path = self.path / self.DOCS_FILE
+        if not docs_path.exists():
+            return np.zeros(0, dtype=DOC_DTYPE)
+        return np.fromfile(docs_path, dtype=DOC_DTYPE)
+
+    def _load_postings(self) -> dict[str, Postings]:
+        postings_path = self.path / self.POSTINGS_FILE
+        if not postings_path.exists():
+            return {}
+        with np.load(postings_path) as data:
+            terms = data["terms"].tobytes()
+            term_offsets = data["term_offsets"]
+            gaps = data["gaps"]
+            gap_offsets = data["gap_offsets"]
+            tfs = data["tfs"]
+            tf_offsets = data["tf_offsets"]
+            widths = data["widths"]
+            first = data["first"]
+            last = data["last"]
+
+        postings: dict[str, Postings] = {}
+        for i in range(len(first)):
+            term = terms[term_offsets[i] : term_offsets[i + 1]].decode("utf-8")
+            dtype = np.dtype(f"<u{widths[i]}")
+            postings[term] = Postings(
+                int(first[i]),
+                int(last[i]),
+                gaps[gap_offsets[i] : gap_offsets[i + 1]].view(dtype),
+                tfs[tf_offsets[i] : tf_offsets[i + 1]],
+            )
+        return postings
+
+
+def _offsets(lengths: Iterable[int]) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(list(lengths), dtype=np.int64)]).astype(np.int64)
@@ -0,0 +1,19 @@
+import re
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+# Splits "parseHTTPResponse2" into "parse", "HTTP", "Response", "2"
+_SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize_code(text: str) -> list[str]:
+    # Whole identifiers are kept next to their parts, so exact identifier
+    # matches score higher than matches on a single part
+    tokens: list[str] = []
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for piece in word.split("_") for p in _SUBWORD_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
@@ -0,0 +1,371 @@
+import io
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.indexing.doc_table import (
+    DOC_FIELDS,
+    LocationTable,
+    SearchHit,
+    StringTable,
+    atomic_write,
+    doc_records,
+    make_hit,
+    new_content,
+    release_rows,
+)
+from src.ingestion.models import Chunk
+from src.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+META_DTYPE = np.dtype(DOC_FIELDS)
+
+
+class VectorIndex:
+    VERSION = 2
+    DEFAULT_INDEX_DIR = Path(".cache/index/vectors")
+    HEADER_FILE = "index.json"
+    STRINGS_FILE = "strings.json"
+    LOCATIONS_FILE = "locations.json"
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "meta.bin"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    OFFSETS_FILE = "ivf_offsets.npy"
+    LISTS_FILE = "ivf_rows.npy"
+
+    # Rows scored per matrix product, bounds the temporary score matrix
+    BLOCK_ROWS = 65_536
+    KMEANS_SAMPLE = 65_536
+
+    def __init__(self, path: Path | None = None, dim: int | None = None):
+        self.path = Path(path or self.DEFAULT_INDEX_DIR)
+        header_path = self.path / self.HEADER_FILE
+        if header_path.exists():
+            header = json.loads(header_path.read_text())
+            if header.get("version") != self.VERSION:
+                raise ValueError(
+                    f"Index at {self.path} has version {header.get('version')}, "
+                    f"not {self.VERSION}; rebuild it"
+                )
+            if dim is not None and dim != header["dim"]:
+                raise ValueError(
+                    f"Index at {self.path} has dim {header['dim']}, not {dim}"
+                )
+        elif dim is None:
+            raise ValueError(f"No index at {self.path}, dim is required to create one")
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            header = {"version": self.VERSION, "dim": dim, "count": 0, "ivf_count": 0}
+            for name in (self.VECTORS_FILE, self.META_FILE):
+                (self.path / name).touch()
+
+        self.dim: int = header["dim"]
+        self.count: int = header["count"]
+        self.ivf_count: int = header["ivf_count"]
+        self.generation: int = header.get("generation", 0)
+        self.strings = StringTable(self.path / self.STRINGS_FILE)
+        self.locations = LocationTable(self.path / self.LOCATIONS_FILE)
+        self._map_files()
+        self._load_ivf()
+        if not header_path.exists():
+            self.flush()
+
+    def _map_files(self) -> None:
+        # Opening maps the files, nothing is read until a search touches it
+        if self.count:
+            self._vectors = np.memmap(
+                self.path / self.VECTORS_FILE,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.count, self.dim),
+            )
+            self._meta = np.memmap(
+                self.path / self.META_FILE, dtype=META_DTYPE, mode="r+", shape=(self.count,)
+            )
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self._meta = np.zeros(0, dtype=META_DTYPE)
+
+    def _load_ivf(self) -> None:
+        centroids_path = self.path / self.CENTROIDS_FILE
+        if self.ivf_count and centroids_path.exists():
+            self._centroids = np.load(centroids_path, mmap_mode="r")
+            self._offsets = np.load(self.path / self.OFFSETS_FILE, mmap_mode="r")
+            self._lists = np.load(self.path / self.LISTS_FILE, mmap_mode="r")
+        else:
+            self._centroids = None
+
+    def __len__(self) -> int:
+        return int(self.count - np.count_nonzero(self._meta["deleted"]))
+
+    @property
+    def has_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def add(self, chunks: list[Chunk], vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(chunks), self.dim):
+            raise ValueError(f"Expected vectors of shape ({len(chunks)}, {self.dim})")
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+
+        started = time.perf_counter()
+        # Content already indexed elsewhere only gains a location
+        keep = new_content(chunks, self._meta, self.strings, self.locations)
+        if not keep.all():
+            chunks = [chunk for chunk, kept in zip(chunks, keep) if kept]
+            vectors = vectors[keep]
+        if not chunks:
+            self.flush()
+            return np.zeros(0, dtype=np.int64)
+        meta = doc_records(chunks, self.strings, META_DTYPE)
+
+        # Drop the maps before growing the files underneath them
+        self._release()
+        self._truncate_tail()
+        with open(self.path / self.VECTORS_FILE, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.path / self.META_FILE, "ab") as f:
+            f.write(meta.tobytes())
+
+        rows = np.arange(self.count, self.count + len(chunks))
+        self.count += len(chunks)
+        self._map_files()
+        self.flush()
+        record_stage("index_vector", time.perf_counter() - started, len(chunks))
+        return rows
+
+    def delete_file(self, repo_name: str, path: str) -> int:
+        return self._tombstone(
+            release_rows(self._meta, self.strings, self.locations, repo_name, path)
+        )
+
+    def delete_repo(self, repo_name: str) -> int:
+        return self._tombstone(
+            release_rows(self._meta, self.strings, self.locations, repo_name)
+        )
+
+    def replace_file(
+        self, repo_name: str, path: str, chunks: list[Chunk], vectors: np.ndarray
+    ) -> np.ndarray:
+        self.delete_file(repo_name, path)
+        return self.add(chunks, vectors)
+
+    def _tombstone(self, rows: np.ndarray) -> int:
+        # release_rows may also have moved rows to another location
+        removed = int(np.count_nonzero(rows))
+        self._meta["deleted"][rows] = 1
+        if isinstance(self._meta, np.memmap):
+            self._meta.flush()
+        self.locations.save()
+        return removed
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        exact: bool | None = None,
+        n_probe: int = 8,
+        mask: np.ndarray | None = None,
+    ) -> list[SearchHit]:
+        return self.search_batch(query[None, :], k, exact=exact, n_probe=n_probe, mask=mask)[0]
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        exact: bool | None = None,
+        n_probe: int = 8,
+        mask: np.ndarray | None = None,
+    ) -> list[list[SearchHit]]:
+        # mask, if given, is a boolean array over rows; False rows are skipped
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(f"Queries must have shape (n, {self.dim})")
+
+        use_ivf = self.has_ivf if exact is None else not exact and self.has_ivf
+        if use_ivf:
+            results = [self._search_ivf(q, k, n_probe, mask) for q in queries]
+        else:
+            results = self._search_exact(queries, k, mask)
+        return [
+            [
+                make_hit(self._meta, self.strings, row, score, self.locations)
+                for row, score in result
+            ]
+            for result in results
+        ]
+
+    def _search_exact(
+        self, queries: np.ndarray, k: int, mask: np.ndarray | None
+    ) -> list[list[tuple[int, float]]]:
+        m = len(queries)
+        best_rows = np.zeros((m, 0), dtype=np.int64)
+        best_scores = np.zeros((m, 0), dtype=np.float32)
+
+        for start in range(0, self.count, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, self.count)
+            scores = queries @ self._vectors[start:end].T
+            live = self._meta["deleted"][start:end] == 0
+            if mask is not None:
+                live &= mask[start:end]
+            scores[:, ~live] = -np.inf
+
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        return [self._ranked(r, s) for r, s in zip(best_rows, best_scores)]
+
+    def _search_ivf(
+        self, query: np.ndarray, k: int, n_probe: int, mask: np.ndarray | None
+    ) -> list[tuple[int, float]]:
+        n_probe = min(n_probe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ query), n_probe - 1)[:n_probe]
+        candidates = [self._lists[self._offsets[c] : self._offsets[c + 1]] for c in probe]
+        # Rows added since the last build are not in any list yet
+        candidates.append(np.arange(self.ivf_count, self.count))
+        rows = np.concatenate(candidates).astype(np.int64)
+
+        live = self._meta["deleted"][rows] == 0
+        if mask is not None:
+            live &= mask[rows]
+        rows = rows[live]
+        if not len(rows):
+            return []
+
+        scores = self._vectors[rows] @ query
+        if len(rows) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[keep], scores[keep]
+        return self._ranked(rows, scores)
+
+    @staticmethod
+    def _ranked(rows: np.ndarray, scores: np.ndarray) -> list[tuple[int, float]]:
+        order = np.argsort(-scores, kind="stable")
+        return [
+            (int(rows[i]), float(scores[i])) for i in order if np.isfinite(scores[i])
+        ]
+
+    def build_ivf(self, n_lists: int | None = None, n_iter: int = 10, seed: int = 0) -> None:
+        live_rows = np.flatnonzero(self._meta["deleted"] == 0)
+        if not len(live_rows):
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(len(live_rows))))
+        n_lists = min(n_lists, len(live_rows))
+        rng = np.random.default_rng(seed)
+
+        sample = live_rows
+        if len(sample) > self.KMEANS_SAMPLE:
+            sample = np.sort(rng.choice(sample, self.KMEANS_SAMPLE, replace=False))
+        train = np.asarray(self._vectors[sample])
+        centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = train[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+        assign = np.empty(len(live_rows), dtype=np.int64)
+        for start in range(0, len(live_rows), self.BLOCK_ROWS):
+            block = live_rows[start : start + self.BLOCK_ROWS]
+            assign[start : start + len(block)] = np.argmax(
+                self._vectors[block] @ centroids.T, axis=1
+            )
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=n_lists), out=offsets[1:])
+
+        self._write_header(writing=True)
+        self._save_npy(self.CENTROIDS_FILE, centroids.astype(np.float32))
+        self._save_npy(self.OFFSETS_FILE, offsets)
+        self._save_npy(self.LISTS_FILE, live_rows[order].astype(np.uint32))
+        self.ivf_count = self.count
+        self.flush()
+        self._load_ivf()
+        logger.info(f"Built IVF index with {n_lists} lists over {len(live_rows)} vectors")
+
+    def compact(self) -> None:
+        # Rewrites the files without tombstoned rows; row ids change
+        live = self._meta["deleted"] == 0
+        vectors = np.asarray(self._vectors[live])
+        meta = np.asarray(self._meta[live])
+        had_ivf = self.has_ivf
+
+        self._release()
+        self._centroids = None
+        self._write_header(writing=True)
+        atomic_write(self.path / self.VECTORS_FILE, vectors.tobytes())
+        atomic_write(self.path / self.META_FILE, meta.tobytes())
+        for name in (self.CENTROIDS_FILE, self.OFFSETS_FILE, self.LISTS_FILE):
+            (self.path / name).unlink(missing_ok=True)
+
+        self.count = len(vectors)
+        self.ivf_count = 0
+        self._map_files()
+        self.flush()
+        if had_ivf:
+            self.build_ivf()
+
+    def flush(self) -> None:
+        # Appended rows stay invisible to readers until the header counts
+        # them; rewrites of existing files (compact, build_ivf) mark the
+        # header as writing first. Every flush is a new generation
+        self.strings.save()
+        self.locations.save()
+        self.generation += 1
+        self._write_header()
+
+    def _write_header(self, writing: bool = False) -> None:
+        header = {
+            "version": self.VERSION,
+            "dim": self.dim,
+            "count": self.count,
+            "ivf_count": self.ivf_count,
+            "generation": self.generation,
+        }
+        if writing:
+            header["writing"] = True
+        atomic_write(self.path / self.HEADER_FILE, json.dumps(header).encode("utf-8"))
+
+    def row_metadata(self) -> np.ndarray:
+        return self._meta
+
+    def _truncate_tail(self) -> None:
+        # Rows appended by a write that never reached flush (a killed
+        # process) are past count; appending after them would pair row N
+        # with another row's metadata. Done before writing rather than on
+        # open, as readers open the files while a writer may be appending
+        for name, row_bytes in (
+            (self.VECTORS_FILE, self.dim * 4),
+            (self.META_FILE, META_DTYPE.itemsize),
+        ):
+            path = self.path / name
+            size = self.count * row_bytes
+            if path.stat().st_size > size:
+                logger.warning(f"Dropping unflushed rows at the end of {path}")
+                os.truncate(path, size)
+
+    def _release(self) -> None:
+        if isinstance(self._meta, np.memmap):
+            self._meta.flush()
+        self._vectors = self._meta = None
+
+    def _save_npy(self, name: str, array: np.ndarray) -> None:
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        atomic_write(self.path / name, buffer.getvalue())
@@ -1,10 +1,19 @@
-from .models import FileContent, RepoMetadata
+from .models import Chunk, FileContent, RepoMetadata
+from .file_rules import FileRules
 from .github_client import GitHubClient
+from .async_client import AsyncGitHubClient
 from .repo_crawler import RepoCrawler
+from .local_repo import LocalRepoCrawler
+from .chunker import Chunker
 
 __all__ = [
+    "Chunk",
     "FileContent",
     "RepoMetadata",
+    "FileRules",
     "GitHubClient",
+    "AsyncGitHubClient",
     "RepoCrawler",
+    "LocalRepoCrawler",
+    "Chunker",
 ]
@@ -0,0 +1,80 @@
+import logging
+import tarfile
+from collections.abc import Iterator
+from typing import IO
+
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.instrumentation import BYTES_DECODED, FILES_SKIPPED
+from src.ingestion.models import FileContent
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveReader:
+    def __init__(self, client: GitHubClient, max_file_size: int):
+        self.client = client
+        self.max_file_size = max_file_size
+
+    def iter_files(
+        self, fileobj: IO[bytes], repo_name: str, repo_url: str
+    ) -> Iterator[FileContent]:
+        # "r|*" reads the archive as a forward-only stream, so nothing is
+        # buffered beyond the current member. .gitattributes may come after
+        # the files it describes, so only the configured rules apply here
+        rules = self.client.rules.for_repo(repo_name)
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+
+                path = self._strip_root(member.name)
+                if not path:
+                    continue
+                reason = rules.skip_reason(path)
+                if reason:
+                    FILES_SKIPPED.inc(reason=reason)
+                    continue
+
+                if member.size > self.max_file_size:
+                    FILES_SKIPPED.inc(reason="size")
+                    logger.debug(f"Skipping large file: {path}")
+                    continue
+
+                extracted = tar.extractfile(member)
+                if extracted is None:
+                    continue
+
+                data = extracted.read()
+                try:
+                    decoded = data.decode("utf-8")
+                except UnicodeDecodeError:
+                    # Binary file, skip
+                    FILES_SKIPPED.inc(reason="binary")
+                    continue
+                BYTES_DECODED.inc(len(data), mode="archive")
+
+                if not decoded.strip():
+                    FILES_SKIPPED.inc(reason="empty")
+                    continue
+
+                reason = rules.content_reason(path, data)
+                if reason:
+                    FILES_SKIPPED.inc(reason=reason)
+                    continue
+
+                yield FileContent(
+                    path=path,
+                    content=data,
+                    language=self.client.get_language(path),
+                    repo_name=repo_name,
+                    repo_url=repo_url,
+                    size=member.size,
+                    sha=git_blob_sha(data),
+                )
+
+    @staticmethod
+    def _strip_root(name: str) -> str:
+        # GitHub archives wrap everything in a single "<owner>-<repo>-<sha>/" directory
+        _, _, path = name.partition("/")
+        return path
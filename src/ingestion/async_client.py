@@ -0,0 +1,306 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlencode
+
+from github import Consts, GithubException, RateLimitExceededException
+
+from .async_http import AsyncConnectionPool, AsyncResponse
+from .file_rules import FileRules
+from .github_client import GitHubClient
+from .instrumentation import record_api_call
+from .models import FileContent, RepoMetadata, TreeEntry
+from .rate_limit import RateLimitScheduler
+
+logger = logging.getLogger(__name__)
+
+_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="(\w+)"')
+
+
+class AsyncGitHubClient:
+    # asyncio counterpart of GitHubClient over plain REST calls. JSON is
+    # decoded straight into the models instead of PyGithub objects, and
+    # thousands of fetches can be in flight on one thread; the pool caps
+    # how many actually hit the host at once.
+    GH_TOKEN_ENV_VAR = GitHubClient.GH_TOKEN_ENV_VAR
+    PER_PAGE = 100
+    RAW_MEDIA_TYPE = "application/vnd.github.raw"
+
+    IGNORED_DIRS = GitHubClient.IGNORED_DIRS
+    IGNORED_FILES = GitHubClient.IGNORED_FILES
+    CODE_EXTENSIONS = GitHubClient.CODE_EXTENSIONS
+    DOC_EXTENSIONS = GitHubClient.DOC_EXTENSIONS
+    EXT_TO_LANG_MAP = GitHubClient.EXT_TO_LANG_MAP
+    default_rules = GitHubClient.default_rules
+    should_process_file = GitHubClient.should_process_file
+    skip_reason = GitHubClient.skip_reason
+    get_language = GitHubClient.get_language
+
+    def __init__(
+        self,
+        token: str | None = None,
+        base_url: str = Consts.DEFAULT_BASE_URL,
+        max_per_host: int = 32,
+        scheduler: RateLimitScheduler | None = None,
+        timeout: float = 30.0,
+        rules: FileRules | None = None,
+    ):
+        self.token = token or os.getenv(self.GH_TOKEN_ENV_VAR)
+        if not self.token:
+            raise ValueError("GitHub token is required")
+
+        self.base_url = base_url.rstrip("/")
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.rules = rules or self.default_rules()
+        # Per repo rules, known once its tree (and .gitattributes) is read
+        self._repo_rules: dict[str, FileRules] = {}
+        self.pool = AsyncConnectionPool(max_per_host=max_per_host, timeout=timeout)
+        self._headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Accept": "application/vnd.github+json",
+            "User-Agent": Consts.DEFAULT_USER_AGENT,
+        }
+
+    async def request(
+        self, path: str, params: dict[str, Any] | None = None, accept: str | None = None
+    ) -> AsyncResponse:
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        headers = {**self._headers, "Accept": accept} if accept else self._headers
+        resource = self.scheduler.resource_for(url)
+
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.scheduler.reserve_slot(resource))
+            started = time.perf_counter()
+            try:
+                response = await self.pool.request("GET", url, headers)
+            except (OSError, asyncio.TimeoutError):
+                record_api_call(url, "error", time.perf_counter() - started)
+                raise
+            record_api_call(
+                url,
+                str(response.status_code),
+                time.perf_counter() - started,
+                len(response.content),
+                response.headers,
+            )
+            self.scheduler.update(response.headers)
+
+            delay = self.scheduler.retry_delay(response, attempt)
+            if delay is None or attempt >= self.scheduler.max_retries:
+                break
+            attempt += 1
+            self.scheduler.retries += 1
+            logger.warning(
+                f"GitHub returned {response.status_code} for {url}, "
+                f"retrying in {delay:.1f}s (attempt {attempt}/{self.scheduler.max_retries})"
+            )
+            await asyncio.sleep(delay)
+
+        if response.status_code >= 400:
+            raise self._exception(response)
+        return response
+
+    async def get_json(self, path: str, params: dict[str, Any] | None = None) -> Any:
+        return (await self.request(path, params)).json()
+
+    async def paginate(
+        self, path: str, params: dict[str, Any] | None = None
+    ) -> AsyncIterator[dict]:
+        url: str | None = path
+        params = {"per_page": self.PER_PAGE, **(params or {})}
+        while url:
+            response = await self.request(url, params)
+            for item in response.json():
+                yield item
+            # The next link already carries the query string
+            url = _links(response).get("next")
+            params = None
+
+    async def get_username(self) -> str:
+        return (await self.get_json("/user"))["login"]
+
+    async def get_repos(self, include_private: bool = True) -> list[RepoMetadata]:
+        return [
+            self._repo_metadata(item)
+            async for item in self.paginate("/user/repos")
+            if include_private or not item["private"]
+        ]
+
+    async def get_repo(self, full_name: str) -> RepoMetadata:
+        return self._repo_metadata(await self.get_json(f"/repos/{full_name}"))
+
+    async def get_repo_metadata(
+        self, repo: RepoMetadata | str, fields: Iterable[str] = ()
+    ) -> RepoMetadata:
+        # Same field selection as GitHubClient; listing payloads already
+        # carry topics and dates, the selected extras are fetched concurrently
+        fields = set(fields)
+        unknown = fields - GitHubClient.METADATA_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown metadata fields: {sorted(unknown)}")
+        if isinstance(repo, str):
+            repo = await self.get_repo(repo)
+
+        languages, total_commits = await asyncio.gather(
+            self.get_json(f"/repos/{repo.full_name}/languages")
+            if "languages" in fields
+            else _resolved(repo.languages),
+            self.count_commits(repo.full_name)
+            if "total_commits" in fields
+            else _resolved(repo.total_commits),
+        )
+        repo.languages = languages
+        repo.total_commits = total_commits
+        return repo
+
+    async def count_commits(self, full_name: str) -> int:
+        # With one commit per page, the last page number is the count
+        try:
+            response = await self.request(f"/repos/{full_name}/commits", {"per_page": 1})
+        except GithubException as e:
+            if e.status == 409:  # empty repository
+                return 0
+            raise
+        last = _links(response).get("last")
+        if last:
+            match = re.search(r"[?&]page=(\d+)", last)
+            if match:
+                return int(match.group(1))
+        return len(response.json())
+
+    async def get_tree(self, full_name: str, ref: str = "HEAD") -> list[TreeEntry]:
+        # A listing cut off by the API limit is listed again one level deep,
+        # and each subtree recursively on its own; one level at a time, the
+        # subtrees of a level concurrently. Excluded subtrees are not listed
+        entries: list[TreeEntry] = []
+        level = [("", ref)]
+        rules = None
+        while level:
+            listings = await asyncio.gather(
+                *(self._list_tree(full_name, prefix, sha) for prefix, sha in level)
+            )
+            next_level = []
+            for (prefix, _), (items, truncated) in zip(level, listings):
+                if rules is None:
+                    # The root listing carries .gitattributes
+                    rules = await self._rules_for(full_name, items)
+                for item in items:
+                    path = f"{prefix}{item['path']}"
+                    if item["type"] == "blob" and rules.skip_reason(path) is None:
+                        entries.append(
+                            TreeEntry(path=path, sha=item["sha"], size=item.get("size", 0))
+                        )
+                    elif item["type"] == "tree" and truncated and not rules.prunes(path):
+                        next_level.append((f"{path}/", item["sha"]))
+            level = next_level
+        return entries
+
+    async def _list_tree(self, full_name: str, prefix: str, sha: str) -> tuple[list[dict], bool]:
+        tree = await self.get_json(f"/repos/{full_name}/git/trees/{sha}", {"recursive": 1})
+        if not tree.get("truncated"):
+            return tree["tree"], False
+        logger.debug(f"Truncated tree at '{prefix or '/'}' in {full_name}")
+        tree = await self.get_json(f"/repos/{full_name}/git/trees/{sha}")
+        return tree["tree"], True
+
+    async def _rules_for(self, full_name: str, items: list[dict]) -> FileRules:
+        attributes = None
+        for item in items:
+            if item["path"] == ".gitattributes" and item["type"] == "blob":
+                data = await self.get_blob(full_name, item["sha"])
+                attributes = data.decode("utf-8", errors="replace")
+        rules = self._repo_rules[full_name] = self.rules.for_repo(full_name, attributes)
+        return rules
+
+    async def get_blob(self, full_name: str, sha: str) -> bytes:
+        # The raw media type skips the base64 JSON envelope
+        response = await self.request(
+            f"/repos/{full_name}/git/blobs/{sha}", accept=self.RAW_MEDIA_TYPE
+        )
+        return response.content
+
+    async def fetch_file(self, repo: RepoMetadata, entry: TreeEntry) -> FileContent | None:
+        data = await self.get_blob(repo.full_name, entry.sha)
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            logger.debug(f"Skipping binary file {repo.full_name}/{entry.path}")
+            return None
+        if not content.strip():
+            return None
+        rules = self._repo_rules.get(repo.full_name) or self.rules.for_repo(repo.full_name)
+        if rules.content_reason(entry.path, data):
+            logger.debug(f"Skipping generated file {repo.full_name}/{entry.path}")
+            return None
+        return FileContent(
+            path=entry.path,
+            content=data,
+            language=self.get_language(entry.path),
+            repo_name=repo.full_name,
+            repo_url=repo.url,
+            size=len(data),
+            sha=entry.sha,
+        )
+
+    async def fetch_files(
+        self, repo: RepoMetadata, ref: str = "HEAD", max_file_size: int = 1024 * 1024
+    ) -> list[FileContent]:
+        entries = await self.get_tree(repo.full_name, ref)
+        entries = [e for e in entries if e.size <= max_file_size]
+        files = await asyncio.gather(*(self.fetch_file(repo, entry) for entry in entries))
+        return [f for f in files if f is not None]
+
+    @staticmethod
+    def _repo_metadata(item: dict) -> RepoMetadata:
+        return RepoMetadata(
+            name=item["name"],
+            full_name=item["full_name"],
+            url=item["html_url"],
+            private=item["private"],
+            description=item.get("description"),
+            topics=item.get("topics") or [],
+            created_at=_parse_datetime(item.get("created_at")),
+            updated_at=_parse_datetime(item.get("updated_at")),
+        )
+
+    @staticmethod
+    def _exception(response: AsyncResponse) -> GithubException:
+        try:
+            data = response.json()
+        except ValueError:
+            data = response.text
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        if response.status_code in (403, 429) and headers.get("x-ratelimit-remaining") == "0":
+            return RateLimitExceededException(response.status_code, data, headers)
+        return GithubException(response.status_code, data, headers)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+async def _resolved(value: Any) -> Any:
+    return value
+
+
+def _links(response: AsyncResponse) -> dict[str, str]:
+    return {rel: url for url, rel in _LINK_RE.findall(response.headers.get("link", ""))}
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
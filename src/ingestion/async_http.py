@@ -0,0 +1,219 @@
+import asyncio
+import gzip
+import json
+import logging
+import ssl
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urljoin, urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+HostKey = tuple[str, str, int]
+Connection = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@dataclass
+class AsyncResponse:
+    url: str
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class AsyncConnectionPool:
+    # Keep-alive HTTP/1.1 connections per host on asyncio streams. At most
+    # max_per_host requests are in flight to a host; the rest wait on the
+    # host's semaphore instead of opening more sockets.
+    MAX_REDIRECTS = 5
+    REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+    def __init__(self, max_per_host: int = 32, timeout: float = 30.0):
+        if max_per_host < 1:
+            raise ValueError("max_per_host must be positive")
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.connections_opened = 0
+        self.requests_sent = 0
+        self.bytes_received = 0
+        self._idle: dict[HostKey, list[Connection]] = {}
+        self._limits: dict[HostKey, asyncio.Semaphore] = {}
+        self._ssl_context: ssl.SSLContext | None = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+        body: bytes | None = None,
+    ) -> AsyncResponse:
+        headers = dict(headers or {})
+        for _ in range(self.MAX_REDIRECTS + 1):
+            response = await self._request_once(method, url, headers, body)
+            location = response.headers.get("location")
+            if response.status_code not in self.REDIRECT_STATUSES or not location:
+                return response
+
+            next_url = urljoin(url, location)
+            if urlsplit(next_url).netloc != urlsplit(url).netloc:
+                # Like requests, credentials are not forwarded to another host
+                headers.pop("Authorization", None)
+            if response.status_code == 303:
+                method, body = "GET", None
+            url = next_url
+        return response
+
+    async def _request_once(
+        self, method: str, url: str, headers: dict[str, str], body: bytes | None
+    ) -> AsyncResponse:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        async with self._limit(key):
+            # A pooled connection may have been closed by the server while
+            # idle; that only shows on use, so retry once on a fresh one
+            for attempt in range(2):
+                conn, reused = await self._acquire(key)
+                try:
+                    response, reusable = await asyncio.wait_for(
+                        self._exchange(conn, method, url, target, parts.netloc, headers, body),
+                        self.timeout,
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    self._discard(conn)
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    self._discard(conn)
+                    raise
+
+                if reusable:
+                    self._idle.setdefault(key, []).append(conn)
+                else:
+                    self._discard(conn)
+                return response
+
+    def _limit(self, key: HostKey) -> asyncio.Semaphore:
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.max_per_host)
+        return self._limits[key]
+
+    async def _acquire(self, key: HostKey) -> tuple[Connection, bool]:
+        idle = self._idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if not conn[1].is_closing():
+                return conn, True
+            self._discard(conn)
+
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context), self.timeout
+        )
+        self.connections_opened += 1
+        return conn, False
+
+    async def _exchange(
+        self,
+        conn: Connection,
+        method: str,
+        url: str,
+        target: str,
+        host: str,
+        headers: dict[str, str],
+        body: bytes | None,
+    ) -> tuple[AsyncResponse, bool]:
+        reader, writer = conn
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}"]
+        request_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive", **headers}
+        if body is not None:
+            request_headers["Content-Length"] = str(len(body))
+        lines.extend(f"{name}: {value}" for name, value in request_headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await writer.drain()
+        self.requests_sent += 1
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response")
+        version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+        status_code = int(status)
+
+        response_headers = CaseInsensitiveDict()
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip(), value.strip()
+            if name in response_headers:
+                value = f"{response_headers[name]}, {value}"
+            response_headers[name] = value
+
+        connection = response_headers.get("connection", "").lower()
+        reusable = (
+            connection != "close"
+            if version == "HTTP/1.1"
+            else connection == "keep-alive"
+        )
+
+        if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b""
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            content = await self._read_chunked(reader)
+        elif "content-length" in response_headers:
+            content = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            content = await reader.read()
+            reusable = False
+
+        self.bytes_received += len(content)
+        if response_headers.get("content-encoding", "").lower() == "gzip":
+            content = gzip.decompress(content)
+        return AsyncResponse(url, status_code, response_headers, content), reusable
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        parts = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            parts.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def _discard(self, conn: Connection) -> None:
+        conn[1].close()
+
+    async def close(self) -> None:
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -1,132 +1,412 @@
+import hashlib
 import json
 import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
 from github import Repository
 
+from src.ingestion.instrumentation import BLOB_CACHE_LOOKUPS
 from src.ingestion.models import FileContent, RepoMetadata
+from src.metrics import record_stage
 
 logger = logging.getLogger(__name__)
 
 
+def git_blob_sha(data: bytes) -> str:
+    # Same id git and the GitHub API give the blob, so archive and tree
+    # crawls share cache entries
+    digest = hashlib.sha1(f"blob {len(data)}\0".encode("ascii"))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+@dataclass
+class RepoSnapshot:
+    commit_sha: str | None
+    metadata: RepoMetadata
+    files: list[FileContent]
+
+
 class RepoCache:
     DEFAULT_CACHE_DIR = Path(".cache/repos")
+    DB_NAME = "cache.db"
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS repos (
+        full_name TEXT PRIMARY KEY,
+        commit_sha TEXT,
+        metadata TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS files (
+        repo_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        sha TEXT NOT NULL,
+        language TEXT,
+        repo_url TEXT NOT NULL,
+        last_modified TEXT,
+        size INTEGER NOT NULL,
+        PRIMARY KEY (repo_name, path)
+    );
+    CREATE INDEX IF NOT EXISTS files_sha ON files (sha);
+    CREATE TABLE IF NOT EXISTS blobs (
+        sha TEXT PRIMARY KEY,
+        content BLOB NOT NULL
+    );
+    """
+
+    FILE_COLUMNS = "path, sha, language, repo_name, repo_url, last_modified, size"
 
     def __init__(self, cache_dir: Path | None = None):
         self.cache_dir = cache_dir or self.DEFAULT_CACHE_DIR
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-
-    def _get_cache_path(self, repo_full_name: str) -> Path:
-        safe_name = repo_full_name.replace("/", "_")
-        return self.cache_dir / f"{safe_name}.json"
+        self.db_path = self.cache_dir / self.DB_NAME
+        # One connection shared by the crawler threads, serialized by a lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        self._conn.executescript(self.SCHEMA)
 
     def load(
-        self, repo: Repository.Repository
+        self, repo: Repository.Repository, commit_sha: str | None = None
     ) -> tuple[list[FileContent], RepoMetadata] | None:
-        cache_path = self._get_cache_path(repo.full_name)
-        if not cache_path.exists():
+        snapshot = self.load_snapshot(repo.full_name)
+        if not snapshot or not self.is_fresh(snapshot, repo, commit_sha):
             return None
 
-        try:
-            with open(cache_path, "r") as f:
-                data = json.load(f)
+        files = list(self.iter_files(repo.full_name))
+        if len(files) != len(snapshot.files):
+            logger.warning(f"Missing cached blobs for {repo.full_name}")
+            return None
 
-            cached_updated = (
-                datetime.fromisoformat(data["metadata"]["updated_at"])
-                if data["metadata"]["updated_at"]
-                else None
-            )
+        logger.info(f"Loaded {len(files)} files from cache for {repo.full_name}")
+        return files, snapshot.metadata
 
-            # Check if repo was updated since cache
-            if cached_updated and repo.updated_at and repo.updated_at > cached_updated:
-                logger.info(f"Cache outdated for {repo.full_name}, re-crawling")
-                return None
-
-            metadata = RepoMetadata(
-                name=data["metadata"]["name"],
-                full_name=data["metadata"]["full_name"],
-                url=data["metadata"]["url"],
-                private=data["metadata"]["private"],
-                description=data["metadata"]["description"],
-                languages=data["metadata"]["languages"],
-                topics=data["metadata"]["topics"],
-                created_at=datetime.fromisoformat(data["metadata"]["created_at"])
-                if data["metadata"]["created_at"]
-                else None,
-                updated_at=cached_updated,
-                total_commits=data["metadata"]["total_commits"],
-            )
+    def is_fresh(
+        self,
+        snapshot: RepoSnapshot,
+        repo: Repository.Repository,
+        commit_sha: str | None = None,
+    ) -> bool:
+        if commit_sha:
+            if snapshot.commit_sha != commit_sha:
+                logger.info(f"Cache outdated for {repo.full_name}, syncing changes")
+                return False
+        elif (
+            snapshot.metadata.updated_at
+            and repo.updated_at
+            and repo.updated_at > snapshot.metadata.updated_at
+        ):
+            logger.info(f"Cache outdated for {repo.full_name}, re-crawling")
+            return False
+        return True
 
-            files = [
-                FileContent(
-                    path=f["path"],
-                    content=f["content"],
-                    language=f["language"],
-                    repo_name=f["repo_name"],
-                    repo_url=f["repo_url"],
-                    last_modified=datetime.fromisoformat(f["last_modified"])
-                    if f["last_modified"]
-                    else None,
-                    size=f["size"],
-                )
-                for f in data["files"]
-            ]
+    def commit_sha(self, repo_full_name: str) -> str | None:
+        # Commit the cached snapshot was taken at, without loading it
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT commit_sha FROM repos WHERE full_name = ?", (repo_full_name,)
+            ).fetchone()
+        return row[0] if row else None
 
-            logger.info(f"Loaded {len(files)} files from cache for {repo.full_name}")
-            return files, metadata
+    def load_snapshot(self, repo_full_name: str) -> RepoSnapshot | None:
+        # File records come back with empty content, see iter_files/load_file
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT commit_sha, metadata FROM repos WHERE full_name = ?",
+                (repo_full_name,),
+            ).fetchone()
+        if not row:
+            return None
 
+        try:
+            metadata = self._metadata_from_json(json.loads(row[1]))
         except (json.JSONDecodeError, KeyError) as e:
-            logger.warning(f"Invalid cache for {repo.full_name}: {e}")
+            logger.warning(f"Invalid cache for {repo_full_name}: {e}")
+            return None
+
+        return RepoSnapshot(
+            commit_sha=row[0],
+            metadata=metadata,
+            files=self.list_files(repo_full_name),
+        )
+
+    def list_files(self, repo_full_name: str) -> list[FileContent]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.FILE_COLUMNS} FROM files WHERE repo_name = ? ORDER BY path",
+                (repo_full_name,),
+            ).fetchall()
+        return [self._file_from_row(row, "") for row in rows]
+
+    def load_file(self, repo_full_name: str, path: str) -> FileContent | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._qualified_columns()}, b.content FROM files f "
+                "JOIN blobs b ON b.sha = f.sha WHERE f.repo_name = ? AND f.path = ?",
+                (repo_full_name, path),
+            ).fetchone()
+        if not row:
+            return None
+        return self._file_from_row(row[:-1], row[-1])
+
+    def iter_files(
+        self, repo_full_name: str, batch_size: int = 256, lazy: bool = False
+    ) -> Iterator[FileContent]:
+        # Contents are pulled in batches, so only batch_size files are held
+        # at a time. Lazy files only carry a handle into the blob store.
+        if lazy:
+            for file in self.list_files(repo_full_name):
+                file.content = self.blob_loader(file.sha)
+                yield file
+            return
+
+        last_path = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {self._qualified_columns()}, b.content FROM files f "
+                    "JOIN blobs b ON b.sha = f.sha "
+                    "WHERE f.repo_name = ? AND f.path > ? ORDER BY f.path LIMIT ?",
+                    (repo_full_name, last_path, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._file_from_row(row[:-1], row[-1])
+            last_path = rows[-1][0]
+
+    def get_blob(self, sha: str | None) -> str | None:
+        data = self.get_blob_bytes(sha)
+        return data.decode("utf-8") if data is not None else None
+
+    def get_blob_bytes(self, sha: str | None) -> bytes | None:
+        if not sha:
             return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM blobs WHERE sha = ?", (sha,)
+            ).fetchone()
+        BLOB_CACHE_LOOKUPS.inc(result="hit" if row else "miss")
+        return row[0] if row else None
+
+    def blob_loader(self, sha: str) -> Callable[[], bytes]:
+        # Lazy FileContent handle; the blob is read on every access
+        def load() -> bytes:
+            data = self.get_blob_bytes(sha)
+            if data is None:
+                raise KeyError(f"Blob {sha} is not cached")
+            return data
+
+        return load
+
+    def locations(self, sha: str) -> list[tuple[str, str]]:
+        # Every cached (repo, path) whose content is this blob
+        with self._lock:
+            return self._conn.execute(
+                "SELECT repo_name, path FROM files WHERE sha = ? ORDER BY repo_name, path",
+                (sha,),
+            ).fetchall()
+
+    def dedup_stats(self) -> dict[str, int]:
+        # Files reference blobs; every blob is stored once however many
+        # repos and paths hold it
+        with self._lock:
+            files, blobs, referenced = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha), COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+            stored = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(content)), 0) FROM blobs"
+            ).fetchone()[0]
+        return {
+            "files": files,
+            "unique_blobs": blobs,
+            "referenced_bytes": referenced,
+            "stored_bytes": stored,
+        }
+
+    def has_blob(self, sha: str | None) -> bool:
+        if not sha:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM blobs WHERE sha = ?", (sha,)
+            ).fetchone()
+        return row is not None
+
+    def put_blob(self, content: str | bytes, sha: str | None = None) -> str:
+        with self._lock, self._conn:
+            return self._put_blob(content, sha)
+
+    def _put_blob(self, content: str | bytes, sha: str | None = None) -> str:
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        sha = sha or git_blob_sha(data)
+        # Content addressed, an existing blob is already correct
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs (sha, content) VALUES (?, ?)", (sha, data)
+        )
+        return sha
 
     def save(
-        self, repo_full_name: str, files: list[FileContent], metadata: RepoMetadata
+        self,
+        repo_full_name: str,
+        files: list[FileContent],
+        metadata: RepoMetadata,
+        commit_sha: str | None = None,
     ):
-        cache_path = self._get_cache_path(repo_full_name)
-        data = {
-            "metadata": {
-                "name": metadata.name,
-                "full_name": metadata.full_name,
-                "url": metadata.url,
-                "private": metadata.private,
-                "description": metadata.description,
-                "languages": metadata.languages,
-                "topics": metadata.topics,
-                "created_at": metadata.created_at.isoformat()
-                if metadata.created_at
-                else None,
-                "updated_at": metadata.updated_at.isoformat()
-                if metadata.updated_at
-                else None,
-                "total_commits": metadata.total_commits,
-            },
-            "files": [
-                {
-                    "path": f.path,
-                    "content": f.content,
-                    "language": f.language,
-                    "repo_name": f.repo_name,
-                    "repo_url": f.repo_url,
-                    "last_modified": f.last_modified.isoformat()
-                    if f.last_modified
-                    else None,
-                    "size": f.size,
-                }
+        started = time.perf_counter()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE repo_name = ?", (repo_full_name,))
+            self._upsert_files(files)
+            self._save_repo(repo_full_name, metadata, commit_sha)
+        record_stage("cache_save", time.perf_counter() - started, len(files))
+        logger.debug(f"Saved {len(files)} files to cache for {repo_full_name}")
+
+    def update_files(
+        self,
+        repo_full_name: str,
+        upserts: Iterable[FileContent] = (),
+        removed_paths: Iterable[str] = (),
+        commit_sha: str | None = None,
+        metadata: RepoMetadata | None = None,
+    ):
+        upserts = list(upserts)
+        removed_paths = list(removed_paths)
+        # All or nothing: a crash leaves the previous snapshot intact
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE repo_name = ? AND path = ?",
+                [(repo_full_name, path) for path in removed_paths],
+            )
+            self._upsert_files(upserts)
+            if metadata:
+                self._save_repo(repo_full_name, metadata, commit_sha)
+            else:
+                self._conn.execute(
+                    "UPDATE repos SET commit_sha = ? WHERE full_name = ?",
+                    (commit_sha, repo_full_name),
+                )
+        logger.debug(
+            f"Updated {len(upserts)} and removed {len(removed_paths)} cached files "
+            f"for {repo_full_name}"
+        )
+
+    def _upsert_files(self, files: list[FileContent]) -> None:
+        for f in files:
+            # Index-only records (no content) point at a blob stored earlier
+            if f.has_content or not f.sha:
+                f.sha = self._put_blob(f.data, f.sha)
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO files ({self.FILE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    f.path,
+                    f.sha,
+                    f.language,
+                    f.repo_name,
+                    f.repo_url,
+                    f.last_modified.isoformat() if f.last_modified else None,
+                    f.size,
+                )
                 for f in files
             ],
-        }
-        with open(cache_path, "w") as f:
-            json.dump(data, f)
-        logger.debug(f"Saved {len(files)} files to cache for {repo_full_name}")
+        )
+
+    def _save_repo(
+        self, repo_full_name: str, metadata: RepoMetadata, commit_sha: str | None
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO repos (full_name, commit_sha, metadata) VALUES (?, ?, ?)",
+            (repo_full_name, commit_sha, json.dumps(self._metadata_to_json(metadata))),
+        )
+
+    def prune_blobs(self) -> int:
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM blobs WHERE sha NOT IN (SELECT sha FROM files)"
+            ).rowcount
+        logger.info(f"Pruned {removed} unreferenced blobs")
+        return removed
 
     def clear(self, repo_full_name: str | None = None):
-        if repo_full_name:
-            cache_path = self._get_cache_path(repo_full_name)
-            if cache_path.exists():
-                cache_path.unlink()
+        with self._lock, self._conn:
+            if repo_full_name:
+                self._conn.execute(
+                    "DELETE FROM files WHERE repo_name = ?", (repo_full_name,)
+                )
+                self._conn.execute(
+                    "DELETE FROM repos WHERE full_name = ?", (repo_full_name,)
+                )
                 logger.info(f"Cleared cache for {repo_full_name}")
-        else:
-            for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
-            logger.info("Cleared all cache")
+            else:
+                for table in ("files", "repos", "blobs"):
+                    self._conn.execute(f"DELETE FROM {table}")
+                logger.info("Cleared all cache")
+
+    def close(self):
+        self._conn.close()
+
+    @classmethod
+    def _qualified_columns(cls) -> str:
+        return ", ".join(f"f.{c.strip()}" for c in cls.FILE_COLUMNS.split(","))
+
+    @staticmethod
+    def _file_from_row(row, content: str | bytes) -> FileContent:
+        path, sha, language, repo_name, repo_url, last_modified, size = row
+        return FileContent(
+            path=path,
+            content=content,
+            language=language,
+            repo_name=repo_name,
+            repo_url=repo_url,
+            last_modified=datetime.fromisoformat(last_modified)
+            if last_modified
+            else None,
+            size=size,
+            sha=sha,
+        )
+
+    @staticmethod
+    def _metadata_to_json(metadata: RepoMetadata) -> dict:
+        return {
+            "name": metadata.name,
+            "full_name": metadata.full_name,
+            "url": metadata.url,
+            "private": metadata.private,
+            "description": metadata.description,
+            "languages": metadata.languages,
+            "topics": metadata.topics,
+            "created_at": metadata.created_at.isoformat()
+            if metadata.created_at
+            else None,
+            "updated_at": metadata.updated_at.isoformat()
+            if metadata.updated_at
+            else None,
+            "total_commits": metadata.total_commits,
+        }
+
+    @staticmethod
+    def _metadata_from_json(data: dict) -> RepoMetadata:
+        return RepoMetadata(
+            name=data["name"],
+            full_name=data["full_name"],
+            url=data["url"],
+            private=data["private"],
+            description=data["description"],
+            languages=data["languages"],
+            topics=data["topics"],
+            created_at=datetime.fromisoformat(data["created_at"])
+            if data["created_at"]
+            else None,
+            updated_at=datetime.fromisoformat(data["updated_at"])
+            if data["updated_at"]
+            else None,
+            total_commits=data["total_commits"],
+        )
@@ -0,0 +1,229 @@
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
+from dataclasses import replace
+from pathlib import Path
+
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.chunker import Chunker
+from src.ingestion.instrumentation import CHUNK_CACHE_LOOKUPS, DEDUP_HITS
+from src.ingestion.models import Chunk, FileContent
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkCache:
+    DEFAULT_CACHE_DIR = Path(".cache/chunks")
+    DB_NAME = "chunks.db"
+    WINDOW_SIZE = 256
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS chunk_sets (
+        key TEXT PRIMARY KEY
+    );
+    CREATE TABLE IF NOT EXISTS chunks (
+        key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        node_type TEXT NOT NULL,
+        start_byte INTEGER NOT NULL,
+        end_byte INTEGER NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        PRIMARY KEY (key, seq)
+    );
+    CREATE TABLE IF NOT EXISTS file_refs (
+        repo_name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (repo_name, path)
+    );
+    CREATE INDEX IF NOT EXISTS file_refs_key ON file_refs (key);
+    """
+
+    def __init__(self, cache_dir: Path | None = None):
+        self.cache_dir = cache_dir or self.DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            self.cache_dir / self.DB_NAME, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(file: FileContent, chunker: Chunker) -> str:
+        content_sha = file.sha or git_blob_sha(file.data)
+        return f"{content_sha}:{file.language}:{chunker.config_key}"
+
+    def chunk_files(
+        self,
+        chunker: Chunker,
+        files: Iterable[FileContent],
+        max_workers: int | None = 1,
+        executor: Executor | None = None,
+    ) -> Iterator[list[Chunk]]:
+        # Works through the stream one window at a time so only cache
+        # misses reach the (possibly multi-process) chunker
+        window: list[FileContent] = []
+        for file in files:
+            window.append(file)
+            if len(window) >= self.WINDOW_SIZE:
+                yield from self._chunk_window(chunker, window, max_workers, executor)
+                window = []
+        if window:
+            yield from self._chunk_window(chunker, window, max_workers, executor)
+
+    def _chunk_window(
+        self,
+        chunker: Chunker,
+        files: list[FileContent],
+        max_workers: int | None,
+        executor: Executor | None = None,
+    ) -> list[list[Chunk]]:
+        keys = [self.cache_key(file, chunker) for file in files]
+        # Referenced before anything is looked up or stored: eviction, which
+        # may run for another repo meanwhile, only drops unreferenced sets
+        self._ref_files(files, keys)
+        results = [self.get(file, key) for file, key in zip(files, keys)]
+        missing = [i for i, chunks in enumerate(results) if chunks is None]
+        # The same blob at several paths (vendored copies, forks) is parsed
+        # once; the other copies are sliced from the stored spans
+        first: dict[str, int] = {}
+        for i in missing:
+            first.setdefault(keys[i], i)
+        unique = list(first.values())
+        duplicates = len(missing) - len(unique)
+
+        # Windows may be chunked from several pipeline threads at once
+        with self._lock:
+            self.hits += len(files) - len(missing)
+            self.misses += len(missing)
+        CHUNK_CACHE_LOOKUPS.inc(len(files) - len(missing), result="hit")
+        CHUNK_CACHE_LOOKUPS.inc(len(missing), result="miss")
+        DEDUP_HITS.inc(duplicates, stage="chunk")
+
+        if unique:
+            fresh = chunker.chunk_files(
+                [files[i] for i in unique], max_workers=max_workers, executor=executor
+            )
+            for i, chunks in zip(unique, fresh):
+                # Fallback chunks are not stored, so the file is parsed
+                # again once its grammar loads
+                if not chunker.is_fallback(files[i], chunks):
+                    self.put(files[i], keys[i], chunks)
+                results[i] = chunks
+            for i in missing:
+                if results[i] is None:
+                    results[i] = self.get(files[i], keys[i])
+                if results[i] is None:
+                    results[i] = [
+                        replace(chunk, repo_name=files[i].repo_name, path=files[i].path)
+                        for chunk in results[first[keys[i]]]
+                    ]
+        return results
+
+    def get(self, file: FileContent, key: str) -> list[Chunk] | None:
+        with self._lock:
+            known = self._conn.execute(
+                "SELECT 1 FROM chunk_sets WHERE key = ?", (key,)
+            ).fetchone()
+            if not known:
+                return None
+            rows = self._conn.execute(
+                "SELECT node_type, start_byte, end_byte, start_line, end_line "
+                "FROM chunks WHERE key = ? ORDER BY seq",
+                (key,),
+            ).fetchall()
+
+        source = file.data
+        return [
+            Chunk(
+                repo_name=file.repo_name,
+                path=file.path,
+                language=file.language,
+                node_type=node_type,
+                start_byte=start_byte,
+                end_byte=end_byte,
+                start_line=start_line,
+                end_line=end_line,
+                content=source[start_byte:end_byte].decode("utf-8", errors="replace"),
+                blob_sha=file.sha,
+            )
+            for node_type, start_byte, end_byte, start_line, end_line in rows
+        ]
+
+    def put(self, file: FileContent, key: str, chunks: list[Chunk]) -> None:
+        # Only byte ranges are stored, the text is sliced from the file
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            self._conn.executemany(
+                "INSERT INTO chunks (key, seq, node_type, start_byte, end_byte, "
+                "start_line, end_line) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        key,
+                        seq,
+                        c.node_type,
+                        c.start_byte,
+                        c.end_byte,
+                        c.start_line,
+                        c.end_line,
+                    )
+                    for seq, c in enumerate(chunks)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chunk_sets (key) VALUES (?)", (key,)
+            )
+
+    def _ref_files(self, files: list[FileContent], keys: list[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_refs (repo_name, path, key) VALUES (?, ?, ?)",
+                [(f.repo_name, f.path, key) for f, key in zip(files, keys)],
+            )
+
+    def evict_missing(self, repo_name: str, present_paths: Iterable[str]) -> int:
+        present = set(present_paths)
+        with self._lock:
+            known = [
+                path
+                for (path,) in self._conn.execute(
+                    "SELECT path FROM file_refs WHERE repo_name = ?", (repo_name,)
+                )
+            ]
+        return self.evict_paths(repo_name, [path for path in known if path not in present])
+
+    def evict_paths(self, repo_name: str, paths: Iterable[str]) -> int:
+        gone = list(paths)
+        with self._lock, self._conn:
+            removed = sum(
+                self._conn.execute(
+                    "DELETE FROM file_refs WHERE repo_name = ? AND path = ?",
+                    (repo_name, path),
+                ).rowcount
+                for path in gone
+            )
+            # Chunk sets are shared by identical files, drop only orphans
+            self._conn.execute(
+                "DELETE FROM chunk_sets WHERE key NOT IN (SELECT key FROM file_refs)"
+            )
+            self._conn.execute(
+                "DELETE FROM chunks WHERE key NOT IN (SELECT key FROM chunk_sets)"
+            )
+        if removed:
+            logger.info(f"Evicted chunks for {removed} removed files in {repo_name}")
+        return removed
+
+    def clear(self):
+        with self._lock, self._conn:
+            for table in ("chunks", "chunk_sets", "file_refs"):
+                self._conn.execute(f"DELETE FROM {table}")
+        logger.info("Cleared chunk cache")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,401 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from tree_sitter_language_pack import get_parser
+
+from src.ingestion.models import Chunk, FileContent
+from src.metrics import timed_iter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LanguageSpec:
+    grammar: str
+    node_types: frozenset[str]
+
+
+# Keyed by the language names of GitHubClient.EXT_TO_LANG_MAP
+LANGUAGE_REGISTRY: dict[str, LanguageSpec] = {
+    "Python": LanguageSpec(
+        "python",
+        frozenset({"function_definition", "class_definition", "decorated_definition"}),
+    ),
+    "Rust": LanguageSpec(
+        "rust",
+        frozenset(
+            {
+                "function_item",
+                "impl_item",
+                "struct_item",
+                "enum_item",
+                "trait_item",
+                "mod_item",
+                "macro_definition",
+            }
+        ),
+    ),
+    "C": LanguageSpec(
+        "c",
+        frozenset(
+            {
+                "function_definition",
+                "struct_specifier",
+                "enum_specifier",
+                "type_definition",
+            }
+        ),
+    ),
+    "C++": LanguageSpec(
+        "cpp",
+        frozenset(
+            {
+                "function_definition",
+                "class_specifier",
+                "struct_specifier",
+                "namespace_definition",
+                "template_declaration",
+            }
+        ),
+    ),
+    "JavaScript": LanguageSpec(
+        "javascript",
+        frozenset(
+            {
+                "function_declaration",
+                "class_declaration",
+                "lexical_declaration",
+                "export_statement",
+            }
+        ),
+    ),
+    "TypeScript": LanguageSpec(
+        "typescript",
+        frozenset(
+            {
+                "function_declaration",
+                "class_declaration",
+                "interface_declaration",
+                "type_alias_declaration",
+                "enum_declaration",
+                "lexical_declaration",
+                "export_statement",
+            }
+        ),
+    ),
+    "C#": LanguageSpec(
+        "csharp",
+        frozenset(
+            {
+                "namespace_declaration",
+                "class_declaration",
+                "interface_declaration",
+                "struct_declaration",
+                "enum_declaration",
+                "method_declaration",
+            }
+        ),
+    ),
+    "PHP": LanguageSpec(
+        "php",
+        frozenset(
+            {
+                "function_definition",
+                "class_declaration",
+                "interface_declaration",
+                "trait_declaration",
+            }
+        ),
+    ),
+    "R": LanguageSpec("r", frozenset({"binary_operator", "function_definition"})),
+    "Vue": LanguageSpec(
+        "vue", frozenset({"template_element", "script_element", "style_element"})
+    ),
+    "HTML": LanguageSpec(
+        "html", frozenset({"element", "script_element", "style_element"})
+    ),
+    "CSS": LanguageSpec(
+        "css", frozenset({"rule_set", "media_statement", "keyframes_statement"})
+    ),
+    "Shell": LanguageSpec("bash", frozenset({"function_definition"})),
+}
+
+ParserFactory = Callable[[str], object]
+
+# Parsers are not thread safe and expensive to create, so every thread (and
+# every worker process) keeps one per grammar
+_local = threading.local()
+# tree-sitter-language-pack downloads grammars on first use; one that failed
+# to load is tried again after this long rather than never
+PARSER_RETRY_SECONDS = 60.0
+
+
+def _cached_parser(factory: ParserFactory, grammar: str):
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+        _local.failed = {}
+
+    key = (factory, grammar)
+    if key not in parsers:
+        failed_at = _local.failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < PARSER_RETRY_SECONDS:
+            return None
+        try:
+            parsers[key] = factory(grammar)
+        except Exception as e:
+            logger.warning(f"No parser for {grammar}, falling back to line chunks: {e}")
+            _local.failed[key] = time.monotonic()
+            return None
+        _local.failed.pop(key, None)
+    return parsers[key]
+
+
+@dataclass
+class _Span:
+    start: int
+    end: int
+    node_type: str
+
+
+class Chunker:
+    VERSION = 1
+    DEFAULT_MAX_TOKENS = 512
+    # Rough average for source code, good enough to size chunks
+    BYTES_PER_TOKEN = 4
+    TEXT_NODE_TYPE = "text"
+    MODULE_NODE_TYPE = "module"
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        parser_factory: ParserFactory = get_parser,
+    ):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+
+        self.max_tokens = max_tokens
+        self.max_bytes = max_tokens * self.BYTES_PER_TOKEN
+        self.parser_factory = parser_factory
+
+    @property
+    def config_key(self) -> str:
+        return f"v{self.VERSION}:max_tokens={self.max_tokens}"
+
+    def is_fallback(self, file: FileContent, chunks: list[Chunk]) -> bool:
+        # Line windows standing in for the AST chunks of a language whose
+        # grammar failed to load
+        return file.language in LANGUAGE_REGISTRY and any(
+            chunk.node_type == self.TEXT_NODE_TYPE for chunk in chunks
+        )
+
+    def chunk_file(self, file: FileContent) -> list[Chunk]:
+        source = file.data
+        spec = LANGUAGE_REGISTRY.get(file.language)
+        parser = _cached_parser(self.parser_factory, spec.grammar) if spec else None
+
+        if parser is None:
+            spans = self._split_lines(source, 0, len(source), self.TEXT_NODE_TYPE)
+        else:
+            root = parser.parse(source).root_node
+            spans = self._chunk_top_level(root, spec.node_types, source)
+
+        line_starts = self._line_starts(source)
+        view = memoryview(source)
+        chunks = []
+        for span in spans:
+            piece = view[span.start : span.end]
+            # Only the chunk text itself is decoded, never the whole file again
+            text = bytes(piece).decode("utf-8", errors="replace")
+            if not text.strip():
+                continue
+            chunks.append(
+                Chunk(
+                    repo_name=file.repo_name,
+                    path=file.path,
+                    language=file.language,
+                    node_type=span.node_type,
+                    start_byte=span.start,
+                    end_byte=span.end,
+                    start_line=bisect_right(line_starts, span.start),
+                    end_line=bisect_right(line_starts, max(span.end - 1, span.start)),
+                    content=text,
+                    blob_sha=file.sha,
+                )
+            )
+        return chunks
+
+    def chunk_files(
+        self,
+        files: Iterable[FileContent],
+        max_workers: int | None = 1,
+        batch_size: int = 16,
+        executor: Executor | None = None,
+    ) -> Iterator[list[Chunk]]:
+        # Yields one chunk list per file, in input order. An executor passed
+        # in (a pipeline's long-lived process pool) is used instead of
+        # starting a pool per call
+        return timed_iter(
+            "chunk", self._chunk_files(files, max_workers, batch_size, executor)
+        )
+
+    def _chunk_files(
+        self,
+        files: Iterable[FileContent],
+        max_workers: int | None,
+        batch_size: int,
+        executor: Executor | None,
+    ) -> Iterator[list[Chunk]]:
+        if executor is None and max_workers == 1:
+            yield from map(self.chunk_file, files)
+            return
+
+        workers = max_workers or os.cpu_count() or 1
+        if executor is not None:
+            yield from self._submit_batches(executor, files, batch_size, workers)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from self._submit_batches(pool, files, batch_size, workers)
+
+    def _submit_batches(
+        self, pool: Executor, files: Iterable[FileContent], batch_size: int, workers: int
+    ) -> Iterator[list[Chunk]]:
+        # Bounded submission keeps a streamed corpus from piling up in the
+        # task queue
+        window: deque[Future] = deque()
+        for batch in self._batched(files, batch_size):
+            window.append(pool.submit(self._chunk_batch, batch))
+            if len(window) >= 2 * workers:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+    def _chunk_batch(self, files: list[FileContent]) -> list[list[Chunk]]:
+        return [self.chunk_file(file) for file in files]
+
+    @staticmethod
+    def _batched(files: Iterable[FileContent], size: int) -> Iterator[list[FileContent]]:
+        batch: list[FileContent] = []
+        for file in files:
+            batch.append(file)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _chunk_top_level(
+        self, root, node_types: frozenset[str], source: bytes
+    ) -> list[_Span]:
+        # Definitions become their own chunks, everything in between
+        # (imports, statements, comments) is grouped into module chunks
+        spans: list[_Span] = []
+        gap_start: int | None = None
+        gap_end = 0
+
+        def flush_gap():
+            nonlocal gap_start
+            if gap_start is not None:
+                spans.extend(
+                    self._split_range(source, gap_start, gap_end, self.MODULE_NODE_TYPE)
+                )
+                gap_start = None
+
+        for node in root.children:
+            if node.type in node_types:
+                flush_gap()
+                spans.extend(self._split_node(node, node.type, source))
+                continue
+
+            if gap_start is not None and not self._fits(gap_start, node.end_byte):
+                flush_gap()
+            if gap_start is None:
+                gap_start = node.start_byte
+            gap_end = node.end_byte
+
+        flush_gap()
+        return spans
+
+    def _split_node(self, node, node_type: str, source: bytes) -> list[_Span]:
+        if self._fits(node.start_byte, node.end_byte):
+            return [_Span(node.start_byte, node.end_byte, node_type)]
+
+        if not node.children:
+            return self._split_lines(source, node.start_byte, node.end_byte, node_type)
+
+        # Pack consecutive children into windows under the budget, recursing
+        # into children that are too big on their own
+        spans: list[_Span] = []
+        start = end = node.start_byte
+        for child in node.children:
+            if self._fits(start, child.end_byte):
+                end = child.end_byte
+                continue
+
+            if end > start:
+                spans.append(_Span(start, end, node_type))
+
+            if self._fits(end, child.end_byte):
+                start, end = end, child.end_byte
+            else:
+                spans.extend(self._split_node(child, node_type, source))
+                start = end = child.end_byte
+
+        if node.end_byte > start:
+            spans.append(_Span(start, node.end_byte, node_type))
+        return spans
+
+    def _split_range(
+        self, source: bytes, start: int, end: int, node_type: str
+    ) -> list[_Span]:
+        if self._fits(start, end):
+            return [_Span(start, end, node_type)]
+        return self._split_lines(source, start, end, node_type)
+
+    def _split_lines(
+        self, source: bytes, start: int, end: int, node_type: str
+    ) -> list[_Span]:
+        spans: list[_Span] = []
+        window_start = start
+        position = start
+        while position < end:
+            line_end = source.find(b"\n", position, end)
+            line_end = end if line_end == -1 else line_end + 1
+
+            if not self._fits(window_start, line_end) and position > window_start:
+                spans.append(_Span(window_start, position, node_type))
+                window_start = position
+
+            if not self._fits(window_start, line_end):
+                # A single line over budget, cut it on a character boundary
+                cut = window_start + self.max_bytes
+                while cut > window_start and source[cut] & 0xC0 == 0x80:
+                    cut -= 1
+                spans.append(_Span(window_start, cut, node_type))
+                window_start = position = cut
+                continue
+
+            position = line_end
+
+        if end > window_start:
+            spans.append(_Span(window_start, end, node_type))
+        return spans
+
+    def _fits(self, start: int, end: int) -> bool:
+        return end - start <= self.max_bytes
+
+    @staticmethod
+    def _line_starts(source: bytes) -> list[int]:
+        starts = [0]
+        position = source.find(b"\n")
+        while position != -1:
+            starts.append(position + 1)
+            position = source.find(b"\n", position + 1)
+        return starts
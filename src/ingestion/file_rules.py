@@ -0,0 +1,227 @@
+import copy
+import re
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+@dataclass(frozen=True)
+class Rule:
+    # One gitignore-style pattern. reason is what FILES_SKIPPED records when
+    # it excludes a file; negated rules ("!pattern") re-include instead.
+    # Rules from .gitattributes are not recursive: as in git, a pattern
+    # matching a directory does not cover the files inside it, only
+    # "dir/**" does
+    pattern: str
+    negate: bool = False
+    reason: str = "ignored"
+    recursive: bool = True
+
+    @classmethod
+    def parse(cls, line: str, reason: str = "ignored") -> "Rule | None":
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if line.startswith("!"):
+            return cls(line[1:], negate=True, reason=reason)
+        return cls(line.removeprefix("\\"), reason=reason)
+
+    def regex(self) -> str:
+        # Matches every file path the pattern covers; for recursive rules a
+        # matching directory covers everything under it
+        pattern = self.pattern
+        dir_only = pattern.endswith("/")
+        if dir_only and not self.recursive:
+            # "dir/" matches no file in .gitattributes
+            return "(?!)"
+        pattern = pattern.rstrip("/")
+        # As in git, a slash anywhere but the end anchors to the repo root
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        out = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+            elif pattern.startswith("**", i):
+                out.append(".*")
+                i += 2
+            elif pattern[i] == "*":
+                out.append("[^/]*")
+                i += 1
+            elif pattern[i] == "?":
+                out.append("[^/]")
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+                end = pattern.index("]", i + 2)
+                chars = pattern[i + 1 : end]
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                out.append("[" + chars.replace("\\", "\\\\") + "]")
+                i = end + 1
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+
+        prefix = "" if anchored else "(?:.*/)?"
+        if not self.recursive:
+            # Directories (tested with a trailing slash) only match through
+            # a trailing "**", so only "dir/**" prunes
+            suffix = "" if self.pattern.endswith("**") else "(?<!/)"
+        else:
+            suffix = "/.*" if dir_only else "(?:/.*)?"
+        return prefix + "".join(out) + suffix
+
+    def literal_prefix(self) -> str | None:
+        # Leading path without globs for anchored patterns; None when the
+        # pattern can match at any depth
+        pattern = self.pattern.rstrip("/")
+        if "/" not in pattern:
+            return None
+        pattern = pattern.lstrip("/")
+        match = _GLOB_CHARS.search(pattern)
+        return pattern[: match.start()] if match else pattern
+
+
+def parse_attributes(text: str) -> list[Rule]:
+    # linguist-vendored / linguist-generated from a .gitattributes file;
+    # "-attr" or "attr=false" re-includes, which is how repos opt their
+    # own vendored-looking directories back in
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        pattern, *attributes = line.split()
+        for attribute in attributes:
+            name, _, value = attribute.lstrip("-").partition("=")
+            if name not in ("linguist-vendored", "linguist-generated"):
+                continue
+            unset = attribute.startswith("-") or value.lower() in ("false", "0")
+            reason = "vendored" if name == "linguist-vendored" else "generated"
+            rules.append(Rule(pattern, negate=unset, reason=reason, recursive=False))
+    return rules
+
+
+class FileRules:
+    # Include/exclude rules compiled into a single regex. Later rules win,
+    # as in .gitignore: the alternation lists them last to first, so the
+    # first alternative that matches is the last matching rule. Directories
+    # can be tested before they are listed (prunes), file contents after
+    # download (content_reason).
+    MINIFIED_PATTERNS = ("*.min.js", "*.min.css", "*-min.js", "*.bundle.js")
+    GENERATED_MARKERS = (b"@generated", b"Code generated", b"DO NOT EDIT", b"<auto-generated")
+    # Markers only count in a comment line (// Code generated ... DO NOT
+    # EDIT.), so docs that merely mention them are kept
+    GENERATED_LINE = re.compile(
+        rb"^[ \t]*(?://|/?\*|#|--|;|%|<!--|'|\"\"\")[^\n]*?(?:"
+        + b"|".join(map(re.escape, GENERATED_MARKERS))
+        + rb")",
+        re.MULTILINE,
+    )
+    # Only the head of a file is inspected for markers and line length
+    HEAD_BYTES = 4096
+    MINIFIED_LINE_LENGTH = 500
+
+    def __init__(
+        self,
+        rules: Iterable[Rule | str] = (),
+        extensions: Iterable[str] | None = None,
+        repo_rules: Mapping[str, Iterable[Rule | str]] | None = None,
+        detect_generated: bool = True,
+    ):
+        minified = (
+            [Rule(pattern, reason="minified") for pattern in self.MINIFIED_PATTERNS]
+            if detect_generated
+            else []
+        )
+        self.rules: list[Rule] = minified + _parse(rules)
+        # None accepts every extension
+        self.extensions = frozenset(extensions) if extensions is not None else None
+        self.repo_rules = {name: _parse(lines) for name, lines in (repo_rules or {}).items()}
+        self.detect_generated = detect_generated
+        self._per_repo: dict[tuple[str, str | None], FileRules] = {}
+        self._compile()
+
+    def _compile(self) -> None:
+        alternatives = [f"(?P<r{i}>{rule.regex()})" for i, rule in enumerate(self.rules)]
+        self._regex = re.compile("|".join(reversed(alternatives))) if alternatives else None
+        self._included_prefixes = [rule.literal_prefix() for rule in self.rules if rule.negate]
+
+    def for_repo(self, full_name: str, attributes: str | None = None) -> "FileRules":
+        # Base rules, then the repo's .gitattributes, then configured
+        # overrides for the repo; compiled once per combination
+        key = (full_name, attributes)
+        rules = self._per_repo.get(key)
+        if rules is None:
+            extra = (parse_attributes(attributes) if attributes else []) + self.repo_rules.get(
+                full_name, []
+            )
+            rules = self._extend(extra) if extra else self
+            self._per_repo[key] = rules
+        return rules
+
+    def _extend(self, extra: list[Rule]) -> "FileRules":
+        extended = copy.copy(self)
+        extended.rules = self.rules + extra
+        extended.repo_rules = {}
+        extended._per_repo = {}
+        extended._compile()
+        return extended
+
+    def match(self, path: str) -> Rule | None:
+        # Last rule matching the path, if any
+        match = self._regex.fullmatch(path) if self._regex else None
+        return self.rules[int(match.lastgroup[1:])] if match else None
+
+    def skip_reason(self, path: str | Path) -> str | None:
+        if not isinstance(path, str):
+            path = Path(path).as_posix()
+        rule = self.match(path)
+        if rule and not rule.negate:
+            return rule.reason
+
+        if self.extensions is not None:
+            name = path.rpartition("/")[2]
+            extension = name.rpartition(".")[2] if "." in name.lstrip(".") else ""
+            if extension not in self.extensions:
+                return "extension"
+        return None
+
+    def prunes(self, directory: str) -> bool:
+        # True when nothing under the directory can be included, so it need
+        # not be listed at all. A re-include that could apply below it (or
+        # anywhere, if unanchored) keeps it
+        directory = directory.strip("/") + "/"
+        rule = self.match(directory)
+        if rule is None or rule.negate:
+            return False
+        return not any(
+            prefix is None or prefix.startswith(directory) or directory.startswith(prefix)
+            for prefix in self._included_prefixes
+        )
+
+    def content_reason(self, path: str, data: bytes) -> str | None:
+        # "generated" for files with a generator marker near the top,
+        # "minified" for files whose lines are too long to be hand written
+        if not self.detect_generated:
+            return None
+        rule = self.match(path)
+        if rule and rule.negate and rule.reason == "generated":
+            # -linguist-generated: the repo says it is hand written
+            return None
+        head = bytes(data[: self.HEAD_BYTES])
+        if self.GENERATED_LINE.search(head):
+            return "generated"
+        if len(head) / (head.count(b"\n") + 1) > self.MINIFIED_LINE_LENGTH:
+            return "minified"
+        return None
+
+
+def _parse(rules: Iterable[Rule | str]) -> list[Rule]:
+    parsed = (rule if isinstance(rule, Rule) else Rule.parse(rule) for rule in rules)
+    return [rule for rule in parsed if rule is not None]
@@ -1,9 +1,19 @@
+import logging
 import os
+from collections.abc import Iterable
 from pathlib import Path
 
-from github import Auth, Github, Repository
+import requests
+from github import Auth, Consts, Github, GithubException, Repository
 
+from .file_rules import FileRules
+from .http_cache import HttpCache
+from .instrumentation import ApiMetrics
 from .models import RepoMetadata
+from .rate_limit import RateLimitBudget, RateLimitScheduler
+from .transport import HttpRequest, Middleware, build_chain, install_middlewares
+
+logger = logging.getLogger(__name__)
 
 
 class GitHubClient:
@@ -14,6 +24,13 @@ class GitHubClient:
         ".idea",
         ".vscode",
         "__pycache__",
+        # Dependencies and build output, never worth listing
+        "node_modules",
+        "bower_components",
+        "dist",
+        "vendor",
+        ".venv",
+        "venv",
     }
 
     IGNORED_FILES = {
@@ -78,19 +95,61 @@ class GitHubClient:
         "cfg",
     }
 
-    def __init__(self, token: str | None = None):
+    ARCHIVE_TIMEOUT_SECONDS = 60
+
+    # Metadata fields that cost extra requests; everything else, topics
+    # included, comes with the repo listing payload
+    METADATA_FIELDS = frozenset({"languages", "total_commits"})
+    METADATA_BATCH_SIZE = 50
+
+    def __init__(
+        self,
+        token: str | None = None,
+        pool_size: int | None = None,
+        base_url: str = Consts.DEFAULT_BASE_URL,
+        scheduler: RateLimitScheduler | None = None,
+        http_cache: HttpCache | None = None,
+        rules: FileRules | None = None,
+    ):
         self.token = token or os.getenv(self.GH_TOKEN_ENV_VAR)
         if not self.token:
             raise ValueError("GitHub token is required")
 
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.http_cache = http_cache
+        self.rules = rules or self.default_rules()
+        # The cache sits outside the scheduler: conditional requests are
+        # still paced, but a 304 is answered from disk. Metrics sit inside
+        # it, so they see each request that actually goes out.
+        self.middlewares: list[Middleware] = [self.scheduler, ApiMetrics()]
+        if http_cache:
+            self.middlewares.insert(0, http_cache)
+
         auth = Auth.Token(self.token)
-        self.client = Github(auth=auth)
+        # pool_size should cover the crawler's worker count, otherwise
+        # concurrent requests queue up on the HTTP connection pool. Pacing
+        # and retries are left to the scheduler; PyGithub would otherwise
+        # also hold every GraphQL POST back by a second as a "write".
+        self.client = Github(
+            auth=auth,
+            base_url=base_url,
+            pool_size=pool_size,
+            retry=None,
+            seconds_between_requests=None,
+            seconds_between_writes=None,
+        )
+        install_middlewares(self.client, self.middlewares)
+        self._session = requests.Session()
         self.user = self.client.get_user()
 
     @property
     def username(self) -> str:
         return self.user.login
 
+    @property
+    def rate_limit_budget(self) -> RateLimitBudget | None:
+        return self.scheduler.budget()
+
     def get_repos(self, include_private: bool = True) -> list[Repository.Repository]:
         return [
             repo
@@ -98,34 +157,159 @@ class GitHubClient:
             if include_private or not repo.private
         ]
 
-    def get_repo_metadata(self, repo: Repository.Repository) -> RepoMetadata:
+    def get_repo(self, full_name: str) -> Repository.Repository:
+        return self.client.get_repo(full_name)
+
+    def get_repos_by_name(self, full_names: Iterable[str]) -> list[Repository.Repository]:
+        # One request per name instead of paging through every repo the
+        # user can see
+        repos = []
+        for full_name in full_names:
+            try:
+                repos.append(self.get_repo(full_name))
+            except GithubException as e:
+                logger.warning(f"Cannot look up repository {full_name}: {e}")
+        return repos
+
+    def get_repo_metadata(
+        self, repo: Repository.Repository, fields: Iterable[str] = ()
+    ) -> RepoMetadata:
+        return self.get_repos_metadata([repo], fields)[0]
+
+    def get_repos_metadata(
+        self, repos: Iterable[Repository.Repository], fields: Iterable[str] = ()
+    ) -> list[RepoMetadata]:
+        # fields picks the expensive parts from METADATA_FIELDS; they are
+        # fetched for up to METADATA_BATCH_SIZE repos per GraphQL request
+        fields = set(fields)
+        unknown = fields - self.METADATA_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown metadata fields: {sorted(unknown)}")
+
+        repos = list(repos)
+        metadata = [self._listing_metadata(repo) for repo in repos]
+        if not fields:
+            return metadata
+
+        pairs = list(zip(repos, metadata))
+        for start in range(0, len(pairs), self.METADATA_BATCH_SIZE):
+            batch = pairs[start : start + self.METADATA_BATCH_SIZE]
+            try:
+                self._fill_metadata_graphql(batch, fields)
+            except GithubException as e:
+                logger.warning(f"Batched metadata query failed, falling back to REST: {e}")
+                for repo, repo_metadata in batch:
+                    self._fill_metadata_rest(repo, repo_metadata, fields)
+        return metadata
+
+    @staticmethod
+    def _listing_metadata(repo: Repository.Repository) -> RepoMetadata:
         return RepoMetadata(
             name=repo.name,
             full_name=repo.full_name,
             url=repo.html_url,
             private=repo.private,
             description=repo.description,
-            languages=repo.get_languages(),
-            topics=repo.get_topics(),
+            topics=list(repo.topics or []),
             created_at=repo.created_at,
             updated_at=repo.updated_at,
-            total_commits=repo.get_commits().totalCount,
         )
 
-    def should_process_file(self, path: str | Path) -> bool:
-        path = Path(path)
-        parts = set(path.parts)
-        if parts.intersection(self.IGNORED_DIRS):
-            return False
-
-        if path.name in self.IGNORED_FILES:
-            return False
-
-        file_extension = path.suffix.lstrip(".")
-        return (
-            file_extension in self.CODE_EXTENSIONS
-            or file_extension in self.DOC_EXTENSIONS
+    def _fill_metadata_rest(
+        self, repo: Repository.Repository, metadata: RepoMetadata, fields: set[str]
+    ) -> None:
+        if "languages" in fields:
+            metadata.languages = repo.get_languages()
+        if "total_commits" in fields:
+            metadata.total_commits = repo.get_commits().totalCount
+
+    def _fill_metadata_graphql(
+        self, batch: list[tuple[Repository.Repository, RepoMetadata]], fields: set[str]
+    ) -> None:
+        variables = {}
+        for i, (repo, _) in enumerate(batch):
+            variables[f"o{i}"], _, variables[f"n{i}"] = repo.full_name.partition("/")
+        _, data = self.client.requester.graphql_query(
+            self._metadata_query(len(batch), fields), variables
+        )
+
+        results = data.get("data") or {}
+        for i, (repo, metadata) in enumerate(batch):
+            node = results.get(f"r{i}")
+            if node is None:
+                logger.warning(f"No metadata returned for {repo.full_name}")
+                continue
+            if "languages" in fields:
+                metadata.languages = {
+                    edge["node"]["name"]: edge["size"]
+                    for edge in (node.get("languages") or {}).get("edges") or []
+                }
+            if "total_commits" in fields:
+                target = (node.get("defaultBranchRef") or {}).get("target") or {}
+                metadata.total_commits = (target.get("history") or {}).get("totalCount", 0)
+
+    @staticmethod
+    def _metadata_query(batch_size: int, fields: set[str]) -> str:
+        selections = []
+        if "languages" in fields:
+            selections.append(
+                "languages(first: 100, orderBy: {field: SIZE, direction: DESC}) "
+                "{ edges { size node { name } } }"
+            )
+        if "total_commits" in fields:
+            selections.append(
+                "defaultBranchRef { target { ... on Commit { history { totalCount } } } }"
+            )
+        body = " ".join(selections)
+        params = ", ".join(f"$o{i}: String!, $n{i}: String!" for i in range(batch_size))
+        repos = "\n".join(
+            f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{ {body} }}"
+            for i in range(batch_size)
         )
+        return f"query({params}) {{\n{repos}\n}}"
+
+    def open_archive(
+        self, repo: Repository.Repository, ref: str | None = None
+    ) -> requests.Response:
+        url = f"{repo.url}/tarball/{ref}" if ref else f"{repo.url}/tarball"
+        request = HttpRequest(
+            verb="GET",
+            url=url,
+            headers={"Authorization": f"Bearer {self.token}"},
+            stream=True,
+        )
+        response = build_chain(self.middlewares, self._send)(request)
+        response.raise_for_status()
+        return response
+
+    def _send(self, request: HttpRequest) -> requests.Response:
+        # Archive downloads redirect to codeload, requests drops the
+        # Authorization header when the host changes
+        return self._session.request(
+            request.verb,
+            request.url,
+            headers=request.headers,
+            data=request.body,
+            stream=request.stream,
+            timeout=self.ARCHIVE_TIMEOUT_SECONDS,
+        )
+
+    @classmethod
+    def default_rules(cls) -> FileRules:
+        # The class-level sets as compiled rules: ignored directories at
+        # any depth, ignored file names, and the indexed extensions
+        return FileRules(
+            [f"{name}/" for name in sorted(cls.IGNORED_DIRS)] + sorted(cls.IGNORED_FILES),
+            extensions=cls.CODE_EXTENSIONS | cls.DOC_EXTENSIONS,
+        )
+
+    def should_process_file(self, path: str | Path) -> bool:
+        return self.skip_reason(path) is None
+
+    def skip_reason(self, path: str | Path) -> str | None:
+        # "ignored" for excluded directories and files, "minified" for
+        # bundles, "extension" for file types that are not indexed
+        return self.rules.skip_reason(path)
 
     def get_language(self, file_path: str) -> str | None:
         ext = Path(file_path).suffix.lstrip(".")
@@ -133,6 +317,7 @@ class GitHubClient:
 
     def close(self):
         self.client.close()
+        self._session.close()
 
     def __enter__(self):
         return self
@@ -0,0 +1,128 @@
+import logging
+from collections.abc import Iterable
+from datetime import datetime
+
+from github import GithubException, Repository
+
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.models import FileContent
+
+logger = logging.getLogger(__name__)
+
+
+class LastModifiedResolver:
+    STRATEGIES = ("graphql", "commits")
+    GRAPHQL_BATCH_SIZE = 50
+
+    def __init__(self, client: GitHubClient, strategy: str = "graphql"):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown last-modified strategy: {strategy}")
+
+        self.client = client
+        self.strategy = strategy
+
+    @property
+    def batch_size(self) -> int | None:
+        # The commit walk covers any number of paths in one pass
+        return self.GRAPHQL_BATCH_SIZE if self.strategy == "graphql" else None
+
+    def apply(
+        self,
+        repo: Repository.Repository,
+        files: list[FileContent],
+        ref: str | None = None,
+    ) -> None:
+        dates = self.resolve(repo, [f.path for f in files], ref=ref)
+        for file in files:
+            file.last_modified = dates.get(file.path)
+
+    def resolve(
+        self,
+        repo: Repository.Repository,
+        paths: Iterable[str],
+        ref: str | None = None,
+    ) -> dict[str, datetime]:
+        pending = set(paths)
+        if not pending:
+            return {}
+
+        ref = ref or repo.default_branch
+        if self.strategy == "graphql":
+            return self._resolve_graphql(repo, sorted(pending), ref)
+        return self._resolve_commits(repo, pending, ref)
+
+    def _resolve_commits(
+        self, repo: Repository.Repository, pending: set[str], ref: str
+    ) -> dict[str, datetime]:
+        # Walk history newest first; the first commit touching a path is its
+        # last modification, and the walk stops once every path is resolved
+        dates: dict[str, datetime] = {}
+        try:
+            for commit in repo.get_commits(sha=ref):
+                touched = {f.filename for f in commit.files}.intersection(pending)
+                if not touched:
+                    continue
+
+                date = commit.commit.author.date
+                for path in touched:
+                    dates[path] = date
+                pending -= touched
+                if not pending:
+                    break
+        except GithubException as e:
+            logger.warning(f"Cannot walk commit history of {repo.full_name}: {e}")
+
+        return dates
+
+    def _resolve_graphql(
+        self, repo: Repository.Repository, paths: list[str], ref: str
+    ) -> dict[str, datetime]:
+        dates: dict[str, datetime] = {}
+        owner, _, name = repo.full_name.partition("/")
+
+        for start in range(0, len(paths), self.GRAPHQL_BATCH_SIZE):
+            batch = paths[start : start + self.GRAPHQL_BATCH_SIZE]
+            variables = {"owner": owner, "name": name, "ref": ref}
+            variables.update({f"p{i}": path for i, path in enumerate(batch)})
+
+            try:
+                _, data = self.client.client.requester.graphql_query(
+                    self._build_query(len(batch)), variables
+                )
+            except GithubException as e:
+                logger.warning(
+                    f"Cannot resolve history batch for {repo.full_name}: {e}"
+                )
+                continue
+
+            commit = ((data.get("data") or {}).get("repository") or {}).get("object")
+            if not commit:
+                continue
+
+            for i, path in enumerate(batch):
+                nodes = (commit.get(f"f{i}") or {}).get("nodes") or []
+                if nodes and nodes[0]["author"]["date"]:
+                    dates[path] = self._parse_date(nodes[0]["author"]["date"])
+
+        return dates
+
+    @staticmethod
+    def _build_query(batch_size: int) -> str:
+        params = "".join(f", $p{i}: String!" for i in range(batch_size))
+        fields = "\n".join(
+            f"f{i}: history(first: 1, path: $p{i}) {{ nodes {{ author {{ date }} }} }}"
+            for i in range(batch_size)
+        )
+        return (
+            f"query($owner: String!, $name: String!, $ref: String!{params}) {{\n"
+            "  repository(owner: $owner, name: $name) {\n"
+            "    object(expression: $ref) {\n"
+            f"      ... on Commit {{\n{fields}\n      }}\n"
+            "    }\n"
+            "  }\n"
+            "}"
+        )
+
+    @staticmethod
+    def _parse_date(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from src.ingestion.instrumentation import HTTP_CACHE_REQUESTS
+from src.ingestion.transport import HttpRequest, Send
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    DEFAULT_CACHE_DIR = Path(".cache/http")
+
+    # Describe the transfer of the original body, not the stored copy
+    DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+    def __init__(self, cache_dir: Path | None = None):
+        self.cache_dir = cache_dir or self.DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, request: HttpRequest, send: Send) -> requests.Response:
+        if request.verb != "GET" or request.stream:
+            return send(request)
+
+        cache_path = self._get_cache_path(request)
+        entry = self._load(cache_path)
+        if entry:
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = send(request)
+
+        if response.status_code == 304 and entry:
+            self.hits += 1
+            HTTP_CACHE_REQUESTS.inc(result="hit")
+            logger.debug(f"HTTP cache hit: {request.url}")
+            return self._build_response(entry, response, request)
+
+        self.misses += 1
+        HTTP_CACHE_REQUESTS.inc(result="miss")
+        if response.status_code == 200:
+            self._save(cache_path, response)
+        return response
+
+    def _get_cache_path(self, request: HttpRequest) -> Path:
+        # Responses depend on who asks, so the token is part of the key
+        key_parts = [
+            request.url,
+            request.headers.get("Accept", ""),
+            request.headers.get("Authorization", ""),
+        ]
+        key = hashlib.sha256("\n".join(key_parts).encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load(self, cache_path: Path) -> dict | None:
+        if not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Invalid HTTP cache entry {cache_path.name}: {e}")
+            return None
+
+    def _save(self, cache_path: Path, response: requests.Response) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        data = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": {
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() not in self.DROPPED_HEADERS
+            },
+            "body": response.text,
+        }
+        # Concurrent crawler threads may write the same entry, each through
+        # its own temp file. A failed write only costs the cache entry
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+            with open(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Cannot write HTTP cache entry {cache_path.name}: {e}")
+            if tmp_path:
+                Path(tmp_path).unlink(missing_ok=True)
+
+    @staticmethod
+    def _build_response(
+        entry: dict, not_modified: requests.Response, request: HttpRequest
+    ) -> requests.Response:
+        headers = CaseInsensitiveDict(entry["headers"])
+        # A 304 carries fresh rate-limit and validator headers
+        headers.update(
+            {
+                k: v
+                for k, v in not_modified.headers.items()
+                if k.lower() not in HttpCache.DROPPED_HEADERS
+            }
+        )
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = headers
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        return response
+
+    def clear(self):
+        for cache_file in self.cache_dir.glob("*/*.json"):
+            cache_file.unlink()
+        logger.info("Cleared HTTP cache")
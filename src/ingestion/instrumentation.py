@@ -0,0 +1,133 @@
+import re
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from src.ingestion.transport import HttpRequest, Send
+from src.metrics import REGISTRY
+
+API_CALLS = REGISTRY.counter(
+    "github_api_calls_total", "GitHub API requests sent", ["endpoint", "status"]
+)
+API_LATENCY = REGISTRY.histogram(
+    "github_api_latency_seconds", "GitHub API request latency", ["endpoint"]
+)
+API_BYTES = REGISTRY.counter(
+    "github_api_response_bytes_total", "GitHub API response body bytes", ["endpoint"]
+)
+RATE_LIMIT_REMAINING = REGISTRY.gauge(
+    "github_rate_limit_remaining", "Requests left in the current window", ["resource"]
+)
+RATE_LIMIT_LIMIT = REGISTRY.gauge(
+    "github_rate_limit_limit", "Requests allowed per window", ["resource"]
+)
+RATE_LIMIT_RESET = REGISTRY.gauge(
+    "github_rate_limit_reset_timestamp", "When the current window resets", ["resource"]
+)
+HTTP_CACHE_REQUESTS = REGISTRY.counter(
+    "http_cache_requests_total", "Cacheable GET requests by outcome", ["result"]
+)
+
+REPO_CACHE_LOOKUPS = REGISTRY.counter(
+    "repo_cache_lookups_total", "Repository snapshot lookups (fresh, stale, miss)", ["result"]
+)
+BLOB_CACHE_LOOKUPS = REGISTRY.counter(
+    "blob_cache_lookups_total", "Blob store lookups by outcome", ["result"]
+)
+CHUNK_CACHE_LOOKUPS = REGISTRY.counter(
+    "chunk_cache_lookups_total", "Chunk cache lookups by outcome", ["result"]
+)
+# stage: crawl (blob downloads), chunk (parses), index (stored rows)
+DEDUP_HITS = REGISTRY.counter(
+    "dedup_hits_total", "Blobs already seen at another repo or path, by stage", ["stage"]
+)
+
+FILES_CRAWLED = REGISTRY.counter(
+    "crawler_files_total", "Files produced by the crawler", ["mode"]
+)
+# reason: ignored, extension, vendored, generated, minified, size, binary,
+# decode_error, empty, error
+FILES_SKIPPED = REGISTRY.counter(
+    "crawler_files_skipped_total", "Files left out of the crawl", ["reason"]
+)
+BYTES_DECODED = REGISTRY.counter(
+    "crawler_bytes_decoded_total", "Raw file bytes decoded to text", ["mode"]
+)
+
+# Path segments that name a resource; anything else (owners, shas, refs,
+# file paths) is an identifier and collapsed to keep label cardinality low
+_REPO_PATH = re.compile(r"^/repos/[^/]+/[^/]+(?:/(?P<rest>.*))?$")
+_TWO_PART = {"git", "actions"}
+
+
+def endpoint_name(url: str) -> str:
+    path = urlsplit(url).path
+    # GitHub Enterprise serves the API under /api/v3
+    if path.startswith("/api/v3/"):
+        path = path[len("/api/v3") :]
+
+    match = _REPO_PATH.match(path)
+    if not match:
+        return path.strip("/") or "/"
+
+    parts = [part for part in (match.group("rest") or "").split("/") if part]
+    if not parts:
+        return "repos/:repo"
+    size = 2 if parts[0] in _TWO_PART and len(parts) > 1 else 1
+    name = "/".join(["repos/:repo", *parts[:size]])
+    return f"{name}/:id" if len(parts) > size else name
+
+
+def record_api_call(
+    url: str, status: str, seconds: float, size: int = 0, headers=None
+) -> None:
+    endpoint = endpoint_name(url)
+    API_CALLS.inc(endpoint=endpoint, status=status)
+    API_LATENCY.observe(seconds, endpoint=endpoint)
+    API_BYTES.inc(size, endpoint=endpoint)
+    if headers is not None:
+        record_rate_limit(headers)
+
+
+def record_rate_limit(headers) -> None:
+    remaining = headers.get("X-RateLimit-Remaining")
+    if remaining is None:
+        return
+    resource = headers.get("X-RateLimit-Resource", "core")
+    try:
+        RATE_LIMIT_REMAINING.set(int(remaining), resource=resource)
+        if headers.get("X-RateLimit-Limit") is not None:
+            RATE_LIMIT_LIMIT.set(int(headers["X-RateLimit-Limit"]), resource=resource)
+        if headers.get("X-RateLimit-Reset") is not None:
+            RATE_LIMIT_RESET.set(int(headers["X-RateLimit-Reset"]), resource=resource)
+    except ValueError:
+        pass
+
+
+class ApiMetrics:
+    # Innermost middleware, so every request that goes on the wire is
+    # counted, scheduler retries and conditional requests included
+    def __call__(self, request: HttpRequest, send: Send) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = send(request)
+        except requests.RequestException:
+            record_api_call(request.url, "error", time.perf_counter() - started)
+            raise
+
+        record_api_call(
+            request.url,
+            str(response.status_code),
+            time.perf_counter() - started,
+            self._body_size(request, response),
+            response.headers,
+        )
+        return response
+
+    @staticmethod
+    def _body_size(request: HttpRequest, response: requests.Response) -> int:
+        # Streamed bodies are not read here, fall back to the declared size
+        if request.stream:
+            return int(response.headers.get("Content-Length") or 0)
+        return len(response.content or b"")
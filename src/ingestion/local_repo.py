@@ -0,0 +1,395 @@
+import logging
+import mmap
+import os
+import re
+import stat
+import subprocess
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.file_rules import FileRules
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.instrumentation import BYTES_DECODED, FILES_CRAWLED, FILES_SKIPPED
+from src.ingestion.models import FileContent, RepoMetadata, TreeEntry
+from src.metrics import timed_iter
+
+logger = logging.getLogger(__name__)
+
+_GITHUB_REMOTE_RE = re.compile(r"github\.com[:/](?P<full_name>[^/]+/[^/]+?)(?:\.git)?/?$")
+
+
+class LocalRepoCrawler:
+    # Reads a repository we already mirror instead of going through the
+    # API: a bare clone or a ref is read from the git object database, a
+    # working tree from the filesystem, and a plain directory without git
+    # is walked as is. Nothing here touches the network.
+    IGNORED_DIRS = GitHubClient.IGNORED_DIRS
+    IGNORED_FILES = GitHubClient.IGNORED_FILES
+    CODE_EXTENSIONS = GitHubClient.CODE_EXTENSIONS
+    DOC_EXTENSIONS = GitHubClient.DOC_EXTENSIONS
+    EXT_TO_LANG_MAP = GitHubClient.EXT_TO_LANG_MAP
+    default_rules = GitHubClient.default_rules
+    should_process_file = GitHubClient.should_process_file
+    skip_reason = GitHubClient.skip_reason
+    get_language = GitHubClient.get_language
+
+    MAX_FILE_SIZE_MB = 1 * 1024 * 1024  # 1 MB
+    # Files at least this large are memory-mapped rather than read
+    MMAP_THRESHOLD = 64 * 1024
+
+    def __init__(
+        self,
+        path: str | Path,
+        ref: str | None = None,
+        full_name: str | None = None,
+        url: str | None = None,
+        private: bool = False,
+        resolve_last_modified: bool = True,
+        rules: FileRules | None = None,
+    ):
+        self.path = Path(path).resolve()
+        if not self.path.is_dir():
+            raise ValueError(f"Not a directory: {self.path}")
+
+        self.resolve_last_modified = resolve_last_modified
+        self.private = private
+        self.source = self._detect_source(ref)
+        self.ref = ref or ("HEAD" if self.source != "directory" else None)
+        remote = self._remote_url()
+        self.full_name = (
+            full_name or self._full_name_from(remote) or self.path.name.removesuffix(".git")
+        )
+        self.url = url or remote or self.path.as_uri()
+        self.rules = (rules or self.default_rules()).for_repo(
+            self.full_name, self._read_attributes()
+        )
+        self._metadata: RepoMetadata | None = None
+
+    def crawl_repo(self) -> list[FileContent]:
+        return list(self.iter_repo())
+
+    def iter_repo(self) -> Iterator[FileContent]:
+        return timed_iter("crawl", self._iter_repo())
+
+    def _iter_repo(self) -> Iterator[FileContent]:
+        logger.info(f"Reading {self.full_name} from {self.path} ({self.source})")
+        # The listing is cheap, so dates come from one history walk over
+        # it before any content is read; contents are then streamed
+        if self.source == "git":
+            entries = self._list_objects()
+            files = self._iter_objects(entries)
+        else:
+            entries = self._list_worktree()
+            files = self._iter_worktree(entries)
+        dates = (
+            self.last_modified(entry.path for entry in entries)
+            if self.resolve_last_modified
+            else {}
+        )
+
+        count = 0
+        languages: dict[str, int] = {}
+        for file in files:
+            file.last_modified = dates.get(file.path) or file.last_modified
+            if file.language:
+                languages[file.language] = languages.get(file.language, 0) + file.size
+            count += 1
+            FILES_CRAWLED.inc(mode="local")
+            yield file
+
+        self._metadata = self._build_metadata(languages)
+        logger.info(f"Read {count} files from {self.full_name}")
+
+    @property
+    def metadata(self) -> RepoMetadata:
+        # Languages are only known after a crawl, like the API's byte counts
+        if self._metadata is None:
+            self._metadata = self._build_metadata({})
+        return self._metadata
+
+    def last_modified(self, paths: Iterable[str]) -> dict[str, datetime]:
+        # One walk over history, newest first; the first commit touching a
+        # path is its last modification. git log is stopped as soon as
+        # every path is resolved.
+        pending = set(paths)
+        dates: dict[str, datetime] = {}
+        if not pending or self.source == "directory":
+            return dates
+
+        # Paths in the log are relative to the repository root, listings
+        # to self.path, which may be a subdirectory of it
+        prefix = self._git("rev-parse", "--show-prefix").strip().decode("utf-8")
+        process = subprocess.Popen(
+            ["git", "-C", str(self.path), "log", "--format=%x01%at", "--name-only",
+             "--no-renames", "-z", self.ref, "--", "."],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            commit_date = None
+            remainder = b""
+            while pending:
+                block = process.stdout.read(1 << 16)
+                if not block:
+                    break
+                tokens = (remainder + block).split(b"\0")
+                remainder = tokens.pop()
+                for token in tokens:
+                    token = token.lstrip(b"\n")
+                    if token.startswith(b"\x01"):
+                        commit_date = datetime.fromtimestamp(int(token[1:]), tz=timezone.utc)
+                        continue
+                    path = token.decode("utf-8", errors="surrogateescape")
+                    path = path[len(prefix) :] if path.startswith(prefix) else path
+                    if path in pending and commit_date:
+                        dates[path] = commit_date
+                        pending.discard(path)
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+        return dates
+
+    def _iter_objects(self, entries: list[TreeEntry]) -> Iterator[FileContent]:
+        with _CatFile(self.path) as cat_file:
+            for entry in entries:
+                data = cat_file.read(entry.sha)
+                if data is None:
+                    logger.warning(f"Missing object {entry.sha} for {entry.path}")
+                    FILES_SKIPPED.inc(reason="error")
+                    continue
+                file = self._build_file_content(entry.path, data, entry.size, entry.sha)
+                if file:
+                    yield file
+
+    def _list_objects(self) -> list[TreeEntry]:
+        # mode SP type SP sha SP size TAB path, NUL separated
+        output = self._git("ls-tree", "-r", "-l", "-z", self.ref)
+        entries = []
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            info, _, path = record.partition(b"\t")
+            mode, kind, sha, size = info.split()
+            if kind != b"blob":
+                # Submodules show up as commits
+                continue
+            if mode == b"120000":
+                # A symlink's blob is its target path, not code
+                FILES_SKIPPED.inc(reason="symlink")
+                continue
+            path = path.decode("utf-8", errors="surrogateescape")
+            if self._accept(path, int(size)):
+                entries.append(TreeEntry(path=path, sha=sha.decode("ascii"), size=int(size)))
+        return entries
+
+    def _iter_worktree(self, entries: list["_WorktreeEntry"]) -> Iterator[FileContent]:
+        # Files without history (untracked, or no git at all) keep their mtime
+        for entry in entries:
+            try:
+                file = self._read_file(self.path / entry.path, entry.path, entry.size)
+            except OSError as e:
+                logger.warning(f"Cannot read {entry.path}: {e}")
+                FILES_SKIPPED.inc(reason="error")
+                continue
+            if file:
+                file.last_modified = datetime.fromtimestamp(entry.mtime, tz=timezone.utc)
+                yield file
+
+    def _list_worktree(self) -> list["_WorktreeEntry"]:
+        if self.source == "worktree":
+            # Tracked files plus untracked ones that are not gitignored
+            output = self._git("ls-files", "-z", "--cached", "--others", "--exclude-standard")
+            paths = sorted(
+                {p.decode("utf-8", errors="surrogateescape") for p in output.split(b"\0") if p}
+            )
+        else:
+            paths = []
+            for root, dirs, files in os.walk(self.path):
+                relative = Path(root).relative_to(self.path)
+                dirs[:] = sorted(
+                    d for d in dirs if not self.rules.prunes((relative / d).as_posix())
+                )
+                paths.extend((relative / name).as_posix() for name in sorted(files))
+
+        entries = []
+        for path in paths:
+            try:
+                # lstat: a symlink may point anywhere, outside the repository
+                # too, so only regular files are read
+                info = os.lstat(self.path / path)
+            except OSError:
+                # Deleted from the checkout but still in the index
+                continue
+            if stat.S_ISLNK(info.st_mode):
+                FILES_SKIPPED.inc(reason="symlink")
+                continue
+            if stat.S_ISREG(info.st_mode) and self._accept(path, info.st_size):
+                entries.append(_WorktreeEntry(path, info.st_size, info.st_mtime))
+        return entries
+
+    def _accept(self, path: str, size: int) -> bool:
+        reason = self.skip_reason(path)
+        if reason:
+            FILES_SKIPPED.inc(reason=reason)
+            return False
+        if size > self.MAX_FILE_SIZE_MB:
+            FILES_SKIPPED.inc(reason="size")
+            logger.debug(f"Skipping large file: {path}")
+            return False
+        return True
+
+    def _read_file(self, full_path: Path, path: str, size: int) -> FileContent | None:
+        with open(full_path, "rb") as f:
+            if size < self.MMAP_THRESHOLD or size == 0:
+                return self._build_file_content(path, f.read(), size)
+            # Validated and hashed straight from the page cache, only
+            # files that are kept get copied out
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self._build_file_content(path, mapped, size)
+
+    def _build_file_content(
+        self, path: str, data, size: int, sha: str | None = None
+    ) -> FileContent | None:
+        try:
+            decoded = str(data, "utf-8")
+        except UnicodeDecodeError:
+            # Binary file, skip
+            FILES_SKIPPED.inc(reason="binary")
+            return None
+        BYTES_DECODED.inc(len(data), mode="local")
+
+        if not decoded.strip():
+            FILES_SKIPPED.inc(reason="empty")
+            return None
+
+        reason = self.rules.content_reason(path, data)
+        if reason:
+            FILES_SKIPPED.inc(reason=reason)
+            return None
+
+        return FileContent(
+            path=path,
+            content=data if isinstance(data, bytes) else bytes(data),
+            language=self.get_language(path),
+            repo_name=self.full_name,
+            repo_url=self.url,
+            size=size,
+            sha=sha or git_blob_sha(data),
+        )
+
+    def _read_attributes(self) -> str | None:
+        # Root .gitattributes, for linguist-vendored / linguist-generated
+        if self.source == "git":
+            try:
+                data = self._git("show", f"{self.ref}:.gitattributes")
+            except subprocess.CalledProcessError:
+                return None
+        else:
+            attributes = self.path / ".gitattributes"
+            if attributes.is_symlink():
+                return None
+            try:
+                data = attributes.read_bytes()
+            except OSError:
+                return None
+        return data.decode("utf-8", errors="replace")
+
+    def _build_metadata(self, languages: dict[str, int]) -> RepoMetadata:
+        created_at = updated_at = None
+        total_commits = 0
+        if self.source != "directory":
+            total_commits = int(self._git("rev-list", "--count", self.ref) or 0)
+            updated_at = self._commit_date(self.ref)
+            roots = self._git("rev-list", "--max-parents=0", self.ref).split()
+            if roots:
+                created_at = self._commit_date(roots[-1].decode("ascii"))
+
+        return RepoMetadata(
+            name=self.full_name.rpartition("/")[2],
+            full_name=self.full_name,
+            url=self.url,
+            private=self.private,
+            languages=dict(sorted(languages.items(), key=lambda item: -item[1])),
+            created_at=created_at,
+            updated_at=updated_at,
+            total_commits=total_commits,
+        )
+
+    def _commit_date(self, rev: str) -> datetime | None:
+        output = self._git("log", "-1", "--format=%at", rev).strip()
+        return datetime.fromtimestamp(int(output), tz=timezone.utc) if output else None
+
+    def _detect_source(self, ref: str | None) -> str:
+        try:
+            bare = self._git("rev-parse", "--is-bare-repository").strip() == b"true"
+        except (OSError, subprocess.CalledProcessError):
+            if ref:
+                raise ValueError(f"{self.path} is not a git repository, cannot read {ref}")
+            return "directory"
+        # A ref always comes from the object database, even in a checkout
+        return "git" if bare or ref else "worktree"
+
+    def _remote_url(self) -> str | None:
+        if self.source == "directory":
+            return None
+        try:
+            return self._git("config", "--get", "remote.origin.url").decode().strip() or None
+        except subprocess.CalledProcessError:
+            return None
+
+    @staticmethod
+    def _full_name_from(remote: str | None) -> str | None:
+        match = _GITHUB_REMOTE_RE.search(remote or "")
+        return match.group("full_name") if match else None
+
+    def _git(self, *args: str) -> bytes:
+        return subprocess.run(
+            ["git", "-C", str(self.path), *args],
+            capture_output=True,
+            check=True,
+        ).stdout
+
+
+@dataclass
+class _WorktreeEntry:
+    path: str
+    size: int
+    mtime: float
+
+
+class _CatFile:
+    # One long-lived `git cat-file --batch` instead of a process per blob
+    def __init__(self, path: Path):
+        self._process = subprocess.Popen(
+            ["git", "-C", str(path), "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, sha: str) -> bytes | None:
+        self._process.stdin.write(f"{sha}\n".encode("ascii"))
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            # "<sha> missing"
+            return None
+        size = int(header[2])
+        data = self._process.stdout.read(size)
+        self._process.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self) -> None:
+        self._process.stdin.close()
+        self._process.wait()
+        self._process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
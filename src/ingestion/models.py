@@ -1,8 +1,15 @@
+import sys
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from datetime import datetime
 
 
-@dataclass
+def intern(value: str | None) -> str | None:
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(slots=True)
 class RepoMetadata:
     name: str
     full_name: str
@@ -15,13 +22,186 @@ class RepoMetadata:
     updated_at: datetime | None = None
     total_commits: int = 0
 
+    def __post_init__(self):
+        self.name = intern(self.name)
+        self.full_name = intern(self.full_name)
+        self.languages = {intern(name): size for name, size in self.languages.items()}
+
+
+class RepoRef:
+    # One shared (name, url) pair per repository; every FileContent of the
+    # repo points at it instead of holding its own copies of both strings
+    __slots__ = ("name", "url")
+
+    _registry: dict[tuple[str, str], "RepoRef"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+
+    @classmethod
+    def get(cls, name: str, url: str) -> "RepoRef":
+        key = (name, url)
+        ref = cls._registry.get(key)
+        if ref is None:
+            with cls._lock:
+                ref = cls._registry.setdefault(key, cls(intern(name), intern(url)))
+        return ref
+
+    def __repr__(self) -> str:
+        return f"RepoRef({self.name!r}, {self.url!r})"
+
+
+# A callable returning the UTF-8 bytes, e.g. a read from the blob store
+ContentLoader = Callable[[], bytes]
+
 
-@dataclass
 class FileContent:
+    # Compact, slotted record. Content is kept as UTF-8 bytes, or as a
+    # loader that fetches them on access, and only decoded when .content
+    # is read; repo name and url are shared through RepoRef and language
+    # is interned. Attributes match the former dataclass.
+    __slots__ = ("path", "_data", "_language", "_repo", "last_modified", "size", "sha")
+
+    FIELDS = (
+        "path",
+        "content",
+        "language",
+        "repo_name",
+        "repo_url",
+        "last_modified",
+        "size",
+        "sha",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        content: str | bytes | ContentLoader,
+        language: str | None,
+        repo_name: str,
+        repo_url: str,
+        last_modified: datetime | None = None,
+        size: int = 0,
+        sha: str | None = None,
+    ):
+        self.path = path
+        self.content = content
+        self._language = intern(language)
+        self._repo = RepoRef.get(repo_name, repo_url)
+        self.last_modified = last_modified
+        self.size = size
+        self.sha = sha
+
+    @property
+    def content(self) -> str:
+        return self.data.decode("utf-8")
+
+    @content.setter
+    def content(self, value: str | bytes | ContentLoader) -> None:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._data = value
+
+    @property
+    def data(self) -> bytes:
+        # UTF-8 bytes of the content, loaded (but not kept) if lazy
+        data = self._data
+        return data if isinstance(data, bytes) else data()
+
+    @property
+    def is_loaded(self) -> bool:
+        return isinstance(self._data, bytes)
+
+    @property
+    def has_content(self) -> bool:
+        # Lazy content is backed by a store and counts as present
+        return not self.is_loaded or bool(self._data)
+
+    @property
+    def language(self) -> str | None:
+        return self._language
+
+    @language.setter
+    def language(self, value: str | None) -> None:
+        self._language = intern(value)
+
+    @property
+    def repo_name(self) -> str:
+        return self._repo.name
+
+    @repo_name.setter
+    def repo_name(self, value: str) -> None:
+        self._repo = RepoRef.get(value, self._repo.url)
+
+    @property
+    def repo_url(self) -> str:
+        return self._repo.url
+
+    @repo_url.setter
+    def repo_url(self, value: str) -> None:
+        self._repo = RepoRef.get(self._repo.name, value)
+
+    def replace(self, **changes) -> "FileContent":
+        # dataclasses.replace() counterpart; unchanged content is shared,
+        # not loaded
+        values = {name: getattr(self, name) for name in self.FIELDS if name != "content"}
+        values["content"] = self._data
+        values.update(changes)
+        return FileContent(**values)
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FileContent):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"FileContent({fields})"
+
+    def __reduce__(self):
+        # Pickles (e.g. for the chunker's worker processes) carry the bytes,
+        # never the loader
+        return FileContent, (
+            self.path,
+            self.data,
+            self.language,
+            self.repo_name,
+            self.repo_url,
+            self.last_modified,
+            self.size,
+            self.sha,
+        )
+
+
+@dataclass(slots=True)
+class TreeEntry:
     path: str
-    content: str
-    language: str | None
-    repo_name: str
-    repo_url: str
-    last_modified: datetime | None = None
+    sha: str
     size: int = 0
+
+
+@dataclass(slots=True)
+class Chunk:
+    repo_name: str
+    path: str
+    language: str | None
+    node_type: str
+    start_byte: int
+    end_byte: int
+    start_line: int
+    end_line: int
+    content: str
+    # Git blob sha of the file the chunk was cut from, if known
+    blob_sha: str | None = None
+
+    def __post_init__(self):
+        self.repo_name = intern(self.repo_name)
+        self.language = intern(self.language)
+        self.node_type = intern(self.node_type)
@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, replace
+
+import requests
+
+from src.ingestion.transport import HttpRequest, Send
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitBudget:
+    limit: int
+    remaining: int
+    reset_at: float
+    used: int = 0
+
+
+class RateLimitScheduler:
+    DEFAULT_RESOURCE = "core"
+    RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+    # GitHub asks clients to wait at least a minute after a secondary limit
+    # hit that comes without a retry-after header
+    SECONDARY_LIMIT_WAIT_SECONDS = 60.0
+
+    def __init__(
+        self,
+        requests_per_second: float = 10.0,
+        burst: int = 20,
+        max_retries: int = 5,
+        reserve: int = 0,
+        backoff_base: float = 1.0,
+        max_backoff: float = 300.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if requests_per_second <= 0 or burst < 1:
+            raise ValueError("Rate and burst must be positive")
+
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.reserve = reserve
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last_refill = clock()
+        self._budgets: dict[str, RateLimitBudget] = {}
+        self.retries = 0
+
+    def __call__(self, request: HttpRequest, send: Send) -> requests.Response:
+        resource = self.resource_for(request.url)
+        attempt = 0
+        while True:
+            self.acquire(resource)
+            response = send(request)
+            self.update(response.headers)
+
+            delay = self.retry_delay(response, attempt)
+            if delay is None or attempt >= self.max_retries:
+                return response
+
+            attempt += 1
+            self.retries += 1
+            logger.warning(
+                f"GitHub returned {response.status_code} for {request.url}, "
+                f"retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})"
+            )
+            self._sleep(delay)
+
+    def acquire(self, resource: str = DEFAULT_RESOURCE) -> None:
+        wait = self.reserve_slot(resource)
+        if wait > 0:
+            logger.debug(f"Rate limiter sleeping {wait:.2f}s before next request")
+            self._sleep(wait)
+
+    def reserve_slot(self, resource: str = DEFAULT_RESOURCE) -> float:
+        # Takes a token and returns how long the caller must wait before
+        # sending; async callers await the delay instead of sleeping
+        with self._lock:
+            now = self._clock()
+            rate = self._sustainable_rate(resource, now)
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last_refill) * rate
+            )
+            self._last_refill = now
+            # Reserve the token up front so concurrent callers queue up
+            # behind each other instead of all waking at once
+            self._tokens -= 1
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+
+            budget = self._budgets.get(resource)
+            if budget:
+                if budget.remaining <= self.reserve and budget.reset_at > now:
+                    # Primary limit exhausted, hold until the window resets
+                    wait = max(wait, budget.reset_at - now)
+                # Count in-flight requests before their headers come back
+                budget.remaining -= 1
+        return wait
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        if "x-ratelimit-remaining" not in headers:
+            return
+
+        resource = headers.get("x-ratelimit-resource", self.DEFAULT_RESOURCE)
+        try:
+            budget = RateLimitBudget(
+                limit=int(headers.get("x-ratelimit-limit", 0)),
+                remaining=int(headers["x-ratelimit-remaining"]),
+                reset_at=float(headers.get("x-ratelimit-reset", 0)),
+                used=int(headers.get("x-ratelimit-used", 0)),
+            )
+        except ValueError:
+            return
+
+        with self._lock:
+            self._budgets[resource] = budget
+
+    def retry_delay(self, response: requests.Response, attempt: int) -> float | None:
+        status = response.status_code
+        if status not in self.RETRY_STATUSES:
+            return None
+
+        headers = response.headers
+        if "retry-after" in headers:
+            try:
+                return float(headers["retry-after"])
+            except ValueError:
+                pass
+
+        if status in (403, 429):
+            if headers.get("x-ratelimit-remaining") == "0":
+                reset_at = float(headers.get("x-ratelimit-reset", 0))
+                return max(reset_at - self._clock(), 0.0) + 1.0
+
+            if status == 403 and "rate limit" not in (response.text or "").lower():
+                # Plain permission error, retrying will not help
+                return None
+
+            return max(self.SECONDARY_LIMIT_WAIT_SECONDS, self._backoff(attempt))
+
+        return self._backoff(attempt)
+
+    def budget(self, resource: str = DEFAULT_RESOURCE) -> RateLimitBudget | None:
+        with self._lock:
+            budget = self._budgets.get(resource)
+            return replace(budget) if budget else None
+
+    @property
+    def remaining(self) -> int | None:
+        budget = self.budget()
+        return budget.remaining if budget else None
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_base * 2**attempt, self.max_backoff)
+
+    def _sustainable_rate(self, resource: str, now: float) -> float:
+        # Spread what is left of the hourly budget over the time until reset
+        budget = self._budgets.get(resource)
+        if not budget or budget.reset_at <= now:
+            return self.requests_per_second
+        usable = budget.remaining - self.reserve
+        if usable <= 0:
+            return self.requests_per_second
+        return min(self.requests_per_second, usable / (budget.reset_at - now))
+
+    @staticmethod
+    def resource_for(url: str) -> str:
+        return "graphql" if url.rstrip("/").endswith("/graphql") else "core"
@@ -1,156 +1,724 @@
 import base64
+import binascii
 import logging
-from contextlib import suppress
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from pathlib import Path
+from typing import TypeVar
 
-from github import ContentFile, GithubException, Repository
+import requests
+from github import (
+    ContentFile,
+    GithubException,
+    RateLimitExceededException,
+    Repository,
+)
 
-from src.ingestion.cache import RepoCache
+from src.ingestion.archive import ArchiveReader
+from src.ingestion.cache import RepoCache, RepoSnapshot
+from src.ingestion.file_rules import FileRules
 from src.ingestion.github_client import GitHubClient
-from src.ingestion.models import FileContent, RepoMetadata
+from src.ingestion.history import LastModifiedResolver
+from src.ingestion.instrumentation import (
+    BYTES_DECODED,
+    DEDUP_HITS,
+    FILES_CRAWLED,
+    FILES_SKIPPED,
+    REPO_CACHE_LOOKUPS,
+)
+from src.ingestion.models import FileContent, RepoMetadata, TreeEntry
+from src.metrics import timed_iter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class RepoCrawler:
     MAX_FILE_SIZE_MB = 1 * 1024 * 1024  # 1 MB
 
-    def __init__(self, client: GitHubClient, use_cache: bool = True):
+    CRAWL_MODES = ("tree", "archive", "contents")
+
+    def __init__(
+        self,
+        client: GitHubClient,
+        use_cache: bool = True,
+        mode: str = "tree",
+        resolve_last_modified: bool = True,
+        max_workers: int = 1,
+        max_concurrent_repos: int = 1,
+        accumulate: bool = False,
+        cache_dir: Path | None = None,
+    ):
+        if mode not in self.CRAWL_MODES:
+            raise ValueError(f"Unknown crawl mode: {mode}")
+        if max_workers < 1 or max_concurrent_repos < 1:
+            raise ValueError("Worker counts must be at least 1")
+
         self.client = client
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_concurrent_repos = max_concurrent_repos
+        self.accumulate = accumulate
         self._processed_repos: list[RepoMetadata] = []
         self._files: list[FileContent] = []
+        self._failed_repos: list[str] = []
         self.use_cache = use_cache
-        self._cache = RepoCache() if use_cache else None
+        self._cache = RepoCache(cache_dir) if use_cache else None
+        self._history = LastModifiedResolver(client) if resolve_last_modified else None
+        # Shared by every repo so the total number of in-flight API calls
+        # stays bounded by max_workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl")
+            if max_workers > 1
+            else None
+        )
+        # Rules per repo, once its root .gitattributes has been read
+        self._rules: dict[str, FileRules] = {}
+        # Blob downloads in progress, by sha, shared by concurrent repos
+        self._inflight: dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
 
     def crawl_repo(self, repo: Repository.Repository) -> list[FileContent]:
-        if self._cache:
-            cached = self._cache.load(repo)
-            if cached:
-                files, metadata = cached
-                self._processed_repos.append(metadata)
-                self._files.extend(files)
-                return files
+        return list(self.iter_repo(repo))
+
+    def iter_repo(self, repo: Repository.Repository) -> Iterator[FileContent]:
+        return self._track(self._iter_repo(repo, self._processed_repos))
+
+    def cached_commit(self, repo_full_name: str) -> str | None:
+        return self._cache.commit_sha(repo_full_name) if self._cache else None
+
+    def update_paths(
+        self,
+        repo: Repository.Repository,
+        paths: Iterable[str],
+        ref: str,
+        last_modified: Mapping[str, datetime] | None = None,
+    ) -> tuple[list[FileContent], list[str]]:
+        # Incremental counterpart of crawl_repo for a known change set, such
+        # as a push: each path is fetched as of ref, or reported as removed
+        # when it is gone, excluded by the rules or no longer text. The
+        # cached snapshot moves to ref. Dates not given are resolved from
+        # the history
+        paths = sorted(set(paths))
+        if ".gitattributes" in paths:
+            self._rules.pop(repo.full_name, None)
+        rules = self._path_rules(repo, ref)
 
         files: list[FileContent] = []
-        metadata = self.client.get_repo_metadata(repo)
-        self._processed_repos.append(metadata)
+        removed: list[str] = []
+        for path, file_data in zip(
+            paths, self._map(partial(self._fetch_path, repo, ref, rules), paths)
+        ):
+            if file_data:
+                files.append(file_data)
+            else:
+                removed.append(path)
+
+        stale = []
+        for file in files:
+            file.last_modified = (last_modified or {}).get(file.path)
+            if file.last_modified is None:
+                stale.append(file)
+        if stale and self._history:
+            self._history.apply(repo, stale, ref=ref)
+
+        if self._cache:
+            self._cache.update_files(
+                repo.full_name, upserts=files, removed_paths=removed, commit_sha=ref
+            )
+        logger.info(
+            f"Updated {len(files)} and removed {len(removed)} files of {repo.full_name}"
+        )
+        return files, removed
+
+    def _path_rules(self, repo: Repository.Repository, ref: str) -> FileRules:
+        if repo.full_name in self._rules:
+            return self._rules[repo.full_name]
+        try:
+            root = [repo.get_contents(".gitattributes", ref=ref)]
+        except RateLimitExceededException:
+            raise
+        except GithubException:
+            root = []
+        return self._load_contents_rules(repo, root)
+
+    def _fetch_path(
+        self, repo: Repository.Repository, ref: str, rules: FileRules, path: str
+    ) -> FileContent | None:
+        # Errors other than a missing path propagate: dropping the file
+        # would take it out of the index
+        reason = rules.skip_reason(path)
+        if reason:
+            FILES_SKIPPED.inc(reason=reason)
+            return None
+        try:
+            content_file = repo.get_contents(path, ref=ref)
+        except GithubException as e:
+            if e.status == 404:
+                return None
+            raise
+        if isinstance(content_file, list) or content_file.type != "file":
+            return None
+        if content_file.size > self.MAX_FILE_SIZE_MB:
+            FILES_SKIPPED.inc(reason="size")
+            return None
+        return self._extract_file_content(content_file=content_file, repo=repo)
+
+    def _iter_repo(
+        self, repo: Repository.Repository, processed: list[RepoMetadata]
+    ) -> Iterator[FileContent]:
+        return timed_iter("crawl", self._crawl_repo(repo, processed))
+
+    def _crawl_repo(
+        self, repo: Repository.Repository, processed: list[RepoMetadata]
+    ) -> Iterator[FileContent]:
+        # Metadata is appended to processed once the repo is fully crawled
+        head_sha = None
+        previous = None
+        if self._cache:
+            head_sha = self._resolve_head(repo)
+            previous = self._cache.load_snapshot(repo.full_name)
+            if previous and self._cache.is_fresh(previous, repo, commit_sha=head_sha):
+                REPO_CACHE_LOOKUPS.inc(result="fresh")
+                logger.info(f"Loading {repo.full_name} from cache")
+                for file in self._cache.iter_files(repo.full_name):
+                    FILES_CRAWLED.inc(mode="cache")
+                    yield file
+                processed.append(previous.metadata)
+                return
+            REPO_CACHE_LOOKUPS.inc(result="stale" if previous else "miss")
+
+        ref = head_sha or repo.default_branch
+        metadata_future = self._submit(self.client.get_repo_metadata, repo)
 
         logger.info(f"Crawling repository: {repo.full_name}")
 
+        # Only index records are kept, contents go straight to the blob store
+        records: list[FileContent] = []
+        crawled = 0
         try:
-            initial_contents = repo.get_contents("")
-        except Exception as e:
-            logger.warning(
-                f"Cannot access contents of repository {repo.full_name}: {e}"
+            for file in self._with_last_modified(
+                repo, self._iter_files(repo, ref), previous, ref
+            ):
+                if self._cache:
+                    file.sha = self._cache.put_blob(file.data, file.sha)
+                    records.append(file.replace(content=b""))
+                FILES_CRAWLED.inc(mode=self.mode)
+                crawled += 1
+                yield file
+        except GithubException as e:
+            # Anything but an empty repository propagates: the scheduler
+            # already waited and retried, and a repo that looks crawled
+            # would have the files it never reached dropped from the index
+            if e.status != 409:
+                raise
+            logger.info(f"Repository {repo.full_name} is empty")
+
+        metadata = metadata_future()
+        processed.append(metadata)
+        logger.info(f"Crawled {crawled} files from {repo.full_name}")
+
+        if self._cache:
+            self._cache.save(repo.full_name, records, metadata, commit_sha=head_sha)
+
+    def _iter_files(
+        self, repo: Repository.Repository, ref: str
+    ) -> Iterator[FileContent]:
+        if self.mode == "tree":
+            return self._iter_tree(repo, ref)
+        if self.mode == "archive":
+            return self._iter_archive(repo, ref)
+        return self._iter_contents(repo, ref)
+
+    def _track(self, files: Iterable[FileContent]) -> Iterator[FileContent]:
+        for file in files:
+            if self.accumulate:
+                # Every yielded file is in the blob store by now, keep only
+                # a handle to it instead of the content
+                self._files.append(
+                    file.replace(content=self._cache.blob_loader(file.sha))
+                    if self._cache and file.sha
+                    else file
+                )
+            yield file
+
+    def _resolve_head(self, repo: Repository.Repository) -> str | None:
+        try:
+            return repo.get_branch(repo.default_branch).commit.sha
+        except RateLimitExceededException:
+            raise
+        except GithubException as e:
+            logger.warning(f"Cannot resolve head commit of {repo.full_name}: {e}")
+            return None
+
+    def _with_last_modified(
+        self,
+        repo: Repository.Repository,
+        files: Iterable[FileContent],
+        previous: RepoSnapshot | None,
+        ref: str,
+    ) -> Iterator[FileContent]:
+        if not self._history:
+            yield from files
+            return
+
+        # A path whose blob did not change keeps its cached date, the rest
+        # is resolved one history batch at a time so files keep flowing
+        known = (
+            {(f.path, f.sha): f.last_modified for f in previous.files}
+            if previous
+            else {}
+        )
+        batch_size = self._history.batch_size
+        buffered: list[FileContent] = []
+        stale: list[FileContent] = []
+        for file in files:
+            buffered.append(file)
+            last_modified = known.get((file.path, file.sha))
+            if last_modified:
+                file.last_modified = last_modified
+            else:
+                stale.append(file)
+
+            if batch_size and len(stale) >= batch_size:
+                self._history.apply(repo, stale, ref=ref)
+                yield from buffered
+                buffered, stale = [], []
+
+        if stale:
+            self._history.apply(repo, stale, ref=ref)
+        yield from buffered
+
+    def _iter_tree(self, repo: Repository.Repository, ref: str) -> Iterator[FileContent]:
+        entries = self._list_tree(repo, ref)
+        # Identical blobs at several paths are fetched and decoded once,
+        # each copy is yielded right after the first one
+        first: dict[str, TreeEntry] = {}
+        copies: dict[str, list[TreeEntry]] = {}
+        for entry in entries:
+            if entry.sha in first:
+                copies.setdefault(entry.sha, []).append(entry)
+            else:
+                first[entry.sha] = entry
+        if self._cache:
+            reused = sum(1 for sha in first if self._cache.has_blob(sha))
+            logger.info(
+                f"{repo.full_name}: {reused} blobs cached, "
+                f"{len(first) - reused} to download, "
+                f"{len(entries) - len(first)} duplicate paths"
             )
-            return files
+        fetched = self._map(partial(self._fetch_tree_entry, repo), first.values())
+        for file_data in fetched:
+            if not file_data:
+                continue
+            yield file_data
+            for entry in copies.get(file_data.sha, ()):
+                DEDUP_HITS.inc(stage="crawl")
+                yield file_data.replace(
+                    path=entry.path, language=self.client.get_language(entry.path)
+                )
+
+    def _fetch_tree_entry(
+        self, repo: Repository.Repository, entry: TreeEntry
+    ) -> FileContent | None:
+        try:
+            cached = self._cache.get_blob_bytes(entry.sha) if self._cache else None
+            if cached is not None:
+                encoding, content = None, cached
+            else:
+                encoding, content = self._fetch_blob(repo, entry.sha)
+            file_data = self._build_file_content(
+                repo=repo,
+                path=entry.path,
+                encoding=encoding,
+                content=content,
+                size=entry.size,
+                sha=entry.sha,
+            )
+            if file_data:
+                logger.debug(f"Processed: {entry.path}")
+            return file_data
+        except (GithubException, requests.RequestException):
+            # A file dropped here would be missing from the snapshot saved
+            # at this commit, and so from the index until HEAD moves
+            raise
+        except Exception as e:
+            FILES_SKIPPED.inc(reason="error")
+            logger.warning(f"Error processing {entry.path}: {e}")
+            return None
+
+    def _fetch_blob(
+        self, repo: Repository.Repository, sha: str
+    ) -> tuple[str | None, str | None]:
+        # Single flight: a blob another repo (a fork, a vendored copy) is
+        # downloading right now is waited for instead of fetched again
+        with self._inflight_lock:
+            future = self._inflight.get(sha)
+            owner = future is None
+            if owner:
+                future = self._inflight[sha] = Future()
+        if not owner:
+            DEDUP_HITS.inc(stage="crawl")
+            return future.result()
+
+        try:
+            blob = repo.get_git_blob(sha)
+            result = (blob.encoding, blob.content)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[sha]
+
+    def _iter_archive(
+        self, repo: Repository.Repository, ref: str
+    ) -> Iterator[FileContent]:
+        reader = ArchiveReader(client=self.client, max_file_size=self.MAX_FILE_SIZE_MB)
 
-        contents: list[ContentFile.ContentFile] = (
+        with self.client.open_archive(repo, ref) as response:
+            for file_data in reader.iter_files(
+                response.raw, repo_name=repo.full_name, repo_url=repo.html_url
+            ):
+                logger.debug(f"Processed: {file_data.path}")
+                yield file_data
+
+    def _list_tree(self, repo: Repository.Repository, ref: str) -> list[TreeEntry]:
+        entries: list[TreeEntry] = []
+        pending: deque[tuple[str, str]] = deque([("", ref)])
+        rules = None
+
+        while pending:
+            prefix, sha = pending.popleft()
+            tree = repo.get_git_tree(sha, recursive=True)
+            truncated = tree.truncated
+            if truncated:
+                # Listing was cut off by the API limit, descend one level and
+                # retry each subtree recursively on its own
+                logger.debug(f"Truncated tree at '{prefix or '/'}' in {repo.full_name}")
+                tree = repo.get_git_tree(sha)
+            if rules is None:
+                # The root listing carries .gitattributes, so vendored and
+                # generated paths are known before anything is fetched
+                rules = self._load_rules(repo, tree.tree)
+
+            for element in tree.tree:
+                path = f"{prefix}{element.path}"
+                if element.type == "blob":
+                    self._add_tree_entry(entries, path, element, rules)
+                elif element.type == "tree" and truncated and not rules.prunes(path):
+                    pending.append((f"{path}/", element.sha))
+
+        return entries
+
+    def _load_rules(self, repo: Repository.Repository, root_elements) -> FileRules:
+        attributes = None
+        for element in root_elements:
+            if element.path == ".gitattributes" and element.type == "blob":
+                try:
+                    cached = self._cache.get_blob_bytes(element.sha) if self._cache else None
+                    if cached is not None:
+                        attributes = cached.decode("utf-8", errors="replace")
+                    else:
+                        encoding, content = self._fetch_blob(repo, element.sha)
+                        data = base64.b64decode(content) if encoding == "base64" else content
+                        attributes = (
+                            data.decode("utf-8", errors="replace")
+                            if isinstance(data, bytes)
+                            else data
+                        )
+                except RateLimitExceededException:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Cannot read .gitattributes of {repo.full_name}: {e}")
+        rules = self._rules[repo.full_name] = self.client.rules.for_repo(
+            repo.full_name, attributes
+        )
+        return rules
+
+    def _rules_for(self, repo: Repository.Repository) -> FileRules:
+        return self._rules.get(repo.full_name) or self.client.rules.for_repo(repo.full_name)
+
+    def _add_tree_entry(
+        self, entries: list[TreeEntry], path: str, element, rules: FileRules
+    ) -> None:
+        reason = rules.skip_reason(path)
+        if reason:
+            FILES_SKIPPED.inc(reason=reason)
+            return
+
+        if element.size > self.MAX_FILE_SIZE_MB:
+            FILES_SKIPPED.inc(reason="size")
+            logger.debug(f"Skipping large file: {path}")
+            return
+
+        entries.append(TreeEntry(path=path, sha=element.sha, size=element.size))
+
+    def _iter_contents(
+        self, repo: Repository.Repository, ref: str
+    ) -> Iterator[FileContent]:
+        initial_contents = repo.get_contents("", ref=ref)
+        level: list[ContentFile.ContentFile] = (
             initial_contents
             if isinstance(initial_contents, list)
             else [initial_contents]
         )
 
-        while contents:
-            file_content = contents.pop(0)
-
-            if file_content.type == "dir":
-                if file_content.name in self.client.IGNORED_DIRS:
-                    continue
+        rules = self._load_contents_rules(repo, level)
 
-                try:
-                    dir_contents = repo.get_contents(file_content.path)
-                    if isinstance(dir_contents, list):
-                        # Multiple items, extend contents
-                        contents.extend(dir_contents)
-                    else:
-                        # Single item, add it back to contents
-                        contents.append(dir_contents)
-                except GithubException:
+        # Breadth-first, listing every directory of a level concurrently
+        while level:
+            dirs: list[str] = []
+            content_files: list[ContentFile.ContentFile] = []
+            for file_content in level:
+                if file_content.type == "dir":
+                    if not rules.prunes(file_content.path):
+                        dirs.append(file_content.path)
                     continue
 
-            else:
-                if not self.client.should_process_file(Path(file_content.path)):
+                reason = rules.skip_reason(file_content.path)
+                if reason:
+                    FILES_SKIPPED.inc(reason=reason)
                     continue
 
                 if file_content.size > self.MAX_FILE_SIZE_MB:
+                    FILES_SKIPPED.inc(reason="size")
                     logger.debug(f"Skipping large file: {file_content.path}")
                     continue
 
+                content_files.append(file_content)
+
+            fetched = self._map(partial(self._fetch_content_file, repo), content_files)
+            yield from (file_data for file_data in fetched if file_data)
+
+            listings = self._map(partial(self._list_dir, repo, ref), dirs)
+            level = [item for listing in listings for item in listing]
+
+    def _load_contents_rules(
+        self, repo: Repository.Repository, root: list[ContentFile.ContentFile]
+    ) -> FileRules:
+        attributes = None
+        for file_content in root:
+            if file_content.path == ".gitattributes" and file_content.type == "file":
                 try:
-                    file_data = self._extract_file_content(
-                        content_file=file_content, repo=repo
-                    )
-                    if file_data:
-                        files.append(file_data)
-                        logger.debug(f"Processed: {file_content.path}")
+                    attributes = file_content.decoded_content.decode("utf-8", errors="replace")
+                except RateLimitExceededException:
+                    raise
                 except Exception as e:
-                    logger.warning(f"Error processing {file_content.path}: {e}")
-
-        self._files.extend(files)
-        logger.info(f"Crawled {len(files)} files from {repo.full_name}")
+                    logger.warning(f"Cannot read .gitattributes of {repo.full_name}: {e}")
+        rules = self._rules[repo.full_name] = self.client.rules.for_repo(
+            repo.full_name, attributes
+        )
+        return rules
 
-        if self._cache:
-            self._cache.save(repo.full_name, files, metadata)
+    def _list_dir(
+        self, repo: Repository.Repository, ref: str, path: str
+    ) -> list[ContentFile.ContentFile]:
+        try:
+            dir_contents = repo.get_contents(path, ref=ref)
+        except GithubException as e:
+            if e.status == 404:
+                return []
+            raise
+        return dir_contents if isinstance(dir_contents, list) else [dir_contents]
 
-        return files
+    def _fetch_content_file(
+        self, repo: Repository.Repository, content_file: ContentFile.ContentFile
+    ) -> FileContent | None:
+        try:
+            file_data = self._extract_file_content(content_file=content_file, repo=repo)
+            if file_data:
+                logger.debug(f"Processed: {content_file.path}")
+            return file_data
+        except (GithubException, requests.RequestException):
+            # See _fetch_tree_entry
+            raise
+        except Exception as e:
+            FILES_SKIPPED.inc(reason="error")
+            logger.warning(f"Error processing {content_file.path}: {e}")
+            return None
 
     def _extract_file_content(
         self,
         content_file,
         repo: Repository.Repository,
     ) -> FileContent | None:
+        # Listings already carry the blob sha, the content is only fetched
+        # (lazily, by PyGithub) when the blob is not cached
+        cached = self._cache.get_blob_bytes(content_file.sha) if self._cache else None
+        return self._build_file_content(
+            repo=repo,
+            path=content_file.path,
+            encoding=None if cached is not None else content_file.encoding,
+            content=cached if cached is not None else content_file.content,
+            size=content_file.size,
+            sha=content_file.sha,
+        )
+
+    def _build_file_content(
+        self,
+        repo: Repository.Repository,
+        path: str,
+        encoding: str | None,
+        content: str | bytes | None,
+        size: int,
+        sha: str | None = None,
+    ) -> FileContent | None:
+        # Cached blobs come back as bytes that were validated when stored
         try:
-            if content_file.encoding == "base64":
-                decoded = base64.b64decode(content_file.content).decode("utf-8")
+            if encoding == "base64":
+                data = base64.b64decode(content)
+                data.decode("utf-8")
+                BYTES_DECODED.inc(len(data), mode=self.mode)
+            elif isinstance(content, bytes):
+                data = content
             else:
-                decoded = content_file.content or ""
-        except (UnicodeDecodeError, TypeError):
-            # Binary file or decoding error, skip
+                data = (content or "").encode("utf-8")
+        except UnicodeDecodeError:
+            # Binary file, skip
+            FILES_SKIPPED.inc(reason="binary")
+            return None
+        except (binascii.Error, TypeError):
+            FILES_SKIPPED.inc(reason="decode_error")
             return None
 
-        if not decoded.strip():
+        if not data.strip():
             # Empty file after stripping, skip
+            FILES_SKIPPED.inc(reason="empty")
             return None
 
-        last_modified = self._get_last_modified_date(repo, content_file.path)
+        reason = self._rules_for(repo).content_reason(path, data)
+        if reason:
+            FILES_SKIPPED.inc(reason=reason)
+            logger.debug(f"Skipping {reason} file: {path}")
+            return None
 
         return FileContent(
-            path=content_file.path,
-            content=decoded,
-            language=self.client.get_language(content_file.path),
+            path=path,
+            content=data,
+            language=self.client.get_language(path),
             repo_name=repo.full_name,
             repo_url=repo.html_url,
-            last_modified=last_modified,
-            size=content_file.size,
+            size=size,
+            sha=sha,
         )
 
-    def _get_last_modified_date(self, repo: Repository.Repository, file_path: str):
-        with suppress(GithubException):
-            commits = repo.get_commits(path=file_path)
-            if commits.totalCount:
-                return commits[0].commit.author.date
-        return None
+    def _map(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        # Results always come back in input order, regardless of which
+        # worker finished first
+        if not self._executor:
+            return map(fn, items)
+        return self._bounded_map(fn, items)
+
+    def _bounded_map(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        # Unlike Executor.map, only a small window of results is held
+        # while the consumer catches up
+        window: deque[Future] = deque()
+        for item in items:
+            window.append(self._executor.submit(fn, item))
+            if len(window) >= self.max_workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def _submit(self, fn: Callable[..., R], *args) -> Callable[[], R]:
+        if self._executor:
+            return self._executor.submit(fn, *args).result
+        return partial(fn, *args)
 
     def crawl_all_repos(
         self, include_private: bool = True, max_repos: int | None = None
     ) -> tuple[list[FileContent], list[RepoMetadata]]:
+        all_files = list(
+            self.iter_all_repos(include_private=include_private, max_repos=max_repos)
+        )
+        return all_files, self._processed_repos
+
+    def iter_all_repos(
+        self, include_private: bool = True, max_repos: int | None = None
+    ) -> Iterator[FileContent]:
         repos = self.client.get_repos(include_private=include_private)
 
         if max_repos:
             repos = repos[:max_repos]
 
-        all_files = []
+        if self.max_concurrent_repos == 1:
+            return self._track(self._iter_repos_sequential(repos))
+        return self._track(self._iter_repos_concurrent(repos))
+
+    def _iter_repos_sequential(
+        self, repos: list[Repository.Repository]
+    ) -> Iterator[FileContent]:
         for repo in repos:
-            files = self.crawl_repo(repo)
-            all_files.extend(files)
+            try:
+                yield from self._iter_repo(repo, self._processed_repos)
+            except Exception as e:
+                self._mark_failed(repo, e)
 
-        return all_files, self._processed_repos
+    def _iter_repos_concurrent(
+        self, repos: list[Repository.Repository]
+    ) -> Iterator[FileContent]:
+        # At most max_concurrent_repos repos are buffered; they are handed
+        # out in listing order so results stay deterministic
+        def collect(repo):
+            processed: list[RepoMetadata] = []
+            return list(self._iter_repo(repo, processed)), processed
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrent_repos, thread_name_prefix="crawl-repo"
+        ) as repo_pool:
+            window: deque[tuple[Repository.Repository, Future]] = deque()
+            for repo in repos:
+                window.append((repo, repo_pool.submit(collect, repo)))
+                if len(window) < self.max_concurrent_repos:
+                    continue
+                yield from self._drain(window)
+            while window:
+                yield from self._drain(window)
+
+    def _drain(
+        self, window: deque[tuple[Repository.Repository, Future]]
+    ) -> Iterator[FileContent]:
+        repo, future = window.popleft()
+        try:
+            files, processed = future.result()
+        except Exception as e:
+            self._mark_failed(repo, e)
+            return
+        self._processed_repos.extend(processed)
+        yield from files
+
+    def _mark_failed(self, repo: Repository.Repository, error: Exception) -> None:
+        logger.error(f"Failed to crawl repository {repo.full_name}: {error}")
+        self._failed_repos.append(repo.full_name)
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     @property
     def processed_repos(self) -> list[RepoMetadata]:
         return self._processed_repos
 
+    @property
+    def failed_repos(self) -> list[str]:
+        return self._failed_repos
+
     @property
     def all_files(self) -> list[FileContent]:
         return self._files
@@ -0,0 +1,91 @@
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from functools import partial
+from importlib.metadata import version
+from typing import Protocol
+
+import requests
+from github import Github
+from github.Requester import (
+    HTTPRequestsConnectionClass,
+    HTTPSRequestsConnectionClass,
+    RequestsResponse,
+)
+
+
+@dataclass
+class HttpRequest:
+    verb: str
+    url: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: object = None
+    stream: bool = False
+
+
+Send = Callable[[HttpRequest], requests.Response]
+
+# Private (name-mangled) attribute of PyGithub's Requester holding the
+# connection class; pyproject.toml bounds pygithub to versions that have it
+_CONNECTION_CLASS_ATTR = "_Requester__connectionClass"
+
+
+class Middleware(Protocol):
+    def __call__(self, request: HttpRequest, send: Send) -> requests.Response: ...
+
+
+def build_chain(middlewares: Sequence[Middleware], send: Send) -> Send:
+    # The first middleware is the outermost one and sees every request first
+    for middleware in reversed(middlewares):
+        send = partial(middleware, send=send)
+    return send
+
+
+def install_middlewares(github: Github, middlewares: Sequence[Middleware]) -> None:
+    # PyGithub has no per-instance hook for its connection class, only a
+    # global injectConnectionClasses, so set it on this client's requester.
+    # The sequence is read on every request, so middlewares appended later
+    # take effect too.
+    requester = github.requester
+    http_class, https_class = _connection_classes(middlewares)
+    scheme_class = https_class if requester.scheme == "https" else http_class
+    # Assigning a renamed attribute would silently bypass every middleware
+    if not hasattr(requester, _CONNECTION_CLASS_ATTR):
+        raise RuntimeError(
+            f"PyGithub {version('pygithub')} is not supported: its Requester has no "
+            f"{_CONNECTION_CLASS_ATTR} to install middlewares on"
+        )
+    setattr(requester, _CONNECTION_CLASS_ATTR, scheme_class)
+
+
+def _connection_classes(middlewares: Sequence[Middleware]):
+    class _Mixin:
+        def getresponse(self) -> RequestsResponse:
+            request = HttpRequest(
+                verb=self.verb,
+                url=f"{self.protocol}://{self.host}:{self.port}{self.url}",
+                headers=dict(self.headers),
+                body=self.input,
+                stream=self.stream,
+            )
+            send = build_chain(middlewares, self._send)
+            return RequestsResponse(send(request))
+
+        def _send(self, request: HttpRequest) -> requests.Response:
+            return self.session.request(
+                request.verb,
+                request.url,
+                headers=request.headers,
+                data=request.body,
+                timeout=self.timeout,
+                verify=self.verify,
+                allow_redirects=False,
+                stream=request.stream,
+            )
+
+    class HTTPConnection(_Mixin, HTTPRequestsConnectionClass):
+        pass
+
+    class HTTPSConnection(_Mixin, HTTPSRequestsConnectionClass):
+        pass
+
+    return HTTPConnection, HTTPSConnection
@@ -0,0 +1,265 @@
+import math
+import threading
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import TypeVar
+
+T = TypeVar("T")
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> list[dict]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"labels": dict(zip(self.labels, key)), "value": value}
+                for key, value in sorted(self._values.items())
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (last one is +Inf), sum
+        self._values: dict[LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets)
+        )
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels)) or ([], 0.0)
+            return sum(counts)
+
+    def sum(self, **labels: str) -> float:
+        with self._lock:
+            return (self._values.get(self._key(labels)) or ([], 0.0))[1]
+
+    def samples(self) -> list[dict]:
+        with self._lock:
+            samples = []
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative, buckets = 0, {}
+                for bound, count in zip((*self.buckets, math.inf), counts):
+                    cumulative += count
+                    buckets["+Inf" if bound == math.inf else _format(bound)] = cumulative
+                samples.append(
+                    {
+                        "labels": dict(zip(self.labels, key)),
+                        "count": cumulative,
+                        "sum": total,
+                        "buckets": buckets,
+                    }
+                )
+            return samples
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def _register(self, cls, name, help, labels, **kwargs):
+        # Get-or-create, so modules can declare their metrics at import time
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif type(metric) is not cls or metric.labels != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+    def get(self, name: str) -> Metric | None:
+        return self._metrics.get(name)
+
+    def reset(self) -> None:
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def snapshot(self) -> dict:
+        snapshot = {
+            name: {"type": metric.TYPE, "help": metric.help, "samples": metric.samples()}
+            for name, metric in sorted(self._metrics.items())
+        }
+        snapshot["stage_throughput"] = stage_throughput(self)
+        return snapshot
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.TYPE}")
+            for sample in metric.samples():
+                labels = sample["labels"]
+                if isinstance(metric, Histogram):
+                    for bound, count in sample["buckets"].items():
+                        lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_format(sample['sum'])}")
+                    lines.append(f"{name}_count{_labels(labels)} {sample['count']}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_format(sample['value'])}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Wall time spent per pipeline stage", ["stage"]
+)
+STAGE_ITEMS = REGISTRY.counter("stage_items_total", "Items processed per pipeline stage", ["stage"])
+
+
+def record_stage(stage: str, seconds: float, items: int) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_ITEMS.inc(items, stage=stage)
+
+
+def timed_iter(stage: str, items: Iterable[T]) -> Iterator[T]:
+    # Only time spent producing items counts, not time the consumer holds
+    # the generator suspended, so streaming stages report their own cost
+    iterator = iter(items)
+    seconds, count = 0.0, 0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds += time.perf_counter() - started
+                return
+            seconds += time.perf_counter() - started
+            count += 1
+            yield item
+    finally:
+        record_stage(stage, seconds, count)
+
+
+def stage_throughput(registry: MetricsRegistry = REGISTRY) -> dict[str, float]:
+    seconds = registry.get(STAGE_SECONDS.name)
+    items = registry.get(STAGE_ITEMS.name)
+    if seconds is None or items is None:
+        return {}
+    throughput = {}
+    for sample in seconds.samples():
+        stage = sample["labels"]["stage"]
+        if sample["sum"] > 0:
+            throughput[stage] = items.value(stage=stage) / sample["sum"]
+    return throughput
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
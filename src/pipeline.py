@@ -0,0 +1,554 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from github import Repository
+
+from src.indexing.embedder import EmbeddingStage
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_index import VectorIndex
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.chunker import Chunker
+from src.ingestion.models import Chunk, FileContent
+from src.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "pipeline_queue_depth", "Items waiting in front of a pipeline stage", ["stage"]
+)
+# state: idle (waiting for input), blocked (waiting for room downstream)
+WAIT_SECONDS = REGISTRY.counter(
+    "pipeline_wait_seconds_total", "Time pipeline stage workers spent waiting", ["stage", "state"]
+)
+
+# End of stream, passed from stage to stage behind the last item
+_DONE = object()
+# Returned by a blocking get once the pipeline is cancelled
+_CANCELLED = object()
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+@dataclass
+class Stage:
+    # fn takes a batch of up to batch_size inputs and returns (or yields)
+    # any number of outputs for the next stage, so stages can filter and
+    # fan out. workers threads call it concurrently, outputs leave in
+    # completion order. A batch is whatever is queued once the first item
+    # arrives, or what arrives within max_wait of it for stages with a high
+    # per-call cost. queue_size bounds the stage's input queue: a full
+    # queue blocks the stage before it, which is the backpressure
+    name: str
+    fn: Callable[[list], Iterable]
+    workers: int = 1
+    batch_size: int = 1
+    queue_size: int = 64
+    max_wait: float = 0.0
+
+    def __post_init__(self):
+        if self.workers < 1 or self.batch_size < 1 or self.queue_size < 1:
+            raise ValueError(
+                f"Stage {self.name}: workers, batch_size and queue_size must be positive"
+            )
+        if self.max_wait < 0:
+            raise ValueError(f"Stage {self.name}: max_wait must not be negative")
+
+
+class _StageRun:
+    def __init__(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue | None):
+        self.stage = stage
+        self.inbox = inbox
+        self.outbox = outbox
+        self.active = stage.workers
+        self.emitted = 0
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    # Runs stages concurrently over bounded queues, so the first items are
+    # indexed while later ones are still being fetched and memory holds at
+    # most a few queues' worth of work. The first error, or cancel(), stops
+    # every stage after its current batch; run() then raises. Stages that
+    # need processes (parsing) hand their batches to a process pool from
+    # their worker threads. A pipeline runs once.
+    POLL_SECONDS = 0.1
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages = list(stages)
+        if not self.stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self._cancelled = threading.Event()
+        self._errors: list[BaseException] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def run(self, source: Iterable) -> int:
+        # Returns the number of outputs of the last stage
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        runs = [
+            _StageRun(stage, queues[i], queues[i + 1] if i + 1 < len(queues) else None)
+            for i, stage in enumerate(self.stages)
+        ]
+        threads = [
+            threading.Thread(
+                target=self._feed, args=(source, queues[0]), name="pipeline-source", daemon=True
+            )
+        ]
+        for run in runs:
+            threads.extend(
+                threading.Thread(
+                    target=self._work,
+                    args=(run,),
+                    name=f"pipeline-{run.stage.name}-{n}",
+                    daemon=True,
+                )
+                for n in range(run.stage.workers)
+            )
+
+        for thread in threads:
+            thread.start()
+        try:
+            # Joined with a timeout so Ctrl-C reaches the main thread
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(self.POLL_SECONDS)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, letting pipeline stages finish their current batch")
+            self.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+
+        if self._errors:
+            raise self._errors[0]
+        if self.cancelled:
+            raise PipelineCancelled("Pipeline was cancelled")
+        return runs[-1].emitted
+
+    def _feed(self, source: Iterable, outbox: queue.Queue) -> None:
+        items = iter(source)
+        try:
+            for item in items:
+                if not self._put(outbox, item, "source"):
+                    return
+            self._put(outbox, _DONE, "source")
+        except BaseException as e:
+            self._fail("source", e)
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+
+    def _work(self, run: _StageRun) -> None:
+        try:
+            done = False
+            while not done and not self.cancelled:
+                batch, done = self._take(run)
+                if batch:
+                    self._process(run, batch)
+        except BaseException as e:
+            self._fail(run.stage.name, e)
+        finally:
+            with run.lock:
+                run.active -= 1
+                last = run.active == 0
+            # The last worker out passes the end of stream on
+            if last and run.outbox is not None and not self.cancelled:
+                self._put(run.outbox, _DONE, run.stage.name)
+
+    def _take(self, run: _StageRun) -> tuple[list, bool]:
+        # Waits for one item, then adds what is already queued, or arrives
+        # within max_wait, up to batch_size
+        item = self._get(run)
+        if item is _CANCELLED:
+            return [], True
+        batch = []
+        deadline = time.monotonic() + run.stage.max_wait
+        while item is not _DONE:
+            batch.append(item)
+            if len(batch) >= run.stage.batch_size:
+                break
+            timeout = deadline - time.monotonic()
+            try:
+                item = run.inbox.get(timeout=timeout) if timeout > 0 else run.inbox.get_nowait()
+            except queue.Empty:
+                break
+        if item is _DONE:
+            # Left for the stage's other workers; nothing else is put on
+            # this queue any more, so there is room
+            run.inbox.put_nowait(_DONE)
+        QUEUE_DEPTH.set(run.inbox.qsize(), stage=run.stage.name)
+        return batch, item is _DONE
+
+    def _process(self, run: _StageRun, batch: list) -> None:
+        outputs = run.stage.fn(batch)
+        try:
+            for output in outputs:
+                if run.outbox is None:
+                    with run.lock:
+                        run.emitted += 1
+                elif not self._put(run.outbox, output, run.stage.name):
+                    return
+        finally:
+            close = getattr(outputs, "close", None)
+            if close:
+                close()
+
+    def _get(self, run: _StageRun):
+        started = time.perf_counter()
+        try:
+            while not self.cancelled:
+                try:
+                    return run.inbox.get(timeout=self.POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _CANCELLED
+        finally:
+            WAIT_SECONDS.inc(time.perf_counter() - started, stage=run.stage.name, state="idle")
+
+    def _put(self, outbox: queue.Queue, item, name: str) -> bool:
+        started = time.perf_counter()
+        try:
+            while not self.cancelled:
+                try:
+                    outbox.put(item, timeout=self.POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            WAIT_SECONDS.inc(time.perf_counter() - started, stage=name, state="blocked")
+
+    def _fail(self, name: str, error: BaseException) -> None:
+        logger.error(f"Pipeline stage {name} failed: {error!r}")
+        self._errors.append(error)
+        self.cancel()
+
+
+class Checkpoint:
+    # Append-only journal of ingest progress. A file is recorded as done
+    # only after both indexes were flushed with it, a repo as started only
+    # after its old rows were deleted and flushed. Files handed to the
+    # indexes since the last flush are journalled as pending first: an
+    # interrupted run may have written them to one index but not the
+    # other, so a resumed run deletes them before indexing them again
+    DEFAULT_PATH = Path(".cache/pipeline/checkpoint.jsonl")
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path or self.DEFAULT_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # repo -> path -> blob sha
+        self._done: dict[str, dict[str, str]] = {}
+        self._started: set[str] = set()
+        self._pending: dict[str, set[str]] = {}
+        self._load()
+
+    def started(self, repo_name: str) -> bool:
+        return repo_name in self._started
+
+    def is_done(self, repo_name: str, path: str, sha: str) -> bool:
+        return self._done.get(repo_name, {}).get(path) == sha
+
+    def indexed(self, repo_name: str, path: str) -> bool:
+        return path in self._done.get(repo_name, {})
+
+    def paths(self, repo_name: str) -> set[str]:
+        return set(self._done.get(repo_name, ()))
+
+    def pending(self, repo_name: str) -> set[str]:
+        return set(self._pending.get(repo_name, ()))
+
+    def begin(self, files: Iterable[FileContent]) -> None:
+        paths = [[file.repo_name, file.path] for file in files]
+        if paths:
+            self._append({"pending": paths})
+
+    def commit(self, repo_names: Iterable[str], files: Iterable[FileContent]) -> None:
+        started = sorted(set(repo_names) - self._started)
+        done = [[file.repo_name, file.path, file.sha] for file in files]
+        if started or done:
+            self._append({"started": started, "done": done})
+
+    def clear(self) -> None:
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self._done, self._started, self._pending = {}, set(), {}
+
+    def _append(self, record: dict) -> None:
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self._apply(record)
+
+    def _apply(self, record: dict) -> None:
+        for repo_name, path in record.get("pending", ()):
+            self._pending.setdefault(repo_name, set()).add(path)
+        self._started.update(record.get("started", ()))
+        for repo_name, path, sha in record.get("done", ()):
+            self._done.setdefault(repo_name, {})[path] = sha
+            self._pending.get(repo_name, set()).discard(path)
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        for line in self.path.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line of a killed run
+                break
+            self._apply(record)
+        if self._started:
+            logger.info(f"Resuming from checkpoint {self.path}")
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    chunks: int = 0
+    # Files already indexed by an interrupted run
+    resumed: int = 0
+    failed_repos: list[str] = field(default_factory=list)
+
+
+class IngestPipeline:
+    # fetch -> decode -> chunk -> embed -> index as one Pipeline. Fetching
+    # is I/O bound and runs a repo per thread; decode loads contents out of
+    # the blob store; parsing runs in a process pool fed by the chunk
+    # threads; embedding and index writes run on one thread each. Progress
+    # is checkpointed every CHECKPOINT_SECONDS, so an interrupted run is
+    # resumed by running it again over the same repos. Index writes hold
+    # index_lock, which callers writing the same indexes can share.
+    CHECKPOINT_SECONDS = 30.0
+    # Parse and embed calls wait this long to fill a batch
+    BATCH_WAIT_SECONDS = 0.05
+    # Index writes rewrite headers and string tables, so they gather up
+    # to INDEX_BATCHES embedded batches for up to INDEX_WAIT_SECONDS
+    INDEX_BATCHES = 32
+    INDEX_WAIT_SECONDS = 1.0
+
+    def __init__(
+        self,
+        crawler,
+        chunker: Chunker,
+        chunk_cache: ChunkCache,
+        embedding_stage: EmbeddingStage,
+        vector_index: VectorIndex,
+        lexical_index: LexicalIndex,
+        checkpoint: Checkpoint | None = None,
+        fetch_workers: int = 4,
+        chunk_processes: int | None = None,
+        batch_size: int = 32,
+        queue_size: int = 64,
+        checkpoint_seconds: float | None = None,
+        index_lock: AbstractContextManager | None = None,
+    ):
+        self.crawler = crawler
+        self.chunker = chunker
+        self.chunk_cache = chunk_cache
+        self.embedding_stage = embedding_stage
+        self.vector_index = vector_index
+        self.lexical_index = lexical_index
+        self.checkpoint = checkpoint if checkpoint is not None else Checkpoint()
+        # None uses every core, 1 parses on the chunk thread itself
+        self.chunk_processes = chunk_processes or os.cpu_count() or 1
+        self.checkpoint_seconds = (
+            self.CHECKPOINT_SECONDS if checkpoint_seconds is None else checkpoint_seconds
+        )
+        self.pipeline = Pipeline(
+            [
+                Stage("fetch", self._fetch, workers=fetch_workers, queue_size=queue_size),
+                Stage(
+                    "decode",
+                    self._decode,
+                    workers=2,
+                    batch_size=batch_size,
+                    queue_size=queue_size,
+                ),
+                Stage(
+                    "chunk",
+                    self._chunk,
+                    workers=self.chunk_processes,
+                    batch_size=batch_size,
+                    queue_size=queue_size,
+                    max_wait=self.BATCH_WAIT_SECONDS,
+                ),
+                Stage(
+                    "embed",
+                    self._embed,
+                    batch_size=batch_size,
+                    queue_size=queue_size,
+                    max_wait=self.BATCH_WAIT_SECONDS,
+                ),
+                # Items here are whole embedded batches
+                Stage(
+                    "index",
+                    self._index,
+                    batch_size=self.INDEX_BATCHES,
+                    queue_size=max(queue_size // batch_size, 2),
+                    max_wait=self.INDEX_WAIT_SECONDS,
+                ),
+            ]
+        )
+        self.stats = IngestStats()
+        self._lock = threading.Lock()
+        self._index_lock = index_lock or threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._crawled: list[str] = []
+        self._seen: dict[str, set[str]] = {}
+        # Repos whose rows from before this run were dealt with
+        self._reset: set[str] = set()
+        self._unflushed: list[FileContent] = []
+        self._last_commit = time.monotonic()
+
+    def run(self, repos: Iterable[Repository.Repository]) -> IngestStats:
+        if self.chunk_processes > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.chunk_processes)
+            # Forks the workers now, before any pipeline thread is running
+            self._pool.submit(int).result()
+        try:
+            self.pipeline.run(repos)
+        finally:
+            self._commit()
+            if self._pool:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+        self._finish()
+        return self.stats
+
+    def cancel(self) -> None:
+        self.pipeline.cancel()
+
+    def _fetch(self, repos: list[Repository.Repository]) -> Iterator[FileContent]:
+        for repo in repos:
+            try:
+                yield from self.crawler.iter_repo(repo)
+            except Exception as e:
+                logger.error(f"Failed to crawl repository {repo.full_name}: {e}")
+                with self._lock:
+                    self.stats.failed_repos.append(repo.full_name)
+            else:
+                with self._lock:
+                    self._crawled.append(repo.full_name)
+
+    def _decode(self, files: list[FileContent]) -> Iterator[FileContent]:
+        for file in files:
+            with self._lock:
+                self._seen.setdefault(file.repo_name, set()).add(file.path)
+            if file.sha is None:
+                data = file.data
+                file = file.replace(content=data, sha=git_blob_sha(data))
+            if self.checkpoint.is_done(file.repo_name, file.path, file.sha):
+                with self._lock:
+                    self.stats.resumed += 1
+                continue
+            if not file.is_loaded:
+                file = file.replace(content=file.data)
+            yield file
+
+    def _chunk(self, files: list[FileContent]) -> Iterator[tuple[FileContent, list[Chunk]]]:
+        chunked = self.chunk_cache.chunk_files(self.chunker, files, executor=self._pool)
+        for file, chunks in zip(files, chunked):
+            # Chunks carry their own text, the file is only a record now
+            yield file.replace(content=b""), chunks
+
+    def _embed(
+        self, items: list[tuple[FileContent, list[Chunk]]]
+    ) -> list[tuple[list[FileContent], list[Chunk], np.ndarray]]:
+        files = [file for file, _ in items]
+        chunks, vectors = self.embedding_stage.embed_all(
+            chunk for _, file_chunks in items for chunk in file_chunks
+        )
+        return [(files, chunks, vectors)]
+
+    def _index(
+        self, batches: list[tuple[list[FileContent], list[Chunk], np.ndarray]]
+    ) -> list[FileContent]:
+        # Every batch waiting is written at once: each add rewrites the
+        # index headers and string tables
+        files = [file for batch_files, _, _ in batches for file in batch_files]
+        chunks = [chunk for _, batch_chunks, _ in batches for chunk in batch_chunks]
+        vectors = np.vstack([batch_vectors for _, _, batch_vectors in batches])
+        with self._index_lock:
+            for file in files:
+                self._clear_previous(file)
+            self.checkpoint.begin(files)
+            self.vector_index.add(chunks, vectors)
+            self.lexical_index.add(chunks)
+        self._unflushed.extend(files)
+        self.stats.files += len(files)
+        self.stats.chunks += len(chunks)
+        if time.monotonic() - self._last_commit >= self.checkpoint_seconds:
+            self._commit()
+        return files
+
+    def _clear_previous(self, file: FileContent) -> None:
+        repo_name = file.repo_name
+        if repo_name not in self._reset:
+            self._reset.add(repo_name)
+            if not self.checkpoint.started(repo_name):
+                # Not part of an interrupted run: re-indexed from scratch
+                self._delete(repo_name)
+                return
+            for path in self.checkpoint.pending(repo_name):
+                self._delete(repo_name, path)
+        if self.checkpoint.indexed(repo_name, file.path):
+            # Changed since the interrupted run indexed it
+            self._delete(repo_name, file.path)
+
+    def _delete(self, repo_name: str, path: str | None = None) -> None:
+        if path is None:
+            self.vector_index.delete_repo(repo_name)
+            self.lexical_index.delete_repo(repo_name)
+        else:
+            self.vector_index.delete_file(repo_name, path)
+            self.lexical_index.delete_file(repo_name, path)
+
+    def _commit(self) -> None:
+        # Files only count as done once both indexes are on disk
+        with self._index_lock:
+            self.vector_index.flush()
+            self.lexical_index.flush()
+        self.checkpoint.commit(self._reset, self._unflushed)
+        self._unflushed = []
+        self._last_commit = time.monotonic()
+
+    def _finish(self) -> None:
+        # Repos crawled to the end drop the files they no longer have
+        for repo_name in self._crawled:
+            seen = self._seen.get(repo_name, set())
+            with self._index_lock:
+                if repo_name not in self._reset:
+                    self._reset.add(repo_name)
+                    if not self.checkpoint.started(repo_name):
+                        self._delete(repo_name)
+                for path in self.checkpoint.paths(repo_name) - seen:
+                    self._delete(repo_name, path)
+            self.chunk_cache.evict_missing(repo_name, seen)
+        self._commit()
+        if self.stats.failed_repos:
+            logger.warning(
+                f"Keeping checkpoint {self.checkpoint.path}, "
+                f"{len(self.stats.failed_repos)} repos failed"
+            )
+        else:
+            self.checkpoint.clear()
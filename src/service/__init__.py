@@ -0,0 +1,12 @@
+from .http_server import HttpServer, QueryServer
+from .query_service import QueryService
+from .webhook import PushEvent, PushIndexer, WebhookServer
+
+__all__ = [
+    "HttpServer",
+    "PushEvent",
+    "PushIndexer",
+    "QueryServer",
+    "QueryService",
+    "WebhookServer",
+]
@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import logging
+import os
+
+import dotenv
+from rich.logging import RichHandler
+
+from src.indexing import EmbeddingCache, EmbeddingStage, HashingEmbedder, LexicalIndex, VectorIndex
+from src.ingestion import Chunker, GitHubClient, RepoCrawler
+from src.ingestion.chunk_cache import ChunkCache
+from src.service import PushIndexer, QueryServer, QueryService, WebhookServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[RichHandler()]
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve hybrid code search over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--webhook-port",
+        type=int,
+        help="Also receive GitHub push webhooks on this port and re-index what they change",
+    )
+    parser.add_argument(
+        "--webhook-secret",
+        default=os.getenv("GH_WEBHOOK_SECRET"),
+        help="Secret the webhook deliveries are signed with (default: $GH_WEBHOOK_SECRET)",
+    )
+    args = parser.parse_args()
+
+    service = QueryService(HashingEmbedder())
+    servers = [QueryServer(service, host=args.host, port=args.port)]
+    if args.webhook_port is not None:
+        dotenv.load_dotenv()
+        embedding_stage = EmbeddingStage(HashingEmbedder(), cache=EmbeddingCache())
+        client = GitHubClient(token=os.getenv("GH_TOKEN"))
+        indexer = PushIndexer(
+            RepoCrawler(client=client, use_cache=True),
+            Chunker(),
+            ChunkCache(),
+            embedding_stage,
+            VectorIndex(dim=embedding_stage.embedder.dim),
+            LexicalIndex(),
+        )
+        servers.append(
+            WebhookServer(
+                indexer, host=args.host, port=args.webhook_port, secret=args.webhook_secret
+            )
+        )
+
+    async def serve():
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+from dataclasses import asdict
+from urllib.parse import parse_qs, urlsplit
+
+from src.indexing.doc_table import DocFilter
+from src.metrics import REGISTRY
+from src.service.query_service import QueryService
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class HttpServer:
+    # Minimal HTTP/1.1 server with keep-alive. Subclasses answer requests
+    # in _route with a status and a JSON (dict) or plain text (str) payload
+    MAX_BODY_BYTES = 1 << 20
+    NAME = "HTTP server"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000):
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"{self.NAME} listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split(maxsplit=2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > self.MAX_BODY_BYTES:
+                    await self._respond(writer, 400, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and (
+                    version.strip() == "HTTP/1.1"
+                )
+                try:
+                    status, payload = await self._route(method, target, headers, body)
+                except Exception:
+                    logger.exception(f"Failed to handle {method} {target}")
+                    status, payload = 500, {"error": "Internal server error"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(
+        self, method: str, target: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict | str]:
+        raise NotImplementedError
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter, status: int, payload: dict | str, keep_alive: bool
+    ) -> None:
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+class QueryServer(HttpServer):
+    # HTTP front end of the query service:
+    #   GET  /search?q=...&k=10&repo=...&language=...&path_prefix=...
+    #   POST /search  {"query": ..., "k": ..., "repo": ..., ...}
+    #   GET  /stats
+    #   GET  /metrics   (Prometheus text format)
+    NAME = "Query service"
+
+    def __init__(self, service: QueryService, host: str = "127.0.0.1", port: int = 8000):
+        super().__init__(host, port)
+        self.service = service
+
+    async def start(self) -> None:
+        await self.service.start()
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self.service.stop()
+
+    async def _route(
+        self, method: str, target: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict | str]:
+        url = urlsplit(target)
+        if url.path == "/stats":
+            return 200, self.service.stats()
+        if url.path == "/metrics":
+            return 200, REGISTRY.to_prometheus()
+        if url.path != "/search":
+            return 404, {"error": "Not found"}
+
+        if method == "GET":
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        elif method == "POST":
+            try:
+                params = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                return 400, {"error": "Invalid JSON body"}
+            if not isinstance(params, dict):
+                return 400, {"error": "JSON body must be an object"}
+        else:
+            return 405, {"error": f"Unsupported method {method}"}
+
+        query = params.get("query") or params.get("q")
+        if not query:
+            return 400, {"error": "Missing query"}
+        if not isinstance(query, str):
+            return 400, {"error": "Query must be a string"}
+        try:
+            k = int(params.get("k", 10))
+            doc_filter = DocFilter(
+                repo_name=params.get("repo"),
+                language=params.get("language"),
+                path_prefix=params.get("path_prefix"),
+            )
+            hits = await self.service.search(query, k, doc_filter)
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
+        return 200, {"query": query, "results": [asdict(hit) for hit in hits]}
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.indexing.doc_table import DocFilter, SearchHit
+from src.indexing.embedder import Embedder
+from src.indexing.hybrid import HybridRetriever
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+QueryKey = tuple[str, int, DocFilter]
+
+
+class ResultCache:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._entries: OrderedDict[QueryKey, list[SearchHit]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: QueryKey) -> list[SearchHit] | None:
+        hits = self._entries.get(key)
+        if hits is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return hits
+
+    def put(self, key: QueryKey, hits: list[SearchHit]) -> None:
+        self._entries[key] = hits
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class LatencyStats:
+    QPS_WINDOW_SECONDS = 60.0
+
+    def __init__(self, window: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.count = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._completed: deque[float] = deque()
+        self._started = clock()
+
+    def record(self, seconds: float) -> None:
+        now = self.clock()
+        self.count += 1
+        self._latencies.append(seconds)
+        self._completed.append(now)
+        self._trim(now)
+
+    def snapshot(self) -> dict[str, float]:
+        now = self.clock()
+        self._trim(now)
+        window = min(self.QPS_WINDOW_SECONDS, now - self._started) or 1.0
+        latencies = np.asarray(self._latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        return {
+            "queries": self.count,
+            "p50_ms": float(p50),
+            "p99_ms": float(p99),
+            "qps": len(self._completed) / window,
+        }
+
+    def _trim(self, now: float) -> None:
+        while self._completed and self._completed[0] < now - self.QPS_WINDOW_SECONDS:
+            self._completed.popleft()
+
+
+class QueryService:
+    # Concurrent queries arriving within MAX_WAIT_SECONDS of each other are
+    # searched together; a short wait keeps tail latency low under load
+    MAX_BATCH = 32
+    MAX_WAIT_SECONDS = 0.002
+    RELOAD_CHECK_SECONDS = 1.0
+    # A load overlapping an index flush is retried until the indexes hold
+    # still; past the timeout (a writer killed mid-flush) they are loaded
+    # as they are
+    LOAD_RETRY_SECONDS = 0.05
+    LOAD_TIMEOUT_SECONDS = 30.0
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        vector_path: Path | None = None,
+        lexical_path: Path | None = None,
+        cache_size: int = 1024,
+        max_batch: int = MAX_BATCH,
+        max_wait: float = MAX_WAIT_SECONDS,
+        candidates: int = 50,
+    ):
+        self.embedder = embedder
+        self.vector_path = Path(vector_path or VectorIndex.DEFAULT_INDEX_DIR)
+        self.lexical_path = Path(lexical_path or LexicalIndex.DEFAULT_INDEX_DIR)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.candidates = candidates
+        self.cache = ResultCache(cache_size)
+        self.latency = LatencyStats()
+        self.batches = 0
+        self.batched_queries = 0
+
+        # One worker serializes index access; numpy releases the GIL inside it
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._generation = 0
+        self._loaded_generation = 0
+        self._index_version = self._index_mtimes()
+        self._last_check = time.monotonic()
+        self._retriever = self._load()
+
+    def _load(self) -> HybridRetriever:
+        # Consistent once neither header was marked as writing and both
+        # were unchanged from before opening the indexes to after
+        logger.info(f"Loading indexes from {self.vector_path} and {self.lexical_path}")
+        deadline = time.monotonic() + self.LOAD_TIMEOUT_SECONDS
+        while True:
+            before = self._index_headers()
+            if not any(header.get("writing") for header in before):
+                try:
+                    retriever = self._open()
+                except Exception:
+                    # Files replaced while they were read
+                    if self._index_headers() == before:
+                        raise
+                else:
+                    if self._index_headers() == before:
+                        return retriever
+            if time.monotonic() >= deadline:
+                logger.warning("Indexes are still being written, loading them as they are")
+                return self._open()
+            time.sleep(self.LOAD_RETRY_SECONDS)
+
+    def _open(self) -> HybridRetriever:
+        return HybridRetriever(
+            self.embedder,
+            VectorIndex(self.vector_path),
+            LexicalIndex(self.lexical_path),
+            candidates=self.candidates,
+        )
+
+    def _header_paths(self) -> tuple[Path, Path]:
+        return (
+            self.vector_path / VectorIndex.HEADER_FILE,
+            self.lexical_path / LexicalIndex.HEADER_FILE,
+        )
+
+    def _index_headers(self) -> tuple[dict, ...]:
+        # Headers are replaced atomically, a missing one is an empty index
+        return tuple(
+            json.loads(h.read_text()) if h.exists() else {} for h in self._header_paths()
+        )
+
+    def _index_mtimes(self) -> tuple[int, ...]:
+        return tuple(h.stat().st_mtime_ns if h.exists() else 0 for h in self._header_paths())
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run_batches())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def invalidate(self) -> None:
+        # Called when the indexes change; reloads before the next search
+        self._generation += 1
+        self.cache.clear()
+
+    async def search(
+        self, query: str, k: int = 10, doc_filter: DocFilter | None = None
+    ) -> list[SearchHit]:
+        if k < 1:
+            raise ValueError("k must be positive")
+        started = time.monotonic()
+        self._check_reload(started)
+        key = (query, k, doc_filter or DocFilter())
+
+        hits = self.cache.get(key)
+        if hits is None:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((key, future))
+            hits = await future
+
+        self.latency.record(time.monotonic() - started)
+        return hits
+
+    def stats(self) -> dict[str, float]:
+        return {
+            **self.latency.snapshot(),
+            "batches": self.batches,
+            "avg_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache),
+        }
+
+    def _check_reload(self, now: float) -> None:
+        if now - self._last_check < self.RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+        mtimes = self._index_mtimes()
+        if mtimes != self._index_version:
+            self._index_version = mtimes
+            self.invalidate()
+
+    async def _run_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._execute(batch)
+
+    async def _execute(self, batch: list[tuple[QueryKey, asyncio.Future]]) -> None:
+        generation = self._generation
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        self.batches += 1
+        self.batched_queries += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._search_keys, keys, generation
+            )
+        except Exception as e:
+            logger.exception("Search batch failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Results computed against an older index must not be cached
+        if generation == self._generation:
+            for key in keys:
+                self.cache.put(key, results[key])
+        for key, future in batch:
+            if not future.done():
+                future.set_result(results[key])
+
+    def _search_keys(
+        self, keys: list[QueryKey], generation: int
+    ) -> dict[QueryKey, list[SearchHit]]:
+        if generation != self._loaded_generation:
+            self._retriever = self._load()
+            self._loaded_generation = generation
+
+        groups: dict[tuple[int, DocFilter], list[str]] = {}
+        for query, k, doc_filter in keys:
+            groups.setdefault((k, doc_filter), []).append(query)
+
+        results: dict[QueryKey, list[SearchHit]] = {}
+        for (k, doc_filter), queries in groups.items():
+            hits = self._retriever.search_batch(queries, k, doc_filter)
+            for query, query_hits in zip(queries, hits):
+                results[(query, k, doc_filter)] = query_hits
+        return results
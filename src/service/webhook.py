@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from src.indexing.embedder import EmbeddingStage
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_index import VectorIndex
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.chunker import Chunker
+from src.ingestion.repo_crawler import RepoCrawler
+from src.metrics import REGISTRY
+from src.pipeline import Checkpoint, IngestPipeline
+from src.service.http_server import HttpServer
+
+logger = logging.getLogger(__name__)
+
+# result: queued, coalesced, ignored (not a default branch push) when
+# received; applied, resynced or failed once processed
+PUSHES = REGISTRY.counter(
+    "webhook_pushes_total", "Push events received and processed", ["result"]
+)
+INDEX_LAG = REGISTRY.histogram(
+    "webhook_index_lag_seconds",
+    "Time from receiving a push to its changes being searchable",
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+
+
+@dataclass
+class PushEvent:
+    # The paths one or more consecutive pushes touched on a repo's default
+    # branch, moving it from before to after. complete is False when the
+    # payload cannot be trusted to list every change: force pushes, or
+    # more commits than GitHub includes in a payload
+    MAX_PAYLOAD_COMMITS = 20
+
+    repo_name: str
+    before: str
+    after: str
+    paths: set[str] = field(default_factory=set)
+    # Commit date of the last commit touching each added or modified path
+    modified: dict[str, datetime] = field(default_factory=dict)
+    complete: bool = True
+    pushes: int = 1
+    received_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def parse(cls, payload: dict) -> "PushEvent | None":
+        # None for pushes that do not change what is indexed: other
+        # branches, tags, a deleted default branch
+        try:
+            repository = payload["repository"]
+            branch = repository.get("default_branch") or repository.get("master_branch")
+            if payload["ref"] != f"refs/heads/{branch}" or payload.get("deleted"):
+                return None
+            commits = payload.get("commits") or []
+            event = cls(
+                repo_name=repository["full_name"],
+                before=payload["before"],
+                after=payload["after"],
+                complete=not payload.get("forced")
+                and not payload.get("created")
+                and len(commits) < cls.MAX_PAYLOAD_COMMITS,
+            )
+            for commit in commits:
+                timestamp = datetime.fromisoformat(commit["timestamp"].replace("Z", "+00:00"))
+                for path in commit.get("added", []) + commit.get("modified", []):
+                    event.paths.add(path)
+                    event.modified[path] = timestamp
+                for path in commit.get("removed", []):
+                    event.paths.add(path)
+                    event.modified.pop(path, None)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise ValueError(f"Malformed push payload: {e}") from e
+        return event
+
+    def merge(self, later: "PushEvent") -> "PushEvent":
+        # One event covering both pushes. A gap between them (a push that
+        # never arrived, or arrived out of order) makes it incomplete
+        return PushEvent(
+            repo_name=self.repo_name,
+            before=self.before,
+            after=later.after,
+            paths=self.paths | later.paths,
+            modified={**self.modified, **later.modified},
+            complete=self.complete and later.complete and later.before == self.after,
+            pushes=self.pushes + later.pushes,
+            received_at=min(self.received_at, later.received_at),
+        )
+
+
+class PushIndexer:
+    # Brings the cache, chunk cache and indexes of one repo up to date with
+    # a push. When the cached snapshot is at the push's before commit only
+    # the pushed paths are fetched, parsed and re-indexed; otherwise (or if
+    # the payload is incomplete, or the repo's .gitattributes changed) the
+    # repo is re-crawled through IngestPipeline, which still reuses every
+    # cached blob and chunk. Fetching, parsing and embedding run
+    # concurrently across repos, only index writes take turns.
+    CHECKPOINT_DIR = Path(".cache/pipeline/webhook")
+
+    def __init__(
+        self,
+        crawler: RepoCrawler,
+        chunker: Chunker,
+        chunk_cache: ChunkCache,
+        embedding_stage: EmbeddingStage,
+        vector_index: VectorIndex,
+        lexical_index: LexicalIndex,
+        checkpoint_dir: Path | None = None,
+    ):
+        self.crawler = crawler
+        self.chunker = chunker
+        self.chunk_cache = chunk_cache
+        self.embedding_stage = embedding_stage
+        self.vector_index = vector_index
+        self.lexical_index = lexical_index
+        self.checkpoint_dir = checkpoint_dir or self.CHECKPOINT_DIR
+        self._index_lock = threading.Lock()
+
+    def apply(self, event: PushEvent) -> str:
+        # "applied" or "resynced"
+        repo = self.crawler.client.get_repo(event.repo_name)
+        if self._can_apply(event):
+            try:
+                self._apply_paths(repo, event)
+                return "applied"
+            except Exception as e:
+                logger.warning(f"Incremental update of {event.repo_name} failed: {e}")
+        self._resync(repo)
+        return "resynced"
+
+    def _can_apply(self, event: PushEvent) -> bool:
+        return (
+            event.complete
+            and ".gitattributes" not in event.paths
+            and self.crawler.cached_commit(event.repo_name) == event.before
+        )
+
+    def _apply_paths(self, repo, event: PushEvent) -> None:
+        files, removed = self.crawler.update_paths(
+            repo, event.paths, event.after, last_modified=event.modified
+        )
+        chunked = list(self.chunk_cache.chunk_files(self.chunker, files))
+        self.chunk_cache.evict_paths(event.repo_name, removed)
+        chunks, vectors = self.embedding_stage.embed_all(
+            chunk for file_chunks in chunked for chunk in file_chunks
+        )
+        with self._index_lock:
+            for path in event.paths:
+                self.vector_index.delete_file(event.repo_name, path)
+                self.lexical_index.delete_file(event.repo_name, path)
+            if chunks:
+                self.vector_index.add(chunks, vectors)
+                self.lexical_index.add(chunks)
+            self.vector_index.flush()
+            self.lexical_index.flush()
+        logger.info(
+            f"Applied {event.pushes} pushes to {event.repo_name}: {len(files)} files updated, "
+            f"{len(removed)} removed, {len(chunks)} chunks"
+        )
+
+    def _resync(self, repo) -> None:
+        # Other repos' updates keep going meanwhile: the pipeline only holds
+        # the index lock while writing. Each repo journals to its own
+        # checkpoint, as repos re-crawl concurrently
+        logger.info(f"Re-crawling {repo.full_name}")
+        checkpoint_path = self.checkpoint_dir / f"{repo.full_name.replace('/', '__')}.jsonl"
+        stats = IngestPipeline(
+            self.crawler,
+            self.chunker,
+            self.chunk_cache,
+            self.embedding_stage,
+            self.vector_index,
+            self.lexical_index,
+            checkpoint=Checkpoint(checkpoint_path),
+            chunk_processes=1,
+            index_lock=self._index_lock,
+        ).run([repo])
+        if stats.failed_repos:
+            raise RuntimeError(f"Re-crawl of {repo.full_name} failed")
+
+
+class WebhookServer(HttpServer):
+    # Receives GitHub push webhooks and keeps the indexes current:
+    #   POST /webhook   (X-GitHub-Event: push or ping)
+    #   GET  /stats
+    #   GET  /metrics   (Prometheus text format)
+    # Pushes to a repo are coalesced for coalesce_seconds, and while one
+    # is being indexed, into a single update. Up to max_concurrent_repos
+    # repos are updated at once. With a secret, deliveries must carry a
+    # valid X-Hub-Signature-256.
+    NAME = "Webhook receiver"
+    # GitHub caps payloads at 25 MB
+    MAX_BODY_BYTES = 25 << 20
+    COALESCE_SECONDS = 1.0
+
+    def __init__(
+        self,
+        indexer: PushIndexer,
+        host: str = "127.0.0.1",
+        port: int = 8001,
+        secret: str | None = None,
+        max_concurrent_repos: int = 4,
+        coalesce_seconds: float | None = None,
+    ):
+        if max_concurrent_repos < 1:
+            raise ValueError("max_concurrent_repos must be at least 1")
+        super().__init__(host, port)
+        self.indexer = indexer
+        self.secret = secret
+        self.max_concurrent_repos = max_concurrent_repos
+        self.coalesce_seconds = (
+            self.COALESCE_SECONDS if coalesce_seconds is None else coalesce_seconds
+        )
+        self._executor: ThreadPoolExecutor | None = None
+        # Next event per repo, and the task working through them
+        self._pending: dict[str, PushEvent] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._counts: dict[str, int] = {}
+
+    async def start(self) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_repos, thread_name_prefix="webhook"
+        )
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self.drain()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def drain(self) -> None:
+        # Returns once every received push has been processed
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"pending": sorted(self._pending), **self._counts}
+
+    def enqueue(self, event: PushEvent) -> str:
+        pending = self._pending.get(event.repo_name)
+        if pending is not None:
+            self._pending[event.repo_name] = pending.merge(event)
+            result = "coalesced"
+        else:
+            self._pending[event.repo_name] = event
+            result = "queued"
+        if event.repo_name not in self._tasks:
+            self._tasks[event.repo_name] = asyncio.get_running_loop().create_task(
+                self._run_repo(event.repo_name)
+            )
+        self._count(result)
+        return result
+
+    async def _run_repo(self, repo_name: str) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while repo_name in self._pending:
+                await asyncio.sleep(self.coalesce_seconds)
+                event = self._pending.pop(repo_name)
+                try:
+                    result = await loop.run_in_executor(
+                        self._executor, self.indexer.apply, event
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to index push to {repo_name}: {e}")
+                    self._count("failed")
+                else:
+                    self._count(result)
+                    INDEX_LAG.observe(time.time() - event.received_at)
+        finally:
+            del self._tasks[repo_name]
+
+    def _count(self, result: str) -> None:
+        PUSHES.inc(result=result)
+        self._counts[result] = self._counts.get(result, 0) + 1
+
+    def _verify(self, headers: dict[str, str], body: bytes) -> bool:
+        if not self.secret:
+            return True
+        digest = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        signature = headers.get("x-hub-signature-256", "")
+        return hmac.compare_digest(signature, f"sha256={digest}")
+
+    async def _route(
+        self, method: str, target: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict | str]:
+        path = urlsplit(target).path
+        if path == "/stats":
+            return 200, self.stats()
+        if path == "/metrics":
+            return 200, REGISTRY.to_prometheus()
+        if path != "/webhook":
+            return 404, {"error": "Not found"}
+        if method != "POST":
+            return 405, {"error": f"Unsupported method {method}"}
+        if not self._verify(headers, body):
+            return 401, {"error": "Invalid signature"}
+
+        event_type = headers.get("x-github-event")
+        if event_type == "ping":
+            return 200, {"status": "pong"}
+        if event_type != "push":
+            return 200, {"status": "ignored"}
+        try:
+            event = PushEvent.parse(json.loads(body))
+        except ValueError as e:
+            # JSONDecodeError is a ValueError too
+            return 400, {"error": str(e)}
+        if event is None:
+            self._count("ignored")
+            return 200, {"status": "ignored"}
+        return 202, {"status": self.enqueue(event)}
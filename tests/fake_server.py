@@ -0,0 +1,83 @@
+import json
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeServer:
+    """Local HTTP server replaying queued responses per request path."""
+
+    def __init__(self, keep_alive: bool = False):
+        self.keep_alive = keep_alive
+        self.requests: list[tuple[str, str, dict[str, str]]] = []
+        self._responses: dict[str, deque] = defaultdict(deque)
+        self._defaults: dict[str, tuple[int, dict[str, str], bytes]] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def enqueue(self, path, status=200, body=None, headers=None):
+        self._responses[path].append(self._encode(status, body, headers))
+
+    def set_default(self, path, status=200, body=None, headers=None):
+        self._defaults[path] = self._encode(status, body, headers)
+
+    def count(self, path: str) -> int:
+        return sum(1 for _, p, _ in self.requests if p == path)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _encode(status, body, headers):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        return status, dict(headers or {}), body or b""
+
+    def _next_response(self, path):
+        queued = self._responses.get(path)
+        if queued:
+            return queued.popleft()
+        return self._defaults.get(path, (404, {}, b'{"message": "Not Found"}'))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" if server.keep_alive else "HTTP/1.0"
+
+            def _respond(self):
+                path = self.path.split("?", 1)[0]
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                server.requests.append((self.command, path, dict(self.headers)))
+                status, headers, body = server._next_response(path)
+                self.send_response(status)
+                headers.setdefault("Content-Type", "application/json")
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,97 @@
+import io
+import tarfile
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.ingestion.archive import ArchiveReader
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.repo_crawler import RepoCrawler
+
+
+def make_tarball(files: dict[str, bytes], root="owner-repo-abc123") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        root_info = tarfile.TarInfo(root)
+        root_info.type = tarfile.DIRTYPE
+        tar.addfile(root_info)
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"{root}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+@patch("src.ingestion.github_client.Github")
+@patch("src.ingestion.github_client.Auth")
+def client(mock_auth, mock_github):
+    mock_github.return_value.get_user.return_value = MagicMock()
+    return GitHubClient(token="test-token")
+
+
+@pytest.fixture
+def tarball():
+    return make_tarball(
+        {
+            "src/main.py": b"print('hello')\n",
+            "src/__pycache__/main.py": b"stale",
+            "README.md": b"# Title\n",
+            "logo.png": b"\x89PNG",
+            "binary.json": b"\xff\xfe\x00",
+            "empty.py": b"   \n",
+            "big.txt": b"a" * 64,
+        }
+    )
+
+
+class TestArchiveReader:
+    def test_iter_files_filters_and_strips_root(self, client, tarball):
+        reader = ArchiveReader(client=client, max_file_size=32)
+
+        files = list(
+            reader.iter_files(
+                io.BytesIO(tarball),
+                repo_name="owner/repo",
+                repo_url="https://github.com/owner/repo",
+            )
+        )
+
+        assert [f.path for f in files] == ["src/main.py", "README.md"]
+        assert files[0].content == "print('hello')\n"
+        assert files[0].language == "Python"
+        assert files[0].repo_name == "owner/repo"
+        assert files[0].size == len(b"print('hello')\n")
+
+    def test_reads_non_seekable_stream(self, client, tarball):
+        stream = MagicMock()
+        source = io.BytesIO(tarball)
+        stream.read.side_effect = source.read
+        reader = ArchiveReader(client=client, max_file_size=1024)
+
+        files = list(reader.iter_files(stream, repo_name="o/r", repo_url="u"))
+
+        assert len(files) == 3
+        stream.seek.assert_not_called()
+
+
+class TestArchiveCrawl:
+    def test_crawl_repo_uses_single_download(self, client, tarball):
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.raw = io.BytesIO(tarball)
+
+        with patch.object(client, "open_archive", return_value=response) as mock_open:
+            crawler = RepoCrawler(
+                client=client,
+                use_cache=False,
+                mode="archive",
+                resolve_last_modified=False,
+            )
+            files = crawler.crawl_repo(repo)
+
+        mock_open.assert_called_once_with(repo, "main")
+        repo.get_git_blob.assert_not_called()
+        repo.get_contents.assert_not_called()
+        assert {f.path for f in files} == {"src/main.py", "README.md", "big.txt"}
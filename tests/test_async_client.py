@@ -0,0 +1,248 @@
+import asyncio
+import gzip
+
+import pytest
+from github import GithubException, RateLimitExceededException
+
+from src.ingestion.async_client import AsyncGitHubClient
+from src.ingestion.async_http import AsyncConnectionPool
+from src.ingestion.models import RepoMetadata
+from src.ingestion.rate_limit import RateLimitScheduler
+from tests.fake_server import FakeServer
+
+REPO_JSON = {
+    "name": "repo",
+    "full_name": "owner/repo",
+    "html_url": "https://github.com/owner/repo",
+    "private": True,
+    "description": "A repo",
+    "topics": ["search"],
+    "created_at": "2024-01-02T03:04:05Z",
+    "updated_at": "2024-02-01T00:00:00Z",
+}
+
+
+@pytest.fixture
+def server():
+    server = FakeServer(keep_alive=True).start()
+    yield server
+    server.stop()
+
+
+def make_client(server, **kwargs):
+    scheduler = RateLimitScheduler(requests_per_second=1000, burst=1000, backoff_base=0.01)
+    return AsyncGitHubClient(
+        token="test-token", base_url=server.url, scheduler=scheduler, **kwargs
+    )
+
+
+class TestConnectionPool:
+    def test_reuses_keep_alive_connections(self, server):
+        server.set_default("/ping", body={"ok": True})
+
+        async def go():
+            async with AsyncConnectionPool(max_per_host=2) as pool:
+                responses = [await pool.request("GET", f"{server.url}/ping") for _ in range(5)]
+                return responses, pool.connections_opened
+
+        responses, opened = asyncio.run(go())
+
+        assert [r.json() for r in responses] == [{"ok": True}] * 5
+        assert opened == 1
+
+    def test_caps_concurrency_per_host(self, server):
+        server.set_default("/ping", body={"ok": True})
+
+        async def go():
+            async with AsyncConnectionPool(max_per_host=3) as pool:
+                requests = [pool.request("GET", f"{server.url}/ping") for _ in range(30)]
+                await asyncio.gather(*requests)
+                return pool.connections_opened, pool.requests_sent
+
+        opened, sent = asyncio.run(go())
+
+        assert opened <= 3
+        assert sent == 30
+
+    def test_decodes_gzip_and_close_delimited_bodies(self):
+        server = FakeServer().start()
+        server.set_default(
+            "/zipped", body=gzip.compress(b'{"a": 1}'), headers={"Content-Encoding": "gzip"}
+        )
+
+        async def go():
+            async with AsyncConnectionPool() as pool:
+                first = await pool.request("GET", f"{server.url}/zipped")
+                second = await pool.request("GET", f"{server.url}/zipped")
+                return first.json(), second.json(), pool.connections_opened
+
+        try:
+            first, second, opened = asyncio.run(go())
+        finally:
+            server.stop()
+
+        assert first == second == {"a": 1}
+        assert opened == 2
+
+    def test_follows_redirects(self, server):
+        server.enqueue("/old", status=301, headers={"Location": "/new"})
+        server.set_default("/new", body={"moved": True})
+
+        async def go():
+            async with AsyncConnectionPool() as pool:
+                return await pool.request("GET", f"{server.url}/old")
+
+        response = asyncio.run(go())
+
+        assert response.status_code == 200
+        assert response.json() == {"moved": True}
+
+
+class TestAsyncGitHubClient:
+    def test_requires_token(self, monkeypatch):
+        monkeypatch.delenv("GH_TOKEN", raising=False)
+
+        with pytest.raises(ValueError):
+            AsyncGitHubClient()
+
+    def test_get_repos_paginates_into_models(self, server):
+        private = {**REPO_JSON}
+        public = {**REPO_JSON, "name": "pub", "full_name": "owner/pub", "private": False}
+        next_link = f'<{server.url}/user/repos?page=2>; rel="next"'
+        server.enqueue("/user/repos", body=[private], headers={"Link": next_link})
+        server.enqueue("/user/repos", body=[public])
+
+        async def go():
+            async with make_client(server) as client:
+                return await client.get_repos(include_private=False)
+
+        repos = asyncio.run(go())
+
+        assert [r.full_name for r in repos] == ["owner/pub"]
+        assert isinstance(repos[0], RepoMetadata)
+        assert repos[0].topics == ["search"]
+        assert repos[0].created_at.year == 2024
+        assert server.count("/user/repos") == 2
+        assert server.requests[0][2]["Authorization"] == "Bearer test-token"
+
+    def test_get_repo_metadata_counts_commits_from_link(self, server):
+        server.set_default("/repos/owner/repo", body=REPO_JSON)
+        server.set_default("/repos/owner/repo/languages", body={"Python": 1200})
+        last_link = f'<{server.url}/repos/owner/repo/commits?per_page=1&page=87>; rel="last"'
+        server.set_default(
+            "/repos/owner/repo/commits", body=[{"sha": "abc"}], headers={"Link": last_link}
+        )
+
+        async def go():
+            async with make_client(server) as client:
+                cheap = await client.get_repo_metadata("owner/repo")
+                full = await client.get_repo_metadata(
+                    "owner/repo", fields=("languages", "total_commits")
+                )
+                return cheap, full
+
+        cheap, metadata = asyncio.run(go())
+
+        assert cheap.languages == {}
+        assert server.count("/repos/owner/repo/languages") == 1
+        assert metadata.languages == {"Python": 1200}
+        assert metadata.total_commits == 87
+        assert metadata.description == "A repo"
+
+    def test_fetch_files_filters_and_decodes(self, server):
+        server.set_default(
+            "/repos/owner/repo/git/trees/HEAD",
+            body={
+                "truncated": False,
+                "tree": [
+                    {"path": "src", "type": "tree", "sha": "t1"},
+                    {"path": "src/main.py", "type": "blob", "sha": "b1", "size": 12},
+                    {"path": "logo.png", "type": "blob", "sha": "b2", "size": 4},
+                    {"path": "bin.py", "type": "blob", "sha": "b3", "size": 3},
+                    {"path": "huge.py", "type": "blob", "sha": "b4", "size": 10**9},
+                ],
+            },
+        )
+        server.set_default("/repos/owner/repo/git/blobs/b1", body=b"print('hi')\n")
+        server.set_default("/repos/owner/repo/git/blobs/b3", body=b"\xff\xfe\x00")
+        repo = RepoMetadata(
+            name="repo", full_name="owner/repo", url="https://github.com/owner/repo", private=False
+        )
+
+        async def go():
+            async with make_client(server) as client:
+                return await client.fetch_files(repo)
+
+        files = asyncio.run(go())
+
+        assert [(f.path, f.content, f.sha, f.language) for f in files] == [
+            ("src/main.py", "print('hi')\n", "b1", "Python")
+        ]
+        blob_request = next(r for r in server.requests if r[1].endswith("/b1"))
+        assert blob_request[2]["Accept"] == AsyncGitHubClient.RAW_MEDIA_TYPE
+        assert server.count("/repos/owner/repo/git/blobs/b4") == 0
+
+    def test_truncated_tree_listed_per_subtree(self, server):
+        root = "/repos/owner/repo/git/trees/HEAD"
+        server.enqueue(root, body={"truncated": True, "tree": []})
+        server.enqueue(
+            root,
+            body={
+                "truncated": False,
+                "tree": [
+                    {"path": "README.md", "type": "blob", "sha": "b0", "size": 5},
+                    {"path": "src", "type": "tree", "sha": "t-src"},
+                    {"path": "node_modules", "type": "tree", "sha": "t-nm"},
+                ],
+            },
+        )
+        server.set_default(
+            "/repos/owner/repo/git/trees/t-src",
+            body={
+                "truncated": False,
+                "tree": [
+                    {"path": "pkg", "type": "tree", "sha": "t-pkg"},
+                    {"path": "pkg/deep.py", "type": "blob", "sha": "b1", "size": 7},
+                ],
+            },
+        )
+
+        async def go():
+            async with make_client(server) as client:
+                return await client.get_tree("owner/repo")
+
+        entries = asyncio.run(go())
+
+        assert [(e.path, e.sha) for e in entries] == [
+            ("README.md", "b0"),
+            ("src/pkg/deep.py", "b1"),
+        ]
+        assert server.count("/repos/owner/repo/git/trees/t-nm") == 0
+
+    def test_retries_then_raises_github_exceptions(self, server):
+        server.enqueue("/repos/owner/flaky", status=502)
+        server.enqueue("/repos/owner/flaky", body=REPO_JSON)
+        server.set_default("/repos/owner/missing", status=404, body={"message": "Not Found"})
+        server.set_default(
+            "/repos/owner/limited",
+            status=403,
+            body={"message": "API rate limit exceeded"},
+            headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": "0"},
+        )
+
+        async def go():
+            async with make_client(server) as client:
+                client.scheduler.max_retries = 1
+                repo = await client.get_repo("owner/flaky")
+                with pytest.raises(GithubException) as missing:
+                    await client.get_repo("owner/missing")
+                client.scheduler.max_retries = 0
+                with pytest.raises(RateLimitExceededException):
+                    await client.get_repo("owner/limited")
+                return repo, missing.value.status
+
+        repo, status = asyncio.run(go())
+
+        assert repo.full_name == "owner/repo"
+        assert status == 404
+        assert server.count("/repos/owner/flaky") == 2
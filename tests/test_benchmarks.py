@@ -0,0 +1,78 @@
+import pytest
+
+from benchmarks.fake_github import FakeGitHub, RepoShape, SyntheticRepo
+from benchmarks.run import compare, run_suite
+
+
+class TestSyntheticRepo:
+    def test_shape_is_deterministic(self):
+        shape = RepoShape(files=30, depth=2, skipped_ratio=0.2)
+
+        a, b = SyntheticRepo(shape), SyntheticRepo(shape)
+
+        assert a.files == b.files
+        assert len(a.files) == 30
+        assert max(path.count("/") for path in a.files) <= 2
+        assert any(path.endswith(".png") for path in a.files)
+
+    def test_truncated_listing_can_be_walked_per_directory(self):
+        repo = SyntheticRepo(RepoShape(files=40, depth=2, max_tree_entries=10))
+
+        root = repo.tree(repo.head_sha, recursive=True)
+        top = repo.tree(repo.head_sha, recursive=False)
+
+        assert root["truncated"]
+        subtrees = [e for e in top["tree"] if e["type"] == "tree"]
+        assert all(repo.tree(e["sha"], recursive=False) for e in subtrees)
+
+    def test_routes_count_calls(self):
+        fake = FakeGitHub([RepoShape(name="o/r", files=5)])
+        repo = fake.repos["o/r"]
+        sha = next(iter(repo.blobs))
+
+        endpoint, status, _, _ = fake.handle("GET", f"/repos/o/r/git/blobs/{sha}", b"")
+        missing = fake.handle("GET", "/repos/o/missing", b"")
+
+        assert (endpoint, status) == ("blob", 200)
+        assert missing[1] == 404
+        fake._server.server_close()
+
+
+class TestRunSuite:
+    def test_tree_crawl_metrics(self):
+        shape = RepoShape(files=20, skipped_ratio=0.0)
+
+        results = run_suite(shape, modes=("tree",), workers=(2,))
+
+        [result] = results["results"]
+        cold, warm = result["cold"], result["warm"]
+        assert result["scenario"] == "tree-w2"
+        assert cold["files"] == warm["files"] == 20
+        assert cold["calls_by_endpoint"]["blob"] == 20
+        assert cold["bytes"] > warm["bytes"]
+        # A warm crawl of an unchanged repo only lists repos and checks HEAD
+        assert warm["calls_by_endpoint"] == {"user_repos": 1, "branch": 1}
+        assert result["cache"]["save_seconds"] > 0
+        assert result["memory"]["peak_bytes"] > 0
+        assert results["meta"]["shape"]["files"] == 20
+
+
+class TestCompare:
+    def test_flags_regressions_over_threshold(self):
+        baseline = {
+            "results": [{"scenario": "tree-w1", "cold": {"wall_seconds": 1.0, "api_calls": 100}}]
+        }
+        current = {
+            "results": [{"scenario": "tree-w1", "cold": {"wall_seconds": 1.5, "api_calls": 101}}]
+        }
+
+        regressions = compare(current, baseline, threshold=0.2)
+
+        assert len(regressions) == 1
+        assert "cold.wall_seconds" in regressions[0]
+
+    @pytest.mark.parametrize("baseline", [{}, {"results": [{"scenario": "other"}]}])
+    def test_ignores_unmatched_scenarios(self, baseline):
+        current = {"results": [{"scenario": "tree-w1", "cold": {"wall_seconds": 9.0}}]}
+
+        assert compare(current, baseline, threshold=0.1) == []
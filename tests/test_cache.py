@@ -0,0 +1,238 @@
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from github import GithubException
+from unittest.mock import MagicMock, patch
+
+from src.ingestion.cache import RepoCache, git_blob_sha
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.models import FileContent, RepoMetadata
+from src.ingestion.repo_crawler import RepoCrawler
+
+
+def make_file(path, content, repo_name="owner/repo", **kwargs):
+    return FileContent(
+        path=path,
+        content=content,
+        language=None,
+        repo_name=repo_name,
+        repo_url=f"https://github.com/{repo_name}",
+        size=len(content),
+        **kwargs,
+    )
+
+
+def make_metadata(full_name="owner/repo"):
+    return RepoMetadata(
+        name=full_name.split("/")[1],
+        full_name=full_name,
+        url=f"https://github.com/{full_name}",
+        private=False,
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RepoCache(cache_dir=tmp_path)
+
+
+class TestBlobStore:
+    def test_git_blob_sha_matches_git(self):
+        # git hash-object of "hello"
+        assert git_blob_sha(b"hello") == "b6fc4c620b67d95f953a5c1c1230aaab5db5a1b0"
+
+    def test_identical_content_stored_once(self, cache):
+        cache.save("owner/a", [make_file("x.py", "same", "owner/a")], make_metadata("owner/a"))
+        cache.save("owner/b", [make_file("y.py", "same", "owner/b")], make_metadata("owner/b"))
+
+        assert cache._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 1
+
+    def test_locations_and_dedup_stats(self, cache):
+        cache.save("owner/a", [make_file("x.py", "same", "owner/a")], make_metadata("owner/a"))
+        cache.save(
+            "owner/b",
+            [make_file("y.py", "same", "owner/b"), make_file("z.py", "other", "owner/b")],
+            make_metadata("owner/b"),
+        )
+
+        assert cache.locations(git_blob_sha(b"same")) == [("owner/a", "x.py"), ("owner/b", "y.py")]
+        assert cache.dedup_stats() == {
+            "files": 3,
+            "unique_blobs": 2,
+            "referenced_bytes": 13,
+            "stored_bytes": 9,
+        }
+
+    def test_prune_removes_unreferenced(self, cache):
+        cache.save("owner/repo", [make_file("a.py", "kept")], make_metadata())
+        orphan = cache.put_blob("orphan")
+
+        assert cache.prune_blobs() == 1
+        assert not cache.has_blob(orphan)
+        assert cache.has_blob(git_blob_sha(b"kept"))
+
+
+class TestSnapshots:
+    def test_roundtrip_with_matching_commit(self, cache):
+        modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        cache.save(
+            "owner/repo",
+            [make_file("a.py", "print(1)", last_modified=modified)],
+            make_metadata(),
+            commit_sha="c1",
+        )
+
+        files, metadata = cache.load(MagicMock(full_name="owner/repo"), commit_sha="c1")
+
+        assert files[0].content == "print(1)"
+        assert files[0].sha == git_blob_sha(b"print(1)")
+        assert files[0].last_modified == modified
+        assert metadata.full_name == "owner/repo"
+
+    def test_new_commit_invalidates(self, cache):
+        cache.save("owner/repo", [make_file("a.py", "x")], make_metadata(), commit_sha="c1")
+
+        assert cache.load(MagicMock(full_name="owner/repo"), commit_sha="c2") is None
+        assert cache.load_snapshot("owner/repo").commit_sha == "c1"
+
+    def test_unknown_repo(self, cache):
+        assert cache.load_snapshot("owner/missing") is None
+        assert cache.load(MagicMock(full_name="owner/missing")) is None
+
+
+class TestIndexedAccess:
+    @pytest.fixture
+    def populated(self, cache):
+        files = [make_file(f"src/f{i:03}.py", f"x = {i}") for i in range(600)]
+        cache.save("owner/repo", files, make_metadata(), commit_sha="c1")
+        return cache
+
+    def test_list_files_skips_contents(self, populated):
+        listed = populated.list_files("owner/repo")
+
+        assert len(listed) == 600
+        assert all(f.content == "" and f.sha for f in listed)
+
+    def test_load_single_file(self, populated):
+        assert populated.load_file("owner/repo", "src/f042.py").content == "x = 42"
+        assert populated.load_file("owner/repo", "missing.py") is None
+
+    def test_iter_files_is_lazy_and_complete(self, populated):
+        iterator = populated.iter_files("owner/repo", batch_size=100)
+
+        assert next(iterator).path == "src/f000.py"
+        assert len(list(iterator)) == 599
+
+    def test_iter_files_with_content_handles(self, populated):
+        files = list(populated.iter_files("owner/repo", lazy=True))
+
+        assert len(files) == 600
+        assert not files[42].is_loaded
+        assert files[42].content == "x = 42"
+
+    def test_partial_update(self, populated):
+        populated.update_files(
+            "owner/repo",
+            upserts=[make_file("src/f001.py", "changed"), make_file("new.py", "new")],
+            removed_paths=["src/f002.py"],
+            commit_sha="c2",
+        )
+
+        snapshot = populated.load_snapshot("owner/repo")
+        assert snapshot.commit_sha == "c2"
+        assert len(snapshot.files) == 600
+        assert populated.load_file("owner/repo", "src/f001.py").content == "changed"
+        assert populated.load_file("owner/repo", "src/f002.py") is None
+
+    def test_failed_update_rolls_back(self, populated):
+        bad = make_file("bad.py", "x")
+        bad.size = object()
+
+        with pytest.raises(Exception):
+            populated.update_files(
+                "owner/repo", upserts=[bad], removed_paths=["src/f000.py"], commit_sha="c2"
+            )
+
+        assert populated.load_snapshot("owner/repo").commit_sha == "c1"
+        assert populated.load_file("owner/repo", "src/f000.py") is not None
+
+
+def make_blob(text):
+    blob = MagicMock(encoding="base64")
+    blob.content = base64.b64encode(text.encode("utf-8")).decode("ascii")
+    return blob
+
+
+def make_element(path, content):
+    element = MagicMock(type="blob", size=len(content))
+    element.path = path
+    element.sha = git_blob_sha(content.encode("utf-8"))
+    return element
+
+
+class TestIncrementalCrawl:
+    @pytest.fixture
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def client(self, mock_auth, mock_github):
+        mock_github.return_value.get_user.return_value = MagicMock()
+        client = GitHubClient(token="test-token")
+        client.get_repo_metadata = MagicMock(return_value=make_metadata())
+        return client
+
+    def crawl(self, client, head, contents, failing=()):
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        repo.html_url = "https://github.com/owner/repo"
+        repo.get_branch.return_value.commit.sha = head
+        tree = MagicMock(truncated=False)
+        tree.tree = [make_element(path, text) for path, text in contents.items()]
+        repo.get_git_tree.return_value = tree
+        blobs = {git_blob_sha(t.encode("utf-8")): t for t in contents.values()}
+
+        def get_blob(sha):
+            if sha in failing:
+                raise GithubException(502, {"message": "Bad Gateway"}, None)
+            return make_blob(blobs[sha])
+
+        repo.get_git_blob.side_effect = get_blob
+
+        crawler = RepoCrawler(client=client)
+        crawler._history = MagicMock(batch_size=None)
+        crawler._history.apply.side_effect = lambda repo, stale, ref: [
+            setattr(f, "last_modified", datetime(2024, 1, 1, tzinfo=timezone.utc))
+            for f in stale
+        ]
+        return repo, crawler, crawler.crawl_repo(repo)
+
+    def test_only_changed_blobs_downloaded(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(RepoCache, "DEFAULT_CACHE_DIR", tmp_path)
+
+        self.crawl(client, "c1", {"a.py": "a = 1", "b.py": "b = 1"})
+        repo, crawler, files = self.crawl(client, "c2", {"a.py": "a = 1", "b.py": "b = 2"})
+
+        repo.get_git_blob.assert_called_once_with(git_blob_sha(b"b = 2"))
+        assert {f.path: f.content for f in files} == {"a.py": "a = 1", "b.py": "b = 2"}
+        stale = crawler._history.apply.call_args.args[1]
+        assert [f.path for f in stale] == ["b.py"]
+
+    def test_unchanged_head_skips_listing(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(RepoCache, "DEFAULT_CACHE_DIR", tmp_path)
+
+        self.crawl(client, "c1", {"a.py": "a = 1"})
+        repo, _, files = self.crawl(client, "c1", {"a.py": "a = 1"})
+
+        repo.get_git_tree.assert_not_called()
+        assert [f.content for f in files] == ["a = 1"]
+
+    def test_failed_blob_fetch_keeps_previous_snapshot(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(RepoCache, "DEFAULT_CACHE_DIR", tmp_path)
+        contents = {"a.py": "a = 1", "b.py": "b = 1"}
+        self.crawl(client, "c1", {"a.py": "a = 1"})
+
+        with pytest.raises(GithubException):
+            self.crawl(client, "c2", contents, failing={git_blob_sha(b"b = 1")})
+        _, crawler, files = self.crawl(client, "c2", contents)
+
+        assert sorted(f.path for f in files) == ["a.py", "b.py"]
+        assert crawler.cached_commit("owner/repo") == "c2"
@@ -0,0 +1,118 @@
+import pytest
+from unittest.mock import patch
+
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.chunker import Chunker
+from src.ingestion.models import FileContent
+from tests.test_chunker import SOURCE, fake_parser_factory
+
+
+def make_file(path, content=SOURCE, repo_name="owner/repo"):
+    return FileContent(
+        path=path,
+        content=content,
+        language="Python",
+        repo_name=repo_name,
+        repo_url=f"https://github.com/{repo_name}",
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ChunkCache(cache_dir=tmp_path)
+
+
+@pytest.fixture
+def chunker():
+    return Chunker(max_tokens=64, parser_factory=fake_parser_factory)
+
+
+class TestChunkCache:
+    def test_unchanged_files_not_rechunked(self, cache, chunker):
+        files = [make_file(f"m{i}.py") for i in range(3)]
+        first = list(cache.chunk_files(chunker, files))
+
+        with patch.object(chunker, "chunk_file", side_effect=AssertionError) as mock_chunk:
+            second = list(cache.chunk_files(chunker, files))
+
+        mock_chunk.assert_not_called()
+        assert second == first
+        assert (cache.hits, cache.misses) == (3, 3)
+
+    def test_identical_files_parsed_once(self, cache, chunker):
+        files = [make_file("a.py"), make_file("vendor/a.py", repo_name="other/repo")]
+
+        with patch.object(chunker, "chunk_files", wraps=chunker.chunk_files) as mock_chunk:
+            results = list(cache.chunk_files(chunker, files))
+
+        [parsed] = mock_chunk.call_args.args
+        assert [f.path for f in parsed] == ["a.py"]
+        assert [(c.repo_name, c.path) for c in results[1]] == [("other/repo", "vendor/a.py")] * len(
+            results[1]
+        )
+        assert [c.content for c in results[1]] == [c.content for c in results[0]]
+
+    def test_changed_content_or_config_misses(self, cache, chunker):
+        list(cache.chunk_files(chunker, [make_file("a.py")]))
+
+        list(cache.chunk_files(chunker, [make_file("a.py", SOURCE + "\nx = 1\n")]))
+        other = Chunker(max_tokens=8, parser_factory=fake_parser_factory)
+        list(cache.chunk_files(other, [make_file("a.py")]))
+
+        assert cache.misses == 3
+
+    def test_results_keep_input_order(self, cache, chunker):
+        list(cache.chunk_files(chunker, [make_file("b.py", "y = 2\n")]))
+        files = [make_file("a.py", "x = 1\n"), make_file("b.py", "y = 2\n"), make_file("c.py", "z = 3\n")]
+
+        results = list(cache.chunk_files(chunker, files))
+
+        assert [chunks[0].content for chunks in results] == ["x = 1", "y = 2", "z = 3"]
+
+    def test_evict_removed_files(self, cache, chunker):
+        files = [make_file("keep.py", "a = 1\n"), make_file("gone.py", "b = 2\n")]
+        list(cache.chunk_files(chunker, files))
+
+        assert cache.evict_missing("owner/repo", ["keep.py"]) == 1
+
+        key = ChunkCache.cache_key(files[1], chunker)
+        assert cache.get(files[1], key) is None
+        assert cache.get(files[0], ChunkCache.cache_key(files[0], chunker)) is not None
+
+    def test_shared_content_survives_eviction_elsewhere(self, cache, chunker):
+        list(cache.chunk_files(chunker, [make_file("a.py", repo_name="owner/one")]))
+        list(cache.chunk_files(chunker, [make_file("a.py", repo_name="owner/two")]))
+
+        cache.evict_missing("owner/one", [])
+
+        file = make_file("a.py", repo_name="owner/two")
+        assert cache.get(file, ChunkCache.cache_key(file, chunker)) is not None
+
+    def test_eviction_while_chunking_keeps_new_sets(self, cache, chunker):
+        files = [make_file("a.py"), make_file("copy/a.py")]
+        put = cache.put
+
+        def put_then_evict(*args):
+            put(*args)
+            # Another repo's removed files are evicted meanwhile
+            cache.evict_paths("owner/other", ["gone.py"])
+
+        with patch.object(cache, "put", side_effect=put_then_evict):
+            results = list(cache.chunk_files(chunker, files))
+
+        assert all(results) and len(results[0]) == len(results[1])
+
+    def test_fallback_chunks_not_cached(self, cache):
+        def offline(grammar):
+            raise OSError("Failed to fetch manifest")
+
+        files = [make_file("a.py"), make_file("copy/a.py")]
+        fallback = list(cache.chunk_files(Chunker(max_tokens=64, parser_factory=offline), files))
+        parsed = list(
+            cache.chunk_files(Chunker(max_tokens=64, parser_factory=fake_parser_factory), files)
+        )
+
+        assert {c.node_type for chunks in fallback for c in chunks} == {"text"}
+        assert {c.path for c in fallback[1]} == {"copy/a.py"}
+        assert "function_definition" in {c.node_type for c in parsed[0]}
+        assert cache.misses == 4
@@ -0,0 +1,174 @@
+import ast
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.ingestion.chunker import Chunker
+from src.ingestion.models import FileContent
+
+NODE_TYPES = {
+    ast.FunctionDef: "function_definition",
+    ast.ClassDef: "class_definition",
+    ast.Import: "import_statement",
+    ast.ImportFrom: "import_from_statement",
+}
+
+
+class FakeNode:
+    def __init__(self, type_, start_byte, end_byte, children=()):
+        self.type = type_
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.children = list(children)
+
+
+class FakePythonParser:
+    """Stands in for tree-sitter using the ast module, which needs no download."""
+
+    def parse(self, source: bytes):
+        line_starts = [0]
+        for i, byte in enumerate(source):
+            if byte == ord("\n"):
+                line_starts.append(i + 1)
+
+        def convert(node):
+            start = line_starts[node.lineno - 1] + node.col_offset
+            end = line_starts[node.end_lineno - 1] + node.end_col_offset
+            body = getattr(node, "body", [])
+            children = [convert(child) for child in body] if isinstance(body, list) else []
+            return FakeNode(NODE_TYPES.get(type(node), "expression_statement"), start, end, children)
+
+        tree = ast.parse(source)
+        root = FakeNode("module", 0, len(source), [convert(n) for n in tree.body])
+        return type("Tree", (), {"root_node": root})()
+
+
+def fake_parser_factory(grammar):
+    if grammar != "python":
+        raise LookupError(grammar)
+    return FakePythonParser()
+
+
+def make_file(content, path="src/mod.py", language="Python"):
+    return FileContent(
+        path=path,
+        content=content,
+        language=language,
+        repo_name="owner/repo",
+        repo_url="https://github.com/owner/repo",
+    )
+
+
+SOURCE = '''import os
+import sys
+
+
+def first():
+    return "é"
+
+
+class Second:
+    def method(self):
+        return 2
+'''
+
+
+@pytest.fixture
+def chunker():
+    return Chunker(max_tokens=64, parser_factory=fake_parser_factory)
+
+
+class TestChunkFile:
+    def test_definitions_become_chunks(self, chunker):
+        chunks = chunker.chunk_file(make_file(SOURCE))
+
+        assert [c.node_type for c in chunks] == [
+            "module",
+            "function_definition",
+            "class_definition",
+        ]
+        assert chunks[0].content == "import os\nimport sys"
+        assert chunks[1].content == 'def first():\n    return "é"'
+        assert (chunks[2].start_line, chunks[2].end_line) == (9, 11)
+
+    def test_byte_offsets_index_encoded_source(self, chunker):
+        source = SOURCE.encode("utf-8")
+
+        for chunk in chunker.chunk_file(make_file(SOURCE)):
+            assert source[chunk.start_byte : chunk.end_byte].decode("utf-8") == chunk.content
+
+    def test_oversize_node_split_by_budget(self):
+        methods = "".join(
+            f"    def method_{i}(self):\n        return {i} * {i}\n\n" for i in range(30)
+        )
+        chunker = Chunker(max_tokens=32, parser_factory=fake_parser_factory)
+
+        chunks = chunker.chunk_file(make_file(f"class Big:\n{methods}"))
+
+        assert len(chunks) > 1
+        assert all(c.node_type == "class_definition" for c in chunks)
+        assert all(c.end_byte - c.start_byte <= chunker.max_bytes for c in chunks)
+        assert "method_29" in chunks[-1].content
+
+    def test_unknown_language_uses_line_windows(self, chunker):
+        text = "".join(f"line {i} of the readme\n" for i in range(100))
+
+        chunks = chunker.chunk_file(make_file(text, path="README.md", language=None))
+
+        assert {c.node_type for c in chunks} == {"text"}
+        assert "".join(c.content for c in chunks) == text
+        assert chunks[1].start_line == chunks[0].end_line + 1
+
+    def test_missing_grammar_falls_back_to_lines(self, chunker):
+        chunks = chunker.chunk_file(make_file("fn main() {}\n", path="main.rs", language="Rust"))
+
+        assert [c.node_type for c in chunks] == ["text"]
+
+    def test_failed_grammar_load_retried(self, monkeypatch):
+        attempts = []
+
+        def flaky(grammar):
+            attempts.append(grammar)
+            if len(attempts) == 1:
+                raise OSError("Failed to fetch manifest")
+            return FakePythonParser()
+
+        chunker = Chunker(max_tokens=64, parser_factory=flaky)
+        file = make_file(SOURCE)
+
+        assert {c.node_type for c in chunker.chunk_file(file)} == {"text"}
+        assert {c.node_type for c in chunker.chunk_file(file)} == {"text"}
+        monkeypatch.setattr("src.ingestion.chunker.PARSER_RETRY_SECONDS", 0)
+        assert "function_definition" in {c.node_type for c in chunker.chunk_file(file)}
+        assert len(attempts) == 2
+
+    def test_long_line_cut_on_character_boundary(self):
+        chunker = Chunker(max_tokens=4, parser_factory=fake_parser_factory)
+
+        chunks = chunker.chunk_file(make_file("é" * 40, path="a.txt", language=None))
+
+        assert "".join(c.content for c in chunks) == "é" * 40
+
+    def test_invalid_budget_raises(self):
+        with pytest.raises(ValueError, match="max_tokens"):
+            Chunker(max_tokens=0)
+
+
+class TestChunkFiles:
+    def test_process_pool_matches_serial(self, chunker):
+        files = [make_file(SOURCE, path=f"src/mod_{i}.py") for i in range(10)]
+
+        serial = list(chunker.chunk_files(files))
+        parallel = list(chunker.chunk_files(files, max_workers=2, batch_size=3))
+
+        assert parallel == serial
+        assert [chunks[0].path for chunks in parallel] == [f.path for f in files]
+
+    def test_shared_executor_is_left_running(self, chunker):
+        files = [make_file(SOURCE, path=f"src/mod_{i}.py") for i in range(5)]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = list(chunker.chunk_files(files, batch_size=2, executor=executor))
+            second = list(chunker.chunk_files(files, batch_size=2, executor=executor))
+
+        assert first == second == list(chunker.chunk_files(files))
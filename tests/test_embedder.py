@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from src.indexing.embedder import EmbeddingStage, HashingEmbedder
+from src.indexing.embedding_cache import EmbeddingCache
+from src.indexing.tokenizer import tokenize_code
+from src.ingestion.models import Chunk
+
+
+def make_chunk(content, path="a.py"):
+    return Chunk(
+        repo_name="owner/repo",
+        path=path,
+        language="Python",
+        node_type="function_definition",
+        start_byte=0,
+        end_byte=len(content),
+        start_line=1,
+        end_line=1,
+        content=content,
+    )
+
+
+class TestTokenizer:
+    def test_splits_camel_and_snake_case(self):
+        assert tokenize_code("parseHTTPResponse(max_retry_count)") == [
+            "parsehttpresponse",
+            "parse",
+            "http",
+            "response",
+            "max_retry_count",
+            "max",
+            "retry",
+            "count",
+        ]
+
+    def test_plain_words_not_duplicated(self):
+        assert tokenize_code("return value") == ["return", "value"]
+
+
+class TestHashingEmbedder:
+    def test_vectors_normalized_float32(self):
+        vectors = HashingEmbedder(dim=64).embed(["def foo(): pass", "", "x"])
+
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (3, 64)
+        assert np.linalg.norm(vectors[0]) == pytest.approx(1.0)
+        assert not vectors[1].any()
+
+    def test_similar_code_scores_higher(self):
+        embedder = HashingEmbedder(dim=256)
+        query, near, far = embedder.embed(
+            ["load user profile", "def load_user_profile(user_id):", "class HttpServer:"]
+        )
+
+        assert query @ near > query @ far
+
+    def test_deterministic(self):
+        a = HashingEmbedder().embed(["same text"])
+        b = HashingEmbedder().embed(["same text"])
+
+        np.testing.assert_array_equal(a, b)
+
+
+class TestEmbeddingStage:
+    def test_batches_bounded_by_count_and_tokens(self):
+        stage = EmbeddingStage(HashingEmbedder(dim=16), batch_size=3, max_batch_tokens=20)
+        chunks = [make_chunk("x" * 8) for _ in range(5)] + [make_chunk("y" * 60)]
+
+        sizes = [len(batch) for batch, _ in stage.embed_chunks(chunks)]
+
+        assert sizes == [3, 2, 1]
+
+    def test_cache_avoids_reembedding(self, tmp_path):
+        cache = EmbeddingCache(cache_dir=tmp_path)
+        chunks = [make_chunk(f"def f{i}(): return {i}") for i in range(4)]
+
+        first = EmbeddingStage(HashingEmbedder(dim=32), cache=cache)
+        _, expected = first.embed_all(chunks)
+        second = EmbeddingStage(HashingEmbedder(dim=32), cache=cache)
+        _, vectors = second.embed_all(chunks + [make_chunk("new chunk")])
+
+        np.testing.assert_array_equal(vectors[:4], expected)
+        assert second.stats.cache_hits == 4
+        assert second.stats.embedded == 1
+        assert second.stats.hit_rate == pytest.approx(0.8)
+
+    def test_duplicates_in_batch_embedded_once(self):
+        stage = EmbeddingStage(HashingEmbedder(dim=16))
+
+        _, vectors = stage.embed_all([make_chunk("same"), make_chunk("same", path="b.py")])
+
+        assert stage.stats.embedded == 1
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+
+    def test_empty_input(self):
+        chunks, vectors = EmbeddingStage(HashingEmbedder(dim=8)).embed_all([])
+
+        assert chunks == []
+        assert vectors.shape == (0, 8)
@@ -0,0 +1,198 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.ingestion.file_rules import FileRules, Rule, parse_attributes
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.repo_crawler import RepoCrawler
+from tests.test_repo_crawler import make_blob, make_element, make_tree
+
+
+@pytest.fixture
+@patch("src.ingestion.github_client.Github")
+@patch("src.ingestion.github_client.Auth")
+def client(mock_auth, mock_github):
+    mock_github.return_value.get_user.return_value = MagicMock()
+    return GitHubClient(token="test-token")
+
+
+class TestPatterns:
+    @pytest.mark.parametrize(
+        "pattern, path, matches",
+        [
+            ("node_modules/", "node_modules/react/index.js", True),
+            ("node_modules/", "web/node_modules/react/index.js", True),
+            ("node_modules/", "src/node_modules.py", False),
+            ("/build/", "build/out.py", True),
+            ("/build/", "src/build/out.py", False),
+            ("docs/*.md", "docs/readme.md", True),
+            ("docs/*.md", "docs/api/readme.md", False),
+            ("docs/**/*.md", "docs/api/v1/readme.md", True),
+            ("**/fixtures", "tests/unit/fixtures/data.json", True),
+            ("*.lock", "sub/Cargo.lock", True),
+            ("test_?.py", "test_a.py", True),
+            ("[!a]*.py", "abc.py", False),
+        ],
+    )
+    def test_gitignore_semantics(self, pattern, path, matches):
+        assert (FileRules([pattern]).match(path) is not None) is matches
+
+    def test_last_matching_rule_wins(self):
+        rules = FileRules(["vendor/", "!vendor/ours/", "vendor/ours/legacy/"])
+
+        assert rules.skip_reason("vendor/lib/a.py") == "ignored"
+        assert rules.skip_reason("vendor/ours/a.py") is None
+        assert rules.skip_reason("vendor/ours/legacy/a.py") == "ignored"
+
+    def test_extensions_still_apply_to_included_paths(self):
+        rules = FileRules(["vendor/", "!vendor/ours/"], extensions={"py"})
+
+        assert rules.skip_reason("vendor/ours/logo.png") == "extension"
+        assert rules.skip_reason(".bashrc") == "extension"
+
+    def test_prunes_unless_something_below_is_included(self):
+        rules = FileRules(["vendor/", "!vendor/ours/", "node_modules/"])
+
+        assert rules.prunes("web/node_modules")
+        assert rules.prunes("vendor/other")
+        assert not rules.prunes("vendor")
+        assert not rules.prunes("vendor/ours")
+        assert not rules.prunes("src")
+
+    def test_unanchored_include_disables_pruning(self):
+        assert not FileRules(["dist/", "!*.keep.py"]).prunes("dist")
+
+    def test_per_repo_overrides(self):
+        rules = FileRules(["vendor/"], repo_rules={"owner/app": ["!vendor/"]})
+
+        assert rules.for_repo("owner/app").skip_reason("vendor/a.py") is None
+        assert rules.for_repo("owner/other").skip_reason("vendor/a.py") == "ignored"
+        assert rules.for_repo("owner/app") is rules.for_repo("owner/app")
+
+
+class TestAttributes:
+    ATTRIBUTES = """
+    # linguist overrides
+    third_party/** linguist-vendored
+    *.pb.py linguist-generated=true
+    vendor/ours/** -linguist-vendored
+    *.py text eol=lf
+    """
+
+    def test_parse(self):
+        assert parse_attributes(self.ATTRIBUTES) == [
+            Rule("third_party/**", reason="vendored", recursive=False),
+            Rule("*.pb.py", reason="generated", recursive=False),
+            Rule("vendor/ours/**", negate=True, reason="vendored", recursive=False),
+        ]
+
+    def test_applied_on_top_of_defaults(self, client):
+        rules = client.rules.for_repo("owner/repo", self.ATTRIBUTES)
+
+        assert rules.skip_reason("third_party/lib/a.py") == "vendored"
+        assert rules.skip_reason("api/user.pb.py") == "generated"
+        assert rules.skip_reason("vendor/ours/a.py") is None
+        assert rules.skip_reason("vendor/theirs/a.py") == "ignored"
+
+    def test_directory_patterns_do_not_cover_contents(self, client):
+        rules = client.rules.for_repo(
+            "owner/repo", "third_party linguist-vendored\ndocs/* linguist-generated\n"
+        )
+
+        assert rules.skip_reason("src/third_party/y.py") is None
+        assert rules.skip_reason("docs/a.md") == "generated"
+        assert rules.skip_reason("docs/api/b.md") is None
+        assert not rules.prunes("third_party")
+        assert not rules.prunes("docs")
+        assert not rules.prunes("docs/api")
+
+    def test_only_double_star_prunes(self, client):
+        rules = client.rules.for_repo(
+            "owner/repo", "lib/** linguist-vendored\nout/ linguist-generated\n"
+        )
+
+        assert rules.skip_reason("lib/x/y.py") == "vendored"
+        assert rules.prunes("lib") and rules.prunes("lib/x")
+        # A trailing slash matches nothing in .gitattributes
+        assert rules.skip_reason("out/a.py") is None
+        assert not rules.prunes("out")
+
+
+class TestContentDetection:
+    def test_generated_marker(self):
+        rules = FileRules()
+        assert rules.content_reason("a.py", b"# Code generated by protoc. DO NOT EDIT.\nx = 1\n") == "generated"
+        assert rules.content_reason("a.py", b"x = 1\n") is None
+        assert rules.content_reason("a.cs", b"// <auto-generated>\nclass A {}\n") == "generated"
+        assert rules.content_reason("A.java", b"/**\n * @generated\n */\nclass A {}\n") == "generated"
+
+    def test_marker_mentioned_in_prose(self):
+        rules = FileRules()
+        doc = b"# Contributing\n\nFiles under gen/ say DO NOT EDIT at the top; regenerate them.\n"
+        assert rules.content_reason("docs/contributing.md", doc) is None
+        code = b'MARKER = "Code generated by tool. DO NOT EDIT."\n'
+        assert rules.content_reason("gen/tool.py", code) is None
+
+    def test_minified(self):
+        rules = FileRules()
+        assert rules.content_reason("app.js", b"var a=1;" * 200) == "minified"
+        assert rules.content_reason("app.js", b"var a = 1;\n" * 200) is None
+        assert rules.skip_reason("dist.min.js") == "minified"
+
+    def test_attribute_marks_hand_written(self):
+        rules = FileRules().for_repo("owner/repo", "schema.py -linguist-generated")
+        assert rules.content_reason("schema.py", b"# @generated once, edited since\n") is None
+
+    def test_disabled(self):
+        rules = FileRules(detect_generated=False)
+        assert rules.content_reason("app.js", b"var a=1;" * 200) is None
+        assert rules.skip_reason("dist.min.js") is None
+
+
+class TestCrawlerRules:
+    def test_excluded_subtrees_never_listed(self, client):
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        trees = {
+            ("main", True): make_tree([], truncated=True),
+            ("main", False): make_tree(
+                [
+                    make_element("node_modules", type_="tree", sha="nm-sha"),
+                    make_element("dist", type_="tree", sha="dist-sha"),
+                    make_element("src", type_="tree", sha="src-sha"),
+                ]
+            ),
+            ("src-sha", True): make_tree([make_element("main.py")]),
+        }
+        repo.get_git_tree.side_effect = lambda sha, recursive=False: trees[(sha, recursive)]
+        repo.get_git_blob.side_effect = lambda sha: make_blob("x = 1")
+        crawler = RepoCrawler(client=client, use_cache=False, resolve_last_modified=False)
+
+        files = crawler.crawl_repo(repo)
+
+        assert [f.path for f in files] == ["src/main.py"]
+        requested = {c.args[0] for c in repo.get_git_tree.call_args_list}
+        assert requested == {"main", "src-sha"}
+
+    def test_gitattributes_read_before_fetching(self, client):
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        repo.get_git_tree.return_value = make_tree(
+            [
+                make_element(".gitattributes"),
+                make_element("third_party/lib.py"),
+                make_element("gen/api.js"),
+                make_element("main.py"),
+            ]
+        )
+        blobs = {
+            "sha-.gitattributes": "third_party/** linguist-vendored\n",
+            "sha-gen/api.js": "// @generated\nexport const a = 1;\n",
+            "sha-main.py": "x = 1\n",
+        }
+        repo.get_git_blob.side_effect = lambda sha: make_blob(blobs[sha])
+        crawler = RepoCrawler(client=client, use_cache=False, resolve_last_modified=False)
+
+        files = crawler.crawl_repo(repo)
+
+        assert [f.path for f in files] == ["main.py"]
+        fetched = [c.args[0] for c in repo.get_git_blob.call_args_list]
+        assert "sha-third_party/lib.py" not in fetched
+        assert fetched[0] == "sha-.gitattributes"
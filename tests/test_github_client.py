@@ -2,6 +2,8 @@ import pytest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+from github import GithubException, UnknownObjectException
+
 from src.ingestion.github_client import GitHubClient
 
 
@@ -142,3 +144,84 @@ class TestContextManager:
         client.close()
 
         mock_client.close.assert_called_once()
+
+
+class TestRepoMetadata:
+    @staticmethod
+    def make_repo(full_name):
+        repo = MagicMock(full_name=full_name, private=False, topics=["cli"])
+        repo.name = full_name.split("/")[1]
+        return repo
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_default_uses_listing_payload_only(self, mock_auth, mock_github):
+        client = GitHubClient(token="test-token")
+        repo = self.make_repo("owner/a")
+
+        metadata = client.get_repo_metadata(repo)
+
+        assert metadata.topics == ["cli"]
+        assert metadata.languages == {}
+        repo.get_languages.assert_not_called()
+        repo.get_topics.assert_not_called()
+        repo.get_commits.assert_not_called()
+        mock_github.return_value.requester.graphql_query.assert_not_called()
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_selected_fields_are_batched(self, mock_auth, mock_github, monkeypatch):
+        monkeypatch.setattr(GitHubClient, "METADATA_BATCH_SIZE", 2)
+        client = GitHubClient(token="test-token")
+        repos = [self.make_repo(f"owner/r{i}") for i in range(3)]
+        node = {
+            "languages": {"edges": [{"size": 100, "node": {"name": "Python"}}]},
+            "defaultBranchRef": {"target": {"history": {"totalCount": 42}}},
+        }
+        graphql = mock_github.return_value.requester.graphql_query
+        graphql.side_effect = [
+            ({}, {"data": {"r0": node, "r1": None}}),
+            ({}, {"data": {"r0": node}}),
+        ]
+
+        metadata = client.get_repos_metadata(repos, fields=("languages", "total_commits"))
+
+        assert graphql.call_count == 2
+        assert graphql.call_args_list[0].args[1] == {
+            "o0": "owner", "n0": "r0", "o1": "owner", "n1": "r1"
+        }
+        assert [m.total_commits for m in metadata] == [42, 0, 42]
+        assert metadata[0].languages == {"Python": 100}
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_falls_back_to_rest(self, mock_auth, mock_github):
+        client = GitHubClient(token="test-token")
+        repo = self.make_repo("owner/a")
+        repo.get_languages.return_value = {"Rust": 10}
+        repo.get_commits.return_value.totalCount = 7
+        mock_github.return_value.requester.graphql_query.side_effect = GithubException(502)
+
+        metadata = client.get_repo_metadata(repo, fields=("languages", "total_commits"))
+
+        assert (metadata.languages, metadata.total_commits) == ({"Rust": 10}, 7)
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_unknown_field_raises(self, mock_auth, mock_github):
+        client = GitHubClient(token="test-token")
+
+        with pytest.raises(ValueError):
+            client.get_repo_metadata(self.make_repo("owner/a"), fields=("stars",))
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_get_repos_by_name_skips_missing(self, mock_auth, mock_github):
+        found = self.make_repo("owner/a")
+        mock_github.return_value.get_repo.side_effect = [found, UnknownObjectException(404)]
+        client = GitHubClient(token="test-token")
+
+        repos = client.get_repos_by_name(["owner/a", "owner/missing"])
+
+        assert repos == [found]
+        mock_github.return_value.get_user.return_value.get_repos.assert_not_called()
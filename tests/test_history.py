@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from github import GithubException
+
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.history import LastModifiedResolver
+from src.ingestion.models import FileContent
+
+
+@pytest.fixture
+@patch("src.ingestion.github_client.Github")
+@patch("src.ingestion.github_client.Auth")
+def client(mock_auth, mock_github):
+    mock_github.return_value.get_user.return_value = MagicMock()
+    return GitHubClient(token="test-token")
+
+
+@pytest.fixture
+def repo():
+    return MagicMock(full_name="owner/repo", default_branch="main")
+
+
+def make_commit(date, *paths):
+    commit = MagicMock()
+    commit.files = [MagicMock(filename=path) for path in paths]
+    commit.commit.author.date = date
+    return commit
+
+
+class TestResolverInit:
+    def test_unknown_strategy_raises(self, client):
+        with pytest.raises(ValueError, match="Unknown last-modified strategy"):
+            LastModifiedResolver(client, strategy="bogus")
+
+
+class TestCommitsStrategy:
+    def test_newest_commit_wins_and_walk_stops_early(self, client, repo):
+        new = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        old = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        oldest = MagicMock()
+        type(oldest).files = property(lambda self: pytest.fail("walked too far"))
+        repo.get_commits.return_value = [
+            make_commit(new, "a.py"),
+            make_commit(old, "a.py", "b.py", "unrelated.md"),
+            oldest,
+        ]
+
+        resolver = LastModifiedResolver(client, strategy="commits")
+        dates = resolver.resolve(repo, ["a.py", "b.py"])
+
+        repo.get_commits.assert_called_once_with(sha="main")
+        assert dates == {"a.py": new, "b.py": old}
+
+    def test_history_error_returns_partial(self, client, repo):
+        repo.get_commits.side_effect = GithubException(500, "boom", None)
+
+        resolver = LastModifiedResolver(client, strategy="commits")
+
+        assert resolver.resolve(repo, ["a.py"]) == {}
+
+
+class TestGraphQLStrategy:
+    def test_batches_paths_per_request(self, client, repo):
+        requester = client.client.requester
+
+        def graphql_query(query, variables):
+            paths = [v for k, v in variables.items() if k.startswith("p")]
+            obj = {
+                f"f{i}": {"nodes": [{"author": {"date": "2024-05-01T10:00:00Z"}}]}
+                for i in range(len(paths))
+            }
+            return {}, {"data": {"repository": {"object": obj}}}
+
+        requester.graphql_query.side_effect = graphql_query
+        paths = [f"src/file_{i}.py" for i in range(120)]
+
+        resolver = LastModifiedResolver(client)
+        resolver.GRAPHQL_BATCH_SIZE = 50
+        dates = resolver.resolve(repo, paths)
+
+        assert requester.graphql_query.call_count == 3
+        assert len(dates) == 120
+        assert dates["src/file_0.py"] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+        repo.get_commits.assert_not_called()
+
+    def test_apply_fills_files_in_place(self, client, repo):
+        client.client.requester.graphql_query.return_value = (
+            {},
+            {
+                "data": {
+                    "repository": {
+                        "object": {
+                            "f0": {"nodes": [{"author": {"date": "2024-05-01T00:00:00Z"}}]},
+                            "f1": {"nodes": []},
+                        }
+                    }
+                }
+            },
+        )
+        files = [
+            FileContent(path="a.py", content="x", language="Python", repo_name="o/r", repo_url="u"),
+            FileContent(path="b.py", content="y", language="Python", repo_name="o/r", repo_url="u"),
+        ]
+
+        LastModifiedResolver(client).apply(repo, files)
+
+        assert files[0].last_modified == datetime(2024, 5, 1, tzinfo=timezone.utc)
+        assert files[1].last_modified is None
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.http_cache import HttpCache
+from src.ingestion.rate_limit import RateLimitScheduler
+from tests.fake_server import FakeServer
+
+REPO_PATH = "/repos/owner/repo"
+REPO_BODY = {"name": "repo", "full_name": "owner/repo", "description": "first"}
+
+
+@pytest.fixture
+def server():
+    server = FakeServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def http_cache(tmp_path):
+    return HttpCache(cache_dir=tmp_path / "http")
+
+
+def make_client(server, http_cache):
+    return GitHubClient(
+        token="test-token",
+        base_url=server.url,
+        scheduler=RateLimitScheduler(sleep=lambda _: None),
+        http_cache=http_cache,
+    )
+
+
+class TestConditionalRequests:
+    def test_not_modified_served_from_cache(self, server, http_cache):
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+        server.enqueue(REPO_PATH, status=304, headers={"ETag": '"v1"', "x-ratelimit-remaining": "4999"})
+
+        with make_client(server, http_cache) as client:
+            first = client.client.get_repo("owner/repo")
+        # A fresh client, as on the next run of main.py
+        with make_client(server, http_cache) as client:
+            second = client.client.get_repo("owner/repo")
+            remaining = client.rate_limit_budget.remaining
+
+        assert second.description == first.description == "first"
+        assert server.requests[1][2]["If-None-Match"] == '"v1"'
+        assert http_cache.hits == 1
+        assert remaining == 4999
+
+    def test_changed_resource_replaces_entry(self, server, http_cache):
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+        server.enqueue(REPO_PATH, body={**REPO_BODY, "description": "second"}, headers={"ETag": '"v2"'})
+        server.enqueue(REPO_PATH, status=304)
+
+        with make_client(server, http_cache) as client:
+            client.client.get_repo("owner/repo")
+            client.client.get_repo("owner/repo")
+            third = client.client.get_repo("owner/repo")
+
+        assert server.requests[2][2]["If-None-Match"] == '"v2"'
+        assert third.description == "second"
+
+    def test_response_without_validators_not_stored(self, server, http_cache):
+        server.set_default(REPO_PATH, body=REPO_BODY)
+
+        with make_client(server, http_cache) as client:
+            client.client.get_repo("owner/repo")
+            client.client.get_repo("owner/repo")
+
+        assert "If-None-Match" not in server.requests[1][2]
+        assert http_cache.hits == 0
+
+    def test_tokens_do_not_share_entries(self, server, http_cache):
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+
+        with make_client(server, http_cache) as client:
+            client.client.get_repo("owner/repo")
+        with GitHubClient(token="other-token", base_url=server.url, http_cache=http_cache) as client:
+            client.client.get_repo("owner/repo")
+
+        assert "If-None-Match" not in server.requests[1][2]
+
+
+class TestConcurrentWrites:
+    def test_concurrent_saves_of_one_entry(self, server, http_cache):
+        server.set_default(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+
+        with make_client(server, http_cache) as client:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                repos = list(pool.map(lambda _: client.client.get_repo("owner/repo"), range(32)))
+
+        assert all(repo.full_name == "owner/repo" for repo in repos)
+        assert len(list(http_cache.cache_dir.glob("*/*.json"))) == 1
+        assert not list(http_cache.cache_dir.glob("*/*.tmp"))
+
+    def test_failed_write_does_not_fail_request(self, server, http_cache, monkeypatch):
+        server.set_default(REPO_PATH, body=REPO_BODY, headers={"ETag": '"v1"'})
+
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr("src.ingestion.http_cache.os.replace", fail)
+        with make_client(server, http_cache) as client:
+            repo = client.client.get_repo("owner/repo")
+
+        assert repo.description == "first"
+        assert not list(http_cache.cache_dir.glob("*/*"))
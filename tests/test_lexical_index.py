@@ -0,0 +1,210 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.indexing.doc_table import DocFilter
+from src.indexing.embedder import HashingEmbedder
+from src.indexing.hybrid import HybridRetriever, reciprocal_rank_fusion
+from src.indexing.lexical_index import LexicalIndex, Postings
+from src.indexing.tokenizer import tokenize_code
+from src.indexing.vector_index import VectorIndex
+from src.ingestion.models import Chunk
+
+
+def make_chunk(content, path="a.py", repo_name="owner/repo", start=0):
+    return Chunk(
+        repo_name=repo_name,
+        path=path,
+        language="Python",
+        node_type="function_definition",
+        start_byte=start,
+        end_byte=start + len(content),
+        start_line=1,
+        end_line=1,
+        content=content,
+    )
+
+
+CORPUS = [
+    make_chunk("def parse_http_response(response): return response.body", "http.py"),
+    make_chunk("def load_user_profile(user_id): return db.get(user_id)", "users.py"),
+    make_chunk("class HttpServer: def serve(self): pass", "server.py"),
+    make_chunk("def parseConfig(path): return toml.load(path)", "config.py"),
+    make_chunk("user = load_user_profile(42)", "main.py"),
+]
+
+
+def brute_force_bm25(chunks, query, k1=1.2, b=0.75):
+    docs = [tokenize_code(c.content) for c in chunks]
+    avg = sum(map(len, docs)) / len(docs)
+    scores = []
+    for tokens in docs:
+        score = 0.0
+        for term in dict.fromkeys(tokenize_code(query)):
+            df = sum(term in d for d in docs)
+            tf = tokens.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avg))
+        scores.append(score)
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(tmp_path)
+    index.add(CORPUS)
+    return index
+
+
+class TestPostings:
+    def test_round_trip_with_narrow_gaps(self):
+        docs = np.array([3, 4, 10, 300, 100_000])
+        postings = Postings.encode(docs, np.array([1, 2, 1, 1, 70_000]))
+
+        assert postings.gaps.dtype == np.uint32
+        assert postings.docs().tolist() == docs.tolist()
+        assert postings.tfs[-1] == 65535
+
+    def test_append_keeps_order(self):
+        postings = Postings.encode(np.array([1, 2]), np.array([1, 1]))
+        postings = postings.append(np.array([5, 9]), np.array([2, 3]))
+
+        assert postings.gaps.dtype == np.uint8
+        assert postings.docs().tolist() == [1, 2, 5, 9]
+        assert postings.tfs.tolist() == [1, 1, 2, 3]
+
+
+class TestBm25Search:
+    def test_identifier_query_finds_exact_match(self, index):
+        hits = index.search("parseHttpResponse")
+
+        assert hits[0].path == "http.py"
+
+    def test_scores_match_reference(self, index):
+        expected = brute_force_bm25(CORPUS, "load user profile")
+
+        hits = index.search("load user profile", k=5)
+
+        for hit in hits:
+            assert hit.score == pytest.approx(expected[hit.row])
+        assert [h.path for h in hits[:2]] == ["main.py", "users.py"]
+
+    def test_early_termination_keeps_top_k(self, tmp_path):
+        rng = np.random.default_rng(0)
+        words = [f"w{i}" for i in range(40)]
+        chunks = [
+            make_chunk(" ".join(rng.choice(words, size=12)), f"f{i}.py")
+            for i in range(300)
+        ]
+        index = LexicalIndex(tmp_path)
+        index.add(chunks)
+        query = "w1 w2 w3 w30"
+        expected = np.asarray(brute_force_bm25(chunks, query))
+
+        hits = index.search(query, k=5)
+
+        assert [h.score for h in hits] == pytest.approx(sorted(expected, reverse=True)[:5])
+
+    def test_lists_outside_the_candidates_are_not_decoded(self, tmp_path, monkeypatch):
+        chunks = [
+            make_chunk("alpha " * (i % 5 + 8) + "filler", f"a{i}.py") for i in range(10)
+        ] + [make_chunk(f"zeta filler word{i}", f"z{i}.py") for i in range(990)]
+        index = LexicalIndex(tmp_path)
+        index.add(chunks)
+        decoded = []
+        docs = Postings.docs
+        monkeypatch.setattr(Postings, "docs", lambda p: decoded.append(p.first) or docs(p))
+
+        hits = index.search("alpha zeta", k=3)
+
+        expected = brute_force_bm25(chunks, "alpha zeta")
+        assert [h.score for h in hits] == pytest.approx(sorted(expected, reverse=True)[:3])
+        # Only alpha's list, which starts at doc 0, is decoded
+        assert decoded == [0]
+
+    def test_unknown_terms(self, index):
+        assert index.search("nonexistent") == []
+
+    def test_mask_filters_docs(self, index):
+        mask = np.zeros(len(CORPUS), dtype=bool)
+        mask[1] = True
+
+        assert [h.path for h in index.search("user profile", mask=mask)] == ["users.py"]
+
+
+class TestIncrementalUpdates:
+    def test_replace_file(self, index):
+        replacement = [make_chunk("def fetch_account(): pass", "users.py")]
+
+        index.replace_file("owner/repo", "users.py", replacement)
+
+        assert "users.py" not in {h.path for h in index.search("load_user_profile")}
+        assert [h.path for h in index.search("fetch account")] == ["users.py"]
+        assert len(index) == len(CORPUS)
+
+    def test_compact_and_reopen(self, tmp_path, index):
+        index.delete_file("owner/repo", "http.py")
+        index.compact()
+        index.close()
+
+        reopened = LexicalIndex(tmp_path)
+
+        assert reopened.count == len(CORPUS) - 1
+        assert "http.py" not in {h.path for h in reopened.search("parse_http_response")}
+        assert reopened.search("parseConfig")[0].path == "config.py"
+
+    def test_streams_in_batches(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(LexicalIndex, "FLUSH_DOCS", 2)
+        index = LexicalIndex(tmp_path)
+
+        assert index.add(iter(CORPUS)) == len(CORPUS)
+        assert index.search("HttpServer")[0].path == "server.py"
+
+
+class TestHybridRetrieval:
+    def test_rrf_rewards_agreement(self, index):
+        a = index.search("load user profile", k=3)
+        b = list(reversed(a))
+
+        fused = reciprocal_rank_fusion([a, b, a[1:2]], k=3)
+
+        assert fused[0].key == a[1].key
+        assert len(fused) == 3
+
+    def test_retriever_fuses_both_indexes(self, tmp_path, index):
+        embedder = HashingEmbedder(dim=64)
+        vector_index = VectorIndex(tmp_path / "vectors", dim=64)
+        vector_index.add(CORPUS, embedder.embed([c.content for c in CORPUS]))
+        retriever = HybridRetriever(embedder, vector_index, index, candidates=3)
+
+        hits = retriever.search("parseConfig", k=2)
+
+        assert hits[0].path == "config.py"
+        assert hits[0].score > hits[1].score
+
+    def test_retriever_reports_filtered_copy(self, tmp_path):
+        shared = [
+            make_chunk("def vendored_helper(): pass", "lib/helper.py", "owner/app"),
+            make_chunk("def vendored_helper(): pass", "third_party/helper.py", "owner/tool"),
+        ]
+        for chunk in shared:
+            chunk.blob_sha = "same"
+        embedder = HashingEmbedder(dim=64)
+        lexical_index = LexicalIndex(tmp_path / "lexical")
+        lexical_index.add(shared)
+        vector_index = VectorIndex(tmp_path / "vectors", dim=64)
+        vector_index.add(shared, embedder.embed([c.content for c in shared]))
+        retriever = HybridRetriever(embedder, vector_index, lexical_index)
+
+        [hit] = retriever.search("vendored_helper")
+        [filtered] = retriever.search("vendored_helper", doc_filter=DocFilter(repo_name="owner/tool"))
+
+        assert len(lexical_index) == 1
+        assert hit.locations == [
+            ("owner/app", "lib/helper.py"),
+            ("owner/tool", "third_party/helper.py"),
+        ]
+        assert (filtered.repo_name, filtered.path) == ("owner/tool", "third_party/helper.py")
+        assert filtered.locations[0] == ("owner/tool", "third_party/helper.py")
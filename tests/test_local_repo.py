@@ -0,0 +1,173 @@
+import os
+import shutil
+import subprocess
+from datetime import datetime, timezone
+
+import pytest
+
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.local_repo import LocalRepoCrawler
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+
+def git(path, *args, date=None):
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "test",
+        "GIT_AUTHOR_EMAIL": "test@example.com",
+        "GIT_COMMITTER_NAME": "test",
+        "GIT_COMMITTER_EMAIL": "test@example.com",
+    }
+    if date:
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = f"@{date} +0000"
+    subprocess.run(["git", "-C", str(path), *args], check=True, capture_output=True, env=env)
+
+
+def commit(path, files: dict[str, bytes], date: int):
+    for name, data in files.items():
+        target = path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", f"commit at {date}", date=date)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    path = tmp_path / "work"
+    path.mkdir()
+    git(path, "init", "-q")
+    commit(
+        path,
+        {
+            "src/main.py": b"print('hello')\n",
+            "src/util.py": b"def util():\n    return 1\n",
+            "README.md": b"# Title\n",
+            "logo.png": b"\x89PNG",
+        },
+        date=1_700_000_000,
+    )
+    commit(
+        path,
+        {
+            "src/main.py": b"print('hello again')\n",
+            "empty.py": b"  \n",
+            "binary.json": b"\xff\xfe\x00",
+        },
+        date=1_700_100_000,
+    )
+    return path
+
+
+def at(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class TestLocalRepoCrawler:
+    def test_worktree_filters_and_dates_from_history(self, repo):
+        crawler = LocalRepoCrawler(repo)
+        files = {f.path: f for f in crawler.crawl_repo()}
+
+        assert crawler.source == "worktree"
+        assert sorted(files) == ["README.md", "src/main.py", "src/util.py"]
+        assert files["src/main.py"].content == "print('hello again')\n"
+        assert files["src/main.py"].last_modified == at(1_700_100_000)
+        assert files["src/util.py"].last_modified == at(1_700_000_000)
+        assert files["src/util.py"].language == "Python"
+        assert files["src/util.py"].sha == git_blob_sha(b"def util():\n    return 1\n")
+
+    def test_untracked_and_ignored_files(self, repo):
+        (repo / ".gitignore").write_text("build/\n")
+        (repo / "build").mkdir()
+        (repo / "build" / "out.py").write_text("generated = True\n")
+        (repo / "new.py").write_text("x = 1\n")
+
+        files = {f.path: f for f in LocalRepoCrawler(repo).crawl_repo()}
+
+        assert "build/out.py" not in files
+        # Untracked, so the date falls back to the file's mtime
+        assert files["new.py"].last_modified == datetime.fromtimestamp(
+            (repo / "new.py").stat().st_mtime, tz=timezone.utc
+        )
+
+    def test_bare_clone_reads_object_database(self, repo, tmp_path):
+        bare = tmp_path / "mirror.git"
+        subprocess.run(["git", "clone", "-q", "--bare", str(repo), str(bare)], check=True)
+
+        crawler = LocalRepoCrawler(bare, full_name="owner/repo")
+        files = {f.path: f for f in crawler.crawl_repo()}
+
+        assert crawler.source == "git"
+        assert sorted(files) == ["README.md", "src/main.py", "src/util.py"]
+        assert files["src/main.py"].last_modified == at(1_700_100_000)
+        assert files["src/main.py"].repo_name == "owner/repo"
+
+    def test_ref_reads_older_revision(self, repo):
+        files = {f.path: f for f in LocalRepoCrawler(repo, ref="HEAD~1").crawl_repo()}
+
+        assert files["src/main.py"].content == "print('hello')\n"
+        assert files["src/main.py"].last_modified == at(1_700_000_000)
+
+    def test_symlinks_not_followed(self, repo, tmp_path):
+        secret = tmp_path / "secret.py"
+        secret.write_text("token = 'outside the repository'\n")
+        (repo / "leak.py").symlink_to(secret)
+        (repo / "linked").symlink_to(tmp_path, target_is_directory=True)
+        git(repo, "add", "leak.py", "linked")
+        git(repo, "commit", "-q", "-m", "links", date=1_700_200_000)
+        (repo / "untracked.py").symlink_to(secret)
+
+        worktree = {f.path for f in LocalRepoCrawler(repo).crawl_repo()}
+        objects = {f.path for f in LocalRepoCrawler(repo, ref="HEAD").crawl_repo()}
+
+        assert worktree == objects == {"README.md", "src/main.py", "src/util.py"}
+
+    def test_metadata(self, repo):
+        git(repo, "remote", "add", "origin", "git@github.com:owner/repo.git")
+        crawler = LocalRepoCrawler(repo)
+        files = crawler.crawl_repo()
+        metadata = crawler.metadata
+
+        assert metadata.full_name == "owner/repo"
+        assert metadata.name == "repo"
+        assert metadata.total_commits == 2
+        assert metadata.created_at == at(1_700_000_000)
+        assert metadata.updated_at == at(1_700_100_000)
+        assert metadata.languages["Python"] == sum(
+            f.size for f in files if f.language == "Python"
+        )
+
+    def test_plain_directory_and_large_files(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(LocalRepoCrawler, "MMAP_THRESHOLD", 16)
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "big.py").write_text("value = 1\n" * 100)
+        (tmp_path / "pkg" / "small.py").write_text("x = 1\n")
+        (tmp_path / "__pycache__").mkdir()
+        (tmp_path / "__pycache__" / "skip.py").write_text("x = 1\n")
+
+        crawler = LocalRepoCrawler(tmp_path)
+        files = {f.path: f for f in crawler.crawl_repo()}
+
+        assert crawler.source == "directory"
+        assert sorted(files) == ["pkg/big.py", "pkg/small.py"]
+        assert files["pkg/big.py"].content == "value = 1\n" * 100
+        assert files["pkg/big.py"].sha == git_blob_sha(b"value = 1\n" * 100)
+        assert crawler.metadata.total_commits == 0
+
+    def test_ref_requires_git(self, tmp_path):
+        with pytest.raises(ValueError):
+            LocalRepoCrawler(tmp_path, ref="main")
+
+    def test_rules_and_gitattributes(self, tmp_path):
+        (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+        (tmp_path / "node_modules" / "pkg" / "index.js").write_text("module.exports = 1\n")
+        (tmp_path / "third_party").mkdir()
+        (tmp_path / "third_party" / "lib.py").write_text("x = 1\n")
+        (tmp_path / "app.min.js").write_text("var a = 1;\n")
+        (tmp_path / "main.py").write_text("y = 2\n")
+        (tmp_path / ".gitattributes").write_text("third_party/** linguist-vendored\n")
+
+        files = LocalRepoCrawler(tmp_path).crawl_repo()
+
+        assert [f.path for f in files] == ["main.py"]
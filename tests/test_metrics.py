@@ -0,0 +1,185 @@
+import io
+import json
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+from src.ingestion.archive import ArchiveReader
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.instrumentation import (
+    API_BYTES,
+    API_CALLS,
+    FILES_SKIPPED,
+    RATE_LIMIT_REMAINING,
+    ApiMetrics,
+    endpoint_name,
+)
+from src.ingestion.transport import HttpRequest
+from src.metrics import STAGE_ITEMS, MetricsRegistry, timed_iter
+from tests.test_archive import make_tarball
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+@patch("src.ingestion.github_client.Github")
+@patch("src.ingestion.github_client.Auth")
+def client(mock_auth, mock_github):
+    mock_github.return_value.get_user.return_value = MagicMock()
+    return GitHubClient(token="test-token")
+
+
+def make_response(status=200, body=b"{}", headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+class TestMetricsRegistry:
+    def test_counter_by_labels(self, registry):
+        calls = registry.counter("calls_total", "Calls", ["endpoint"])
+        calls.inc(endpoint="a")
+        calls.inc(2, endpoint="a")
+        calls.inc(endpoint="b")
+
+        assert calls.value(endpoint="a") == 3
+        assert calls.total() == 4
+
+    def test_counter_rejects_wrong_labels_and_decrements(self, registry):
+        calls = registry.counter("calls_total", "Calls", ["endpoint"])
+        with pytest.raises(ValueError):
+            calls.inc(status="200")
+        with pytest.raises(ValueError):
+            calls.inc(-1, endpoint="a")
+
+    def test_register_is_get_or_create(self, registry):
+        first = registry.counter("calls_total", "Calls", ["endpoint"])
+        assert registry.counter("calls_total", "Calls", ["endpoint"]) is first
+        with pytest.raises(ValueError):
+            registry.gauge("calls_total", "Calls", ["endpoint"])
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value)
+
+        [sample] = latency.samples()
+        assert sample["buckets"] == {"0.1": 1, "1": 3, "+Inf": 4}
+        assert sample["count"] == 4
+        assert sample["sum"] == pytest.approx(6.05)
+
+    def test_prometheus_text(self, registry):
+        registry.counter("calls_total", "Calls", ["endpoint"]).inc(3, endpoint='a"b')
+        registry.gauge("budget", "Budget").set(4999)
+        registry.histogram("latency_seconds", "Latency", buckets=(0.5,)).observe(0.25)
+
+        text = registry.to_prometheus()
+
+        assert "# TYPE calls_total counter" in text
+        assert 'calls_total{endpoint="a\\"b"} 3' in text
+        assert "budget 4999" in text
+        assert 'latency_seconds_bucket{le="0.5"} 1' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+        assert "latency_seconds_sum 0.25" in text
+        assert "latency_seconds_count 1" in text
+
+    def test_snapshot_is_json_with_throughput(self, registry):
+        registry.histogram("stage_duration_seconds", "Stage", ["stage"]).observe(
+            2.0, stage="chunk"
+        )
+        registry.counter("stage_items_total", "Items", ["stage"]).inc(100, stage="chunk")
+
+        snapshot = json.loads(json.dumps(registry.snapshot()))
+
+        assert snapshot["stage_items_total"]["samples"] == [
+            {"labels": {"stage": "chunk"}, "value": 100}
+        ]
+        assert snapshot["stage_throughput"] == {"chunk": 50.0}
+
+    def test_timed_iter_counts_items(self):
+        before = STAGE_ITEMS.value(stage="test")
+        assert list(timed_iter("test", range(5))) == [0, 1, 2, 3, 4]
+        assert STAGE_ITEMS.value(stage="test") == before + 5
+
+
+class TestApiMetrics:
+    @pytest.mark.parametrize(
+        "url, expected",
+        [
+            ("https://api.github.com/user/repos?page=2", "user/repos"),
+            ("https://api.github.com/repos/o/r", "repos/:repo"),
+            ("https://api.github.com/repos/o/r/git/blobs/abc123", "repos/:repo/git/blobs/:id"),
+            ("https://api.github.com/repos/o/r/git/trees/main", "repos/:repo/git/trees/:id"),
+            ("https://api.github.com/repos/o/r/contents/src/a.py", "repos/:repo/contents/:id"),
+            ("https://api.github.com/repos/o/r/commits", "repos/:repo/commits"),
+            ("https://ghe.example.com/api/v3/repos/o/r/tarball", "repos/:repo/tarball"),
+            ("https://api.github.com/graphql", "graphql"),
+        ],
+    )
+    def test_endpoint_name(self, url, expected):
+        assert endpoint_name(url) == expected
+
+    def test_records_call_bytes_and_budget(self):
+        endpoint = "repos/:repo/git/blobs/:id"
+        calls = API_CALLS.value(endpoint=endpoint, status="200")
+        size = API_BYTES.value(endpoint=endpoint)
+        response = make_response(
+            body=b"x" * 10,
+            headers={"X-RateLimit-Remaining": "4321", "X-RateLimit-Resource": "core"},
+        )
+
+        ApiMetrics()(
+            HttpRequest("GET", "https://api.github.com/repos/o/r/git/blobs/abc"),
+            lambda request: response,
+        )
+
+        assert API_CALLS.value(endpoint=endpoint, status="200") == calls + 1
+        assert API_BYTES.value(endpoint=endpoint) == size + 10
+        assert RATE_LIMIT_REMAINING.value(resource="core") == 4321
+
+    def test_counts_transport_errors(self):
+        before = API_CALLS.value(endpoint="user", status="error")
+
+        def fail(request):
+            raise requests.ConnectionError("boom")
+
+        with pytest.raises(requests.ConnectionError):
+            ApiMetrics()(HttpRequest("GET", "https://api.github.com/user"), fail)
+        assert API_CALLS.value(endpoint="user", status="error") == before + 1
+
+    def test_installed_on_client(self, client):
+        assert any(isinstance(m, ApiMetrics) for m in client.middlewares)
+
+
+class TestSkipReasons:
+    def test_skip_reason(self, client):
+        assert client.skip_reason("src/main.py") is None
+        assert client.skip_reason(".git/config.py") == "ignored"
+        assert client.skip_reason("logo.png") == "extension"
+
+    def test_archive_counts_skipped_files(self, client):
+        reasons = ("ignored", "extension", "binary", "empty", "size")
+        before = {reason: FILES_SKIPPED.value(reason=reason) for reason in reasons}
+        tarball = make_tarball(
+            {
+                "src/main.py": b"print('hello')\n",
+                "src/__pycache__/main.py": b"stale",
+                "logo.png": b"\x89PNG",
+                "binary.json": b"\xff\xfe\x00",
+                "empty.py": b"   \n",
+                "big.txt": b"a" * 64,
+            }
+        )
+
+        reader = ArchiveReader(client=client, max_file_size=32)
+        files = list(reader.iter_files(io.BytesIO(tarball), "owner/repo", "url"))
+
+        assert [f.path for f in files] == ["src/main.py"]
+        for reason in reasons:
+            assert FILES_SKIPPED.value(reason=reason) == before[reason] + 1
@@ -0,0 +1,84 @@
+import pickle
+from datetime import datetime, timezone
+
+import pytest
+
+from src.ingestion.models import Chunk, FileContent
+
+
+def make_file(content="print('hi')\n", repo_name="owner/repo", **kwargs):
+    return FileContent(
+        path="src/main.py",
+        content=content,
+        language="".join(["Py", "thon"]),
+        repo_name=repo_name,
+        repo_url=f"https://github.com/{repo_name}",
+        **kwargs,
+    )
+
+
+class TestFileContent:
+    def test_attribute_api(self):
+        file = make_file(size=12, sha="abc", last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+        assert file.path == "src/main.py"
+        assert file.content == "print('hi')\n"
+        assert file.data == b"print('hi')\n"
+        assert file.language == "Python"
+        assert file.repo_name == "owner/repo"
+        assert file.repo_url == "https://github.com/owner/repo"
+        assert (file.size, file.sha) == (12, "abc")
+
+        file.content = "x = 1\n"
+        file.sha = "def"
+        assert file.content == "x = 1\n"
+        assert file.sha == "def"
+        with pytest.raises(AttributeError):
+            file.unknown = 1
+
+    def test_shared_fields(self):
+        a = make_file(repo_name="".join(["owner/", "repo"]))
+        b = make_file(repo_name="owner/repo")
+
+        assert a._repo is b._repo
+        assert a.language is b.language
+
+    def test_non_ascii_content_is_stored_as_utf8(self):
+        file = make_file(content="naïve = '✓'\n")
+
+        assert file.data == "naïve = '✓'\n".encode("utf-8")
+        assert file.content == "naïve = '✓'\n"
+
+    def test_lazy_content(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            return b"lazy = True\n"
+
+        file = make_file(content=load)
+
+        assert not file.is_loaded and file.has_content
+        assert calls == []
+        assert file.content == "lazy = True\n"
+        assert len(calls) == 1
+
+    def test_replace_equality_and_pickle(self):
+        file = make_file(content=lambda: b"x = 1\n", size=6)
+
+        record = file.replace(content="")
+        assert record.content == "" and not record.has_content
+        assert record.size == 6
+
+        copy = pickle.loads(pickle.dumps(file))
+        assert copy.is_loaded
+        assert copy == file
+        assert copy != record
+
+
+class TestChunk:
+    def test_slotted_and_interned(self):
+        chunk = Chunk("".join(["o/", "r"]), "a.py", "Python", "function", 0, 1, 1, 1, "x")
+
+        assert chunk.repo_name is Chunk("o/r", "b.py", None, "module", 0, 1, 1, 1, "y").repo_name
+        assert not hasattr(chunk, "__dict__")
@@ -0,0 +1,257 @@
+import itertools
+import threading
+import time
+
+import pytest
+from github import GithubException
+from unittest.mock import MagicMock, patch
+
+from src.indexing import EmbeddingStage, HashingEmbedder, LexicalIndex, VectorIndex
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.chunker import Chunker
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.models import FileContent
+from src.ingestion.repo_crawler import RepoCrawler
+from src.pipeline import Checkpoint, IngestPipeline, Pipeline, PipelineCancelled, Stage
+
+
+def collect(into):
+    lock = threading.Lock()
+
+    def fn(batch):
+        with lock:
+            into.extend(batch)
+        return batch
+
+    return fn
+
+
+class TestPipeline:
+    def test_items_flow_through_every_stage(self):
+        out = []
+        pipeline = Pipeline(
+            [
+                Stage("double", lambda batch: [x * 2 for x in batch], workers=3, batch_size=4),
+                Stage("odd_out", lambda batch: [x for x in batch if x % 4], workers=2),
+                Stage("sink", collect(out)),
+            ]
+        )
+
+        assert pipeline.run(range(100)) == 50
+        assert sorted(out) == [x * 2 for x in range(100) if x % 2]
+
+    def test_backpressure_bounds_work_in_flight(self):
+        produced, consumed = [0], []
+
+        def source():
+            for i in range(200):
+                produced[0] += 1
+                # Items between the source and the sink never exceed the
+                # queues plus what the workers hold
+                assert produced[0] - len(consumed) <= 2 + 1 + 2 + 1 + 1
+                yield i
+
+        def slow_sink(batch):
+            time.sleep(0.001)
+            consumed.extend(batch)
+            return batch
+
+        stages = [
+            Stage("pass", lambda batch: batch, queue_size=2),
+            Stage("sink", slow_sink, queue_size=2),
+        ]
+        Pipeline(stages).run(source())
+
+        assert len(consumed) == 200
+
+    def test_error_stops_an_endless_source(self):
+        def fail_at_five(batch):
+            if 5 in batch:
+                raise RuntimeError("bad item")
+            return batch
+
+        with pytest.raises(RuntimeError, match="bad item"):
+            Pipeline([Stage("check", fail_at_five, workers=2)]).run(itertools.count())
+
+    def test_cancel_from_a_stage(self):
+        seen = []
+        pipeline = Pipeline([Stage("sink", collect(seen))])
+
+        def cancel_after_ten(batch):
+            if len(seen) >= 10:
+                pipeline.cancel()
+            return batch
+
+        pipeline.stages.insert(0, Stage("watch", cancel_after_ten))
+
+        with pytest.raises(PipelineCancelled):
+            pipeline.run(itertools.count())
+        assert len(seen) < 1000
+
+    def test_stages_overlap(self):
+        def wait(batch):
+            time.sleep(0.01 * len(batch))
+            return batch
+
+        started = time.perf_counter()
+        Pipeline([Stage("io", wait), Stage("cpu", wait)]).run(range(20))
+        elapsed = time.perf_counter() - started
+
+        # 0.4s when run one phase after the other
+        assert elapsed < 0.3
+
+    def test_invalid_stage(self):
+        with pytest.raises(ValueError, match="must be positive"):
+            Stage("bad", list, workers=0)
+
+
+def make_file(path, content, repo_name="owner/repo"):
+    return FileContent(
+        path=path,
+        content=content,
+        language="python",
+        repo_name=repo_name,
+        repo_url=f"https://github.com/{repo_name}",
+        size=len(content),
+    )
+
+
+class TestCheckpoint:
+    def test_journal_roundtrip(self, tmp_path):
+        path = tmp_path / "checkpoint.jsonl"
+        checkpoint = Checkpoint(path)
+        a, b = make_file("a.py", "a = 1"), make_file("b.py", "b = 1")
+        a.sha, b.sha = "sha-a", "sha-b"
+
+        checkpoint.begin([a, b])
+        checkpoint.commit(["owner/repo"], [a])
+        with open(path, "a") as f:
+            f.write('{"done": [["owner/repo", "b.py"')
+
+        reloaded = Checkpoint(path)
+        assert reloaded.started("owner/repo")
+        assert reloaded.is_done("owner/repo", "a.py", "sha-a")
+        assert not reloaded.is_done("owner/repo", "a.py", "sha-changed")
+        assert reloaded.pending("owner/repo") == {"b.py"}
+
+        reloaded.clear()
+        assert not path.exists()
+        assert not reloaded.started("owner/repo")
+
+
+SOURCES = {f"pkg/mod_{i}.py": f"def f{i}(x):\n    return x + {i}\n" for i in range(12)}
+
+
+class TestIngestPipeline:
+    @pytest.fixture
+    def parts(self, tmp_path):
+        embedding_stage = EmbeddingStage(HashingEmbedder(dim=32))
+        return {
+            "chunker": Chunker(),
+            "chunk_cache": ChunkCache(tmp_path / "chunks"),
+            "embedding_stage": embedding_stage,
+            "vector_index": VectorIndex(tmp_path / "vectors", dim=32),
+            "lexical_index": LexicalIndex(tmp_path / "lexical"),
+            "checkpoint": Checkpoint(tmp_path / "checkpoint.jsonl"),
+        }
+
+    def crawler(self, sources):
+        crawler = MagicMock()
+        crawler.iter_repo.side_effect = lambda repo: (
+            make_file(path, text, repo.full_name) for path, text in sources.items()
+        )
+        return crawler
+
+    def ingest(self, parts):
+        pipeline = IngestPipeline(
+            self.crawler(SOURCES),
+            chunk_processes=1,
+            batch_size=2,
+            checkpoint_seconds=0,
+            **parts,
+        )
+        return pipeline, pipeline.run([MagicMock(full_name="owner/repo")])
+
+    def indexed_paths(self, index):
+        hits = index.search("return", k=100)
+        return sorted(hit.path for hit in hits)
+
+    def test_indexes_every_file(self, parts):
+        _, stats = self.ingest(parts)
+
+        assert stats.files == len(SOURCES)
+        assert len(parts["vector_index"]) == len(parts["lexical_index"]) == stats.chunks
+        assert self.indexed_paths(parts["lexical_index"]) == sorted(SOURCES)
+        assert not parts["checkpoint"].path.exists()
+
+    def test_resumes_after_interruption(self, parts):
+        embed = parts["embedding_stage"].embed_all
+        calls = []
+
+        def interrupted(chunks):
+            calls.append(1)
+            if len(calls) > 3:
+                raise KeyboardInterrupt
+            return embed(chunks)
+
+        parts["embedding_stage"].embed_all = interrupted
+        with pytest.raises(KeyboardInterrupt):
+            self.ingest(parts)
+        checkpoint = Checkpoint(parts["checkpoint"].path)
+        done = len(checkpoint.paths("owner/repo"))
+        assert checkpoint.started("owner/repo") and done < len(SOURCES)
+
+        parts["embedding_stage"].embed_all = embed
+        parts["checkpoint"] = checkpoint
+        _, stats = self.ingest(parts)
+
+        assert stats.resumed == done
+        assert stats.files == len(SOURCES) - done
+        # Nothing indexed twice
+        assert self.indexed_paths(parts["lexical_index"]) == sorted(SOURCES)
+        assert len(parts["vector_index"]) == len(parts["lexical_index"]) == len(SOURCES)
+
+    def test_pending_and_removed_files_cleaned_up(self, parts):
+        # A killed run wrote mod_0.py to the vector index only, and had
+        # indexed gone.py, which the repo no longer has
+        a = make_file("pkg/mod_0.py", SOURCES["pkg/mod_0.py"])
+        gone = make_file("gone.py", "x = 1\n")
+        for file in (a, gone):
+            chunks = parts["chunker"].chunk_file(file)
+            parts["vector_index"].add(chunks, parts["embedding_stage"].embed_all(chunks)[1])
+        gone.sha = "sha-gone"
+        parts["lexical_index"].add(parts["chunker"].chunk_file(gone))
+        parts["checkpoint"].begin([a])
+        parts["checkpoint"].commit(["owner/repo"], [gone])
+
+        self.ingest(parts)
+
+        query = parts["embedding_stage"].embed_all(parts["chunker"].chunk_file(a))[1][0]
+        vector_paths = sorted(hit.path for hit in parts["vector_index"].search(query, k=100))
+        assert vector_paths == sorted(SOURCES)
+        assert self.indexed_paths(parts["lexical_index"]) == sorted(SOURCES)
+
+    def test_failed_repo_is_reported(self, parts):
+        crawler = self.crawler(SOURCES)
+        crawler.iter_repo.side_effect = RuntimeError("boom")
+        pipeline = IngestPipeline(crawler, chunk_processes=1, **parts)
+
+        stats = pipeline.run([MagicMock(full_name="owner/broken")])
+
+        assert stats.failed_repos == ["owner/broken"]
+        assert stats.files == 0
+
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def test_unreachable_repo_keeps_its_rows(self, mock_auth, mock_github, parts):
+        self.ingest(parts)
+        client = GitHubClient(token="test-token")
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        repo.get_git_tree.side_effect = GithubException(502, {"message": "Bad Gateway"}, None)
+        crawler = RepoCrawler(client=client, use_cache=False, resolve_last_modified=False)
+
+        stats = IngestPipeline(crawler, chunk_processes=1, **parts).run([repo])
+
+        assert stats.failed_repos == ["owner/repo"]
+        assert self.indexed_paths(parts["lexical_index"]) == sorted(SOURCES)
+        assert len(parts["vector_index"]) == len(SOURCES)
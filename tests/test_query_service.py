@@ -0,0 +1,248 @@
+import asyncio
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+from src.indexing.doc_table import DocFilter
+from src.indexing.embedder import HashingEmbedder
+from src.indexing.lexical_index import LexicalIndex
+from src.indexing.vector_index import VectorIndex
+from src.ingestion.models import Chunk
+from src.service.http_server import QueryServer
+from src.service.query_service import LatencyStats, QueryService, ResultCache
+
+EMBEDDER = HashingEmbedder(dim=64)
+
+
+def make_chunk(content, path, repo_name="owner/repo", language="Python"):
+    return Chunk(
+        repo_name=repo_name,
+        path=path,
+        language=language,
+        node_type="function_definition",
+        start_byte=0,
+        end_byte=len(content),
+        start_line=1,
+        end_line=1,
+        content=content,
+    )
+
+
+CHUNKS = [
+    make_chunk("def load_user_profile(user_id): pass", "src/users.py"),
+    make_chunk("def parse_config(path): pass", "src/config.py"),
+    make_chunk("fn load_user_profile(id: u32) {}", "lib/users.rs", "other/repo", "Rust"),
+]
+
+
+def build_indexes(tmp_path, chunks=CHUNKS):
+    vector_index = VectorIndex(tmp_path / "vectors", dim=EMBEDDER.dim)
+    vector_index.add(chunks, EMBEDDER.embed([c.content for c in chunks]))
+    with LexicalIndex(tmp_path / "lexical") as lexical_index:
+        lexical_index.add(chunks)
+    return vector_index
+
+
+@pytest.fixture
+def service(tmp_path):
+    build_indexes(tmp_path)
+    return QueryService(EMBEDDER, tmp_path / "vectors", tmp_path / "lexical")
+
+
+class TestResultCache:
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(capacity=2)
+        cache.put("a", [])
+        cache.put("b", [])
+        cache.get("a")
+        cache.put("c", [])
+
+        assert cache.get("b") is None
+        assert cache.get("a") == []
+        assert (cache.hits, cache.misses) == (2, 1)
+
+
+class TestLatencyStats:
+    def test_percentiles_and_qps(self):
+        now = [100.0]
+        stats = LatencyStats(clock=lambda: now[0])
+        now[0] = 110.0
+        for ms in range(1, 101):
+            stats.record(ms / 1000)
+
+        snapshot = stats.snapshot()
+
+        assert snapshot["queries"] == 100
+        assert snapshot["p50_ms"] == pytest.approx(50.5)
+        assert snapshot["p99_ms"] == pytest.approx(99.01)
+        assert snapshot["qps"] == pytest.approx(10.0)
+
+
+class TestQueryService:
+    def test_concurrent_queries_are_batched(self, service):
+        async def run():
+            async with service:
+                return await asyncio.gather(
+                    *(service.search(q) for q in ["load user", "parse config", "profile"])
+                )
+
+        results = asyncio.run(run())
+
+        assert results[1][0].path == "src/config.py"
+        assert service.batches == 1
+        assert service.stats()["avg_batch_size"] == 3
+
+    def test_filters(self, service):
+        async def run():
+            async with service:
+                query = "load_user_profile"
+                by_repo = await service.search(query, doc_filter=DocFilter(repo_name="other/repo"))
+                by_lang = await service.search(query, doc_filter=DocFilter(language="Python"))
+                by_prefix = await service.search("def", doc_filter=DocFilter(path_prefix="src/c"))
+                return by_repo, by_lang, by_prefix
+
+        by_repo, by_lang, by_prefix = asyncio.run(run())
+
+        assert [h.path for h in by_repo] == ["lib/users.rs"]
+        assert {h.language for h in by_lang} == {"Python"}
+        assert [h.path for h in by_prefix] == ["src/config.py"]
+
+    def test_cache_hit_and_invalidation_on_index_change(self, tmp_path, service, monkeypatch):
+        monkeypatch.setattr(QueryService, "RELOAD_CHECK_SECONDS", 0.0)
+
+        async def run():
+            async with service:
+                first = await service.search("parse config")
+                await service.search("parse config")
+                hits_before = service.cache.hits
+
+                build_indexes(tmp_path, [make_chunk("def parse_config_v2(): pass", "src/v2.py")])
+                for path in (tmp_path / "vectors", tmp_path / "lexical"):
+                    header = path / "index.json"
+                    os.utime(header, ns=(1, header.stat().st_mtime_ns + 10**9))
+                updated = await service.search("parse config")
+                return first, hits_before, updated
+
+        first, hits_before, updated = asyncio.run(run())
+
+        assert hits_before == 1
+        assert "src/v2.py" not in {h.path for h in first}
+        assert "src/v2.py" in {h.path for h in updated}
+
+    def test_load_waits_for_a_flush_in_progress(self, tmp_path, monkeypatch):
+        build_indexes(tmp_path)
+        writer = LexicalIndex(tmp_path / "lexical")
+        writer._write_header(writing=True)
+        monkeypatch.setattr(QueryService, "LOAD_RETRY_SECONDS", 0.01)
+        loaded = []
+        load = threading.Thread(
+            target=lambda: loaded.append(
+                QueryService(EMBEDDER, tmp_path / "vectors", tmp_path / "lexical")
+            )
+        )
+
+        load.start()
+        load.join(0.3)
+        waited = not loaded
+        writer.add([make_chunk("def rotate_token(): pass", "src/tokens.py")])
+        writer.flush()
+        load.join(5)
+
+        assert waited
+        lexical_index = loaded[0]._retriever.lexical_index
+        assert [hit.path for hit in lexical_index.search("rotate_token")] == ["src/tokens.py"]
+
+    def test_rejects_non_positive_k(self, service):
+        async def run():
+            async with service:
+                await service.search("x", k=0)
+
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+
+
+class TestQueryServer:
+    def test_http_search_and_stats(self, service):
+        async def run():
+            server = QueryServer(service, port=0)
+            await server.start()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, requests_against, server.port)
+            finally:
+                await server.stop()
+
+        def requests_against(port):
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            conn.request("GET", "/search?q=parse+config&k=1")
+            search = conn.getresponse()
+            search_body = json.loads(search.read())
+            payload = json.dumps({"query": "load", "language": "Rust"})
+            conn.request("POST", "/search", body=payload)
+            post = json.loads(conn.getresponse().read())
+            conn.request("GET", "/search")
+            missing = conn.getresponse()
+            missing.read()
+            conn.request("GET", "/stats")
+            stats = json.loads(conn.getresponse().read())
+            conn.request("GET", "/metrics")
+            metrics = conn.getresponse()
+            metrics_text = metrics.read().decode("utf-8")
+            conn.close()
+            return search.status, search_body, post, missing.status, stats, (
+                metrics.getheader("Content-Type"),
+                metrics_text,
+            )
+
+        status, search, post, missing_status, stats, metrics = asyncio.run(run())
+
+        assert status == 200
+        assert [r["path"] for r in search["results"]] == ["src/config.py"]
+        assert [r["path"] for r in post["results"]] == ["lib/users.rs"]
+        assert missing_status == 400
+        assert stats["queries"] == 2
+        content_type, text = metrics
+        assert content_type.startswith("text/plain")
+        assert "# TYPE stage_duration_seconds histogram" in text
+
+    def test_bad_requests_get_a_response(self, service):
+        async def run():
+            server = QueryServer(service, port=0)
+            await server.start()
+            service.search = broken
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, requests_against, server.port)
+            finally:
+                await server.stop()
+
+        async def broken(query, k, doc_filter):
+            if query == "crash":
+                raise RuntimeError("boom")
+            return []
+
+        def requests_against(port):
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            statuses = []
+            for body in ("[]", '"x"', "1", '{"query": "a", "k": null}', '{"query": 5}'):
+                conn.request("POST", "/search", body=body)
+                response = conn.getresponse()
+                response.read()
+                statuses.append(response.status)
+            conn.request("POST", "/search", body='{"query": "crash"}')
+            crashed = conn.getresponse()
+            error = json.loads(crashed.read())
+            # The connection is still usable afterwards
+            conn.request("POST", "/search", body='{"query": "ok"}')
+            ok = conn.getresponse()
+            ok.read()
+            conn.close()
+            return statuses, crashed.status, error, ok.status
+
+        statuses, crashed, error, ok = asyncio.run(run())
+
+        assert statuses == [400] * 5
+        assert (crashed, error, ok) == (500, {"error": "Internal server error"}, 200)
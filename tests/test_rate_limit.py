@@ -0,0 +1,158 @@
+import pytest
+from unittest.mock import MagicMock
+
+from github import GithubException
+
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.rate_limit import RateLimitScheduler
+from tests.fake_server import FakeServer
+
+REPO_PATH = "/repos/owner/repo"
+REPO_BODY = {"name": "repo", "full_name": "owner/repo", "private": False}
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_headers(remaining, reset, limit=5000):
+    return {
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(reset),
+        "x-ratelimit-resource": "core",
+    }
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def server():
+    server = FakeServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server, clock):
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+    with GitHubClient(token="test-token", base_url=server.url, scheduler=scheduler) as client:
+        yield client
+
+
+class TestTokenBucket:
+    def test_burst_then_paced(self, clock):
+        scheduler = RateLimitScheduler(
+            requests_per_second=2, burst=2, clock=clock, sleep=clock.sleep
+        )
+
+        for _ in range(4):
+            scheduler.acquire()
+
+        assert clock.sleeps == [0.5, 0.5]
+
+    def test_waits_for_reset_when_budget_exhausted(self, clock):
+        scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+        scheduler.update(rate_headers(remaining=0, reset=clock.now + 30))
+
+        scheduler.acquire()
+
+        assert clock.sleeps == [30]
+
+    def test_paces_to_remaining_budget(self, clock):
+        scheduler = RateLimitScheduler(
+            requests_per_second=100, burst=1, clock=clock, sleep=clock.sleep
+        )
+        scheduler.update(rate_headers(remaining=11, reset=clock.now + 10))
+
+        scheduler.acquire()
+        scheduler.acquire()
+
+        # 11 requests left over 10 seconds allows about one per second
+        assert clock.sleeps == [pytest.approx(1.0)]
+
+    def test_invalid_rate_raises(self):
+        with pytest.raises(ValueError, match="positive"):
+            RateLimitScheduler(requests_per_second=0)
+
+
+class TestRetryDelay:
+    def make_response(self, status, headers=None, text=""):
+        response = MagicMock(status_code=status, text=text)
+        response.headers = headers or {}
+        return response
+
+    def test_success_not_retried(self, clock):
+        scheduler = RateLimitScheduler(clock=clock)
+        assert scheduler.retry_delay(self.make_response(200), 0) is None
+
+    def test_permission_error_not_retried(self, clock):
+        scheduler = RateLimitScheduler(clock=clock)
+        response = self.make_response(403, text='{"message": "Resource not accessible"}')
+        assert scheduler.retry_delay(response, 0) is None
+
+    def test_primary_limit_waits_until_reset(self, clock):
+        scheduler = RateLimitScheduler(clock=clock)
+        response = self.make_response(403, rate_headers(0, clock.now + 42))
+        assert scheduler.retry_delay(response, 0) == 43
+
+    def test_server_error_backs_off_exponentially(self, clock):
+        scheduler = RateLimitScheduler(clock=clock, backoff_base=0.5)
+        response = self.make_response(502)
+        assert [scheduler.retry_delay(response, n) for n in range(3)] == [0.5, 1.0, 2.0]
+
+
+class TestFakeApiServer:
+    def test_reads_budget_from_headers(self, server, client, clock):
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers=rate_headers(4321, clock.now + 600))
+
+        repo = client.client.get_repo("owner/repo")
+
+        assert repo.full_name == "owner/repo"
+        assert client.rate_limit_budget.remaining == 4321
+        assert client.rate_limit_budget.limit == 5000
+
+    def test_retries_429_with_retry_after(self, server, client, clock):
+        server.enqueue(REPO_PATH, status=429, headers={"Retry-After": "7"})
+        server.enqueue(REPO_PATH, body=REPO_BODY, headers=rate_headers(4999, clock.now + 600))
+
+        repo = client.client.get_repo("owner/repo")
+
+        assert repo.name == "repo"
+        assert server.count(REPO_PATH) == 2
+        assert 7.0 in clock.sleeps
+
+    def test_retries_secondary_limit(self, server, client, clock):
+        server.enqueue(
+            REPO_PATH,
+            status=403,
+            body={"message": "You have exceeded a secondary rate limit."},
+            headers=rate_headers(4000, clock.now + 600),
+        )
+        server.enqueue(REPO_PATH, body=REPO_BODY)
+
+        client.client.get_repo("owner/repo")
+
+        assert server.count(REPO_PATH) == 2
+        assert RateLimitScheduler.SECONDARY_LIMIT_WAIT_SECONDS in clock.sleeps
+
+    def test_gives_up_after_max_retries(self, server, client):
+        client.scheduler.max_retries = 2
+        server.set_default(REPO_PATH, status=503)
+
+        with pytest.raises(GithubException):
+            client.client.get_repo("owner/repo")
+
+        assert server.count(REPO_PATH) == 3
@@ -0,0 +1,293 @@
+import base64
+import threading
+import time
+
+import pytest
+from github import GithubException
+from unittest.mock import MagicMock, patch
+
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.repo_crawler import RepoCrawler
+
+
+def make_element(path, type_="blob", size=10, sha=None):
+    element = MagicMock()
+    element.path = path
+    element.type = type_
+    element.size = size
+    element.sha = sha or f"sha-{path}"
+    return element
+
+
+def make_tree(elements, truncated=False):
+    tree = MagicMock()
+    tree.tree = elements
+    tree.truncated = truncated
+    return tree
+
+
+def make_blob(text):
+    blob = MagicMock()
+    blob.encoding = "base64"
+    blob.content = base64.b64encode(text.encode("utf-8")).decode("ascii")
+    return blob
+
+
+@pytest.fixture
+@patch("src.ingestion.github_client.Github")
+@patch("src.ingestion.github_client.Auth")
+def client(mock_auth, mock_github):
+    mock_github.return_value.get_user.return_value = MagicMock()
+    return GitHubClient(token="test-token")
+
+
+@pytest.fixture
+def repo():
+    repo = MagicMock()
+    repo.full_name = "owner/repo"
+    repo.html_url = "https://github.com/owner/repo"
+    repo.default_branch = "main"
+    return repo
+
+
+@pytest.fixture
+def crawler(client):
+    return RepoCrawler(client=client, use_cache=False, resolve_last_modified=False)
+
+
+class TestCrawlerInit:
+    def test_unknown_mode_raises(self, client):
+        with pytest.raises(ValueError, match="Unknown crawl mode"):
+            RepoCrawler(client=client, use_cache=False, mode="bogus")
+
+
+class TestTreeCrawl:
+    def test_single_recursive_listing(self, crawler, repo):
+        repo.get_git_tree.return_value = make_tree(
+            [
+                make_element("src", type_="tree"),
+                make_element("src/main.py"),
+                make_element("README.md"),
+            ]
+        )
+        repo.get_git_blob.side_effect = lambda sha: make_blob(f"content of {sha}")
+
+        files = crawler.crawl_repo(repo)
+
+        repo.get_git_tree.assert_called_once_with("main", recursive=True)
+        repo.get_contents.assert_not_called()
+        assert [f.path for f in files] == ["src/main.py", "README.md"]
+        assert files[0].content == "content of sha-src/main.py"
+        assert files[0].language == "Python"
+
+    def test_filters_before_download(self, crawler, repo):
+        repo.get_git_tree.return_value = make_tree(
+            [
+                make_element("image.png"),
+                make_element("__pycache__/mod.py"),
+                make_element("big.py", size=RepoCrawler.MAX_FILE_SIZE_MB + 1),
+                make_element("ok.py"),
+            ]
+        )
+        repo.get_git_blob.side_effect = lambda sha: make_blob("print(1)")
+
+        files = crawler.crawl_repo(repo)
+
+        repo.get_git_blob.assert_called_once_with("sha-ok.py")
+        assert [f.path for f in files] == ["ok.py"]
+
+    def test_truncated_tree_falls_back_to_subtrees(self, crawler, repo):
+        trees = {
+            ("main", True): make_tree([], truncated=True),
+            ("main", False): make_tree(
+                [
+                    make_element("lib", type_="tree", sha="lib-sha"),
+                    make_element(".git", type_="tree", sha="git-sha"),
+                    make_element("setup.py"),
+                ]
+            ),
+            ("lib-sha", True): make_tree(
+                [make_element("pkg", type_="tree"), make_element("pkg/core.py")]
+            ),
+        }
+        repo.get_git_tree.side_effect = lambda sha, recursive=False: trees[
+            (sha, recursive)
+        ]
+        repo.get_git_blob.side_effect = lambda sha: make_blob("x = 1")
+
+        files = crawler.crawl_repo(repo)
+
+        assert sorted(f.path for f in files) == ["lib/pkg/core.py", "setup.py"]
+        requested = [c.args[0] for c in repo.get_git_tree.call_args_list]
+        assert "git-sha" not in requested
+
+    def test_binary_blob_skipped(self, crawler, repo):
+        repo.get_git_tree.return_value = make_tree([make_element("data.json")])
+        blob = MagicMock(encoding="base64")
+        blob.content = base64.b64encode(b"\xff\xfe\x00").decode("ascii")
+        repo.get_git_blob.return_value = blob
+
+
+        assert crawler.crawl_repo(repo) == []
+
+    def test_unreachable_tree_raises(self, crawler, repo):
+        repo.get_git_tree.side_effect = GithubException(502, {"message": "Bad Gateway"}, None)
+
+        with pytest.raises(GithubException):
+            crawler.crawl_repo(repo)
+
+    def test_empty_repository(self, crawler, repo):
+        repo.get_git_tree.side_effect = GithubException(
+            409, {"message": "Git Repository is empty."}, None
+        )
+
+        assert crawler.crawl_repo(repo) == []
+
+    def test_duplicate_blobs_fetched_once(self, crawler, repo):
+        repo.get_git_tree.return_value = make_tree(
+            [
+                make_element("a/util.py", sha="same"),
+                make_element("main.py"),
+                make_element("copy/util.py", sha="same"),
+            ]
+        )
+        repo.get_git_blob.side_effect = lambda sha: make_blob(f"content of {sha}")
+
+        files = crawler.crawl_repo(repo)
+
+        assert [c.args[0] for c in repo.get_git_blob.call_args_list] == ["same", "sha-main.py"]
+        assert [f.path for f in files] == ["a/util.py", "copy/util.py", "main.py"]
+        assert files[1].content == files[0].content == "content of same"
+        assert files[1].sha == "same"
+
+
+class TestConcurrentCrawl:
+    def test_invalid_worker_count_raises(self, client):
+        with pytest.raises(ValueError, match="Worker counts"):
+            RepoCrawler(client=client, use_cache=False, max_workers=0)
+
+    def test_parallel_blob_fetch_preserves_order(self, client, repo):
+        elements = [make_element(f"f{i}.py") for i in range(20)]
+        repo.get_git_tree.return_value = make_tree(elements)
+
+        def get_blob(sha):
+            # Later files finish first
+            time.sleep(0.001 * (20 - int(sha.removeprefix("sha-f").removesuffix(".py"))))
+            return make_blob(sha)
+
+        repo.get_git_blob.side_effect = get_blob
+
+        with RepoCrawler(
+            client=client, use_cache=False, resolve_last_modified=False, max_workers=8
+        ) as crawler:
+            files = crawler.crawl_repo(repo)
+
+        assert [f.path for f in files] == [f"f{i}.py" for i in range(20)]
+
+    def test_concurrent_repos_share_blob_downloads(self, client):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def get_blob(sha):
+            calls.append(sha)
+            started.set()
+            release.wait(5)
+            return make_blob("shared = True")
+
+        repos = []
+        for name in ("owner/a", "owner/fork"):
+            r = MagicMock(full_name=name, default_branch="main")
+            r.get_git_tree.return_value = make_tree([make_element("lib.py", sha="same")])
+            r.get_git_blob.side_effect = get_blob
+            repos.append(r)
+
+        with RepoCrawler(
+            client=client, use_cache=False, resolve_last_modified=False, max_workers=4
+        ) as crawler:
+            first = crawler._executor.submit(crawler._fetch_blob, repos[0], "same")
+            started.wait(5)
+            second = crawler._executor.submit(crawler._fetch_blob, repos[1], "same")
+            time.sleep(0.05)
+            release.set()
+
+            assert first.result() == second.result()
+        assert calls == ["same"]
+
+    def test_failing_repo_is_isolated(self, client):
+        repos = []
+        for name in ("owner/a", "owner/b", "owner/c"):
+            r = MagicMock(full_name=name, default_branch="main")
+            r.get_git_tree.return_value = make_tree([make_element("main.py")])
+            r.get_git_blob.return_value = make_blob(name)
+            repos.append(r)
+        repos[1].get_git_tree.side_effect = RuntimeError("boom")
+        client.get_repos = MagicMock(return_value=repos)
+        client.get_repo_metadata = MagicMock(
+            side_effect=lambda r: MagicMock(full_name=r.full_name)
+        )
+
+        with RepoCrawler(
+            client=client,
+            use_cache=False,
+            resolve_last_modified=False,
+            max_workers=4,
+            max_concurrent_repos=3,
+        ) as crawler:
+            files, metadata = crawler.crawl_all_repos()
+
+        assert [f.repo_name for f in files] == ["owner/a", "owner/c"]
+        assert [m.full_name for m in metadata] == ["owner/a", "owner/c"]
+        assert crawler.failed_repos == ["owner/b"]
+
+
+class TestStreamingCrawl:
+    def test_iter_repo_yields_before_fetching_everything(self, crawler, repo):
+        repo.get_git_tree.return_value = make_tree(
+            [make_element(f"f{i}.py") for i in range(5)]
+        )
+        repo.get_git_blob.side_effect = lambda sha: make_blob(sha)
+
+        files = crawler.iter_repo(repo)
+        first = next(files)
+
+        assert first.path == "f0.py"
+        assert repo.get_git_blob.call_count == 1
+        assert len(list(files)) == 4
+
+    def test_crawled_files_logged_without_cache(self, crawler, repo, caplog):
+        repo.get_git_tree.return_value = make_tree([make_element("a.py"), make_element("b.py")])
+        repo.get_git_blob.side_effect = lambda sha: make_blob(sha)
+
+        with caplog.at_level("INFO", logger="src.ingestion.repo_crawler"):
+            crawler.crawl_repo(repo)
+
+        assert "Crawled 2 files from owner/repo" in caplog.messages
+
+    def test_accumulation_is_opt_in(self, client, repo):
+        repo.get_git_tree.return_value = make_tree([make_element("a.py")])
+        repo.get_git_blob.return_value = make_blob("a = 1")
+
+        plain = RepoCrawler(client=client, use_cache=False, resolve_last_modified=False)
+        keeping = RepoCrawler(
+            client=client, use_cache=False, resolve_last_modified=False, accumulate=True
+        )
+
+        assert len(plain.crawl_repo(repo)) == 1
+        assert plain.all_files == []
+        keeping.crawl_repo(repo)
+        assert [f.path for f in keeping.all_files] == ["a.py"]
+
+    def test_last_modified_resolved_in_batches(self, client, repo):
+        repo.get_git_tree.return_value = make_tree(
+            [make_element(f"f{i}.py") for i in range(5)]
+        )
+        repo.get_git_blob.side_effect = lambda sha: make_blob(sha)
+        crawler = RepoCrawler(client=client, use_cache=False)
+        crawler._history = MagicMock(batch_size=2)
+
+        paths = [f.path for f in crawler.iter_repo(repo)]
+
+        batches = [len(c.args[1]) for c in crawler._history.apply.call_args_list]
+        assert batches == [2, 2, 1]
+        assert paths == [f"f{i}.py" for i in range(5)]
@@ -0,0 +1,22 @@
+import pytest
+from github import Github
+
+from src.ingestion.transport import install_middlewares
+
+
+class TestInstallMiddlewares:
+    def test_replaces_connection_class(self):
+        github = Github()
+
+        install_middlewares(github, [])
+
+        connection_class = github.requester._Requester__connectionClass
+        assert connection_class.__name__ == "HTTPSConnection"
+        assert connection_class.__module__ == "src.ingestion.transport"
+
+    def test_missing_hook_raises(self):
+        github = Github()
+        del github.requester._Requester__connectionClass
+
+        with pytest.raises(RuntimeError, match="not supported"):
+            install_middlewares(github, [])
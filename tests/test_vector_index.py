@@ -0,0 +1,244 @@
+import numpy as np
+import pytest
+
+from src.indexing.doc_table import DocFilter
+from src.indexing.vector_index import VectorIndex
+from src.ingestion.models import Chunk
+
+
+def make_chunks(n, repo_name="owner/repo", path="a.py", blob_sha=None):
+    return [
+        Chunk(
+            repo_name=repo_name,
+            path=path,
+            language="Python",
+            node_type="function_definition",
+            start_byte=i * 10,
+            end_byte=i * 10 + 10,
+            start_line=i + 1,
+            end_line=i + 1,
+            content=f"chunk {i}",
+            blob_sha=blob_sha,
+        )
+        for i in range(n)
+    ]
+
+
+def random_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return VectorIndex(tmp_path / "index", dim=16)
+
+
+class TestExactSearch:
+    def test_returns_nearest_with_metadata(self, index):
+        vectors = random_vectors(20)
+        index.add(make_chunks(20), vectors)
+
+        hits = index.search(vectors[7], k=3)
+
+        assert hits[0].row == 7
+        assert hits[0].score == pytest.approx(1.0)
+        assert hits[0].repo_name == "owner/repo"
+        assert hits[0].path == "a.py"
+        assert hits[0].language == "Python"
+        assert (hits[0].start_byte, hits[0].end_byte) == (70, 80)
+        assert len(hits) == 3
+        assert hits[0].score >= hits[1].score >= hits[2].score
+
+    def test_matches_brute_force_across_blocks(self, index, monkeypatch):
+        monkeypatch.setattr(VectorIndex, "BLOCK_ROWS", 7)
+        vectors = random_vectors(50)
+        index.add(make_chunks(50), vectors)
+        queries = random_vectors(4, seed=1)
+
+        results = index.search_batch(queries, k=5)
+
+        expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+        assert [[h.row for h in hits] for hits in results] == expected.tolist()
+
+    def test_mask_filters_rows(self, index):
+        vectors = random_vectors(10)
+        index.add(make_chunks(10), vectors)
+        mask = np.zeros(10, dtype=bool)
+        mask[[2, 4]] = True
+
+        hits = index.search(vectors[0], k=5, mask=mask)
+
+        assert {h.row for h in hits} == {2, 4}
+
+    def test_empty_index(self, index):
+        assert index.search(np.ones(16, dtype=np.float32)) == []
+
+    def test_rejects_wrong_dim(self, index):
+        with pytest.raises(ValueError):
+            index.add(make_chunks(1), np.zeros((1, 8), dtype=np.float32))
+
+
+class TestPersistence:
+    def test_reopen_maps_existing_files(self, tmp_path):
+        vectors = random_vectors(5)
+        VectorIndex(tmp_path, dim=16).add(make_chunks(5), vectors)
+
+        index = VectorIndex(tmp_path)
+
+        assert len(index) == 5
+        assert isinstance(index._vectors, np.memmap)
+        assert index.search(vectors[3], k=1)[0].row == 3
+
+    def test_rows_of_an_unflushed_add_are_dropped(self, tmp_path):
+        VectorIndex(tmp_path, dim=16).add(make_chunks(5), random_vectors(5))
+        # Killed after appending rows but before the header was written
+        with open(tmp_path / VectorIndex.VECTORS_FILE, "ab") as f:
+            f.write(random_vectors(3, seed=1).tobytes())
+        with open(tmp_path / VectorIndex.META_FILE, "ab") as f:
+            f.write(b"\xff" * 7)
+
+        index = VectorIndex(tmp_path)
+        assert len(index) == 5
+        vectors = random_vectors(2, seed=2)
+        index.add(make_chunks(2, path="b.py"), vectors)
+
+        reopened = VectorIndex(tmp_path)
+        hits = [reopened.search(vector, k=1)[0] for vector in vectors]
+        assert [(hit.row, hit.path) for hit in hits] == [(5, "b.py"), (6, "b.py")]
+        assert (tmp_path / VectorIndex.VECTORS_FILE).stat().st_size == 7 * 16 * 4
+
+    def test_dim_mismatch_raises(self, tmp_path):
+        VectorIndex(tmp_path, dim=16)
+
+        with pytest.raises(ValueError):
+            VectorIndex(tmp_path, dim=32)
+
+    def test_missing_index_requires_dim(self, tmp_path):
+        with pytest.raises(ValueError):
+            VectorIndex(tmp_path / "missing")
+
+
+class TestIncrementalUpdates:
+    def test_delete_file_tombstones_rows(self, index):
+        vectors = random_vectors(6)
+        index.add(make_chunks(3, path="a.py"), vectors[:3])
+        index.add(make_chunks(3, path="b.py"), vectors[3:])
+
+        assert index.delete_file("owner/repo", "a.py") == 3
+        assert index.delete_file("owner/repo", "a.py") == 0
+
+        hits = index.search(vectors[0], k=6)
+        assert len(index) == 3
+        assert {h.path for h in hits} == {"b.py"}
+
+    def test_replace_file_and_compact(self, tmp_path):
+        index = VectorIndex(tmp_path, dim=16)
+        vectors = random_vectors(4)
+        index.add(make_chunks(2, path="a.py"), vectors[:2])
+        index.add(make_chunks(2, path="b.py"), vectors[2:])
+
+        index.replace_file("owner/repo", "a.py", make_chunks(1, path="a.py"), vectors[:1])
+        index.compact()
+
+        reopened = VectorIndex(tmp_path)
+        assert reopened.count == 3
+        hits = reopened.search(vectors[0], k=1)
+        assert (hits[0].path, hits[0].score) == ("a.py", pytest.approx(1.0))
+
+    def test_delete_repo(self, index):
+        vectors = random_vectors(4)
+        index.add(make_chunks(2, repo_name="a/a"), vectors[:2])
+        index.add(make_chunks(2, repo_name="b/b"), vectors[2:])
+
+        assert index.delete_repo("a/a") == 2
+        assert {h.repo_name for h in index.search(vectors[0], k=4)} == {"b/b"}
+
+
+class TestSharedContent:
+    def test_copies_stored_once_with_all_locations(self, index):
+        vectors = random_vectors(2)
+        index.add(make_chunks(2, "a/a", "util.py", blob_sha="same"), vectors)
+        index.add(make_chunks(2, "b/b", "vendor/util.py", blob_sha="same"), vectors)
+
+        hits = index.search(vectors[0], k=4)
+
+        assert index.count == 2
+        assert [h.row for h in hits] == [0, 1]
+        assert hits[0].blob_sha == "same"
+        assert hits[0].locations == [("a/a", "util.py"), ("b/b", "vendor/util.py")]
+
+    def test_deleting_owner_moves_rows_to_copy(self, tmp_path):
+        index = VectorIndex(tmp_path, dim=16)
+        vectors = random_vectors(2)
+        index.add(make_chunks(2, "a/a", "util.py", blob_sha="same"), vectors)
+        index.add(make_chunks(2, "b/b", "util.py", blob_sha="same"), vectors)
+
+        assert index.delete_repo("a/a") == 0
+
+        [hit] = VectorIndex(tmp_path).search(vectors[0], k=1)
+        assert (hit.repo_name, hit.locations) == ("b/b", [("b/b", "util.py")])
+        assert index.delete_file("b/b", "util.py") == 2
+        assert len(index) == 0
+
+    def test_filter_matches_through_copies(self, index):
+        vectors = random_vectors(3)
+        index.add(make_chunks(2, "a/a", "util.py", blob_sha="same"), vectors[:2])
+        index.add(make_chunks(2, "b/b", "util.py", blob_sha="same"), vectors[:2])
+        index.add(make_chunks(1, "c/c", "main.py"), vectors[2:])
+
+        mask = DocFilter(repo_name="b/b").mask(
+            index.row_metadata(), index.strings, index.locations
+        )
+
+        assert mask.tolist() == [True, True, False]
+
+
+class TestIvfSearch:
+    def test_recall_against_exact(self, index):
+        vectors = random_vectors(400)
+        index.add(make_chunks(400), vectors)
+        index.build_ivf(n_lists=8)
+        queries = random_vectors(20, seed=2)
+
+        approx = index.search_batch(queries, k=10, n_probe=4)
+        exact = index.search_batch(queries, k=10, exact=True)
+
+        overlap = [
+            len({h.row for h in a} & {h.row for h in e}) / 10
+            for a, e in zip(approx, exact)
+        ]
+        assert index.has_ivf
+        assert np.mean(overlap) >= 0.6
+
+    def test_all_probes_equals_exact(self, index):
+        vectors = random_vectors(100)
+        index.add(make_chunks(100), vectors)
+        index.build_ivf(n_lists=5)
+
+        approx = index.search(vectors[9], k=5, n_probe=5)
+        exact = index.search(vectors[9], k=5, exact=True)
+
+        assert [h.row for h in approx] == [h.row for h in exact]
+
+    def test_rows_added_after_build_are_searched(self, index):
+        vectors = random_vectors(60)
+        index.add(make_chunks(50), vectors[:50])
+        index.build_ivf(n_lists=4)
+        index.add(make_chunks(10, path="new.py"), vectors[50:])
+
+        hits = index.search(vectors[55], k=1, n_probe=1)
+
+        assert hits[0].row == 55
+        assert hits[0].path == "new.py"
+
+    def test_ivf_survives_reopen(self, tmp_path):
+        vectors = random_vectors(50)
+        index = VectorIndex(tmp_path, dim=16)
+        index.add(make_chunks(50), vectors)
+        index.build_ivf(n_lists=4)
+
+        reopened = VectorIndex(tmp_path)
+
+        assert reopened.has_ivf
+        assert reopened.search(vectors[3], k=1, n_probe=4)[0].row == 3
@@ -0,0 +1,319 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import threading
+
+import pytest
+from github import GithubException
+from unittest.mock import MagicMock, patch
+
+from src.indexing import EmbeddingStage, HashingEmbedder, LexicalIndex, VectorIndex
+from src.ingestion.cache import git_blob_sha
+from src.ingestion.chunk_cache import ChunkCache
+from src.ingestion.chunker import Chunker
+from src.ingestion.github_client import GitHubClient
+from src.ingestion.models import RepoMetadata
+from src.ingestion.repo_crawler import RepoCrawler
+from src.service.webhook import PushEvent, PushIndexer, WebhookServer
+from tests.test_repo_crawler import make_blob, make_element, make_tree
+
+
+def push_payload(before, after, commits, ref="refs/heads/main", **extra):
+    # Trimmed to the fields of a GitHub push delivery the receiver reads
+    return {
+        "ref": ref,
+        "before": before,
+        "after": after,
+        "created": False,
+        "deleted": False,
+        "forced": False,
+        "repository": {"full_name": "owner/repo", "default_branch": "main"},
+        "commits": [
+            {
+                "id": f"commit-{i}",
+                "timestamp": "2024-05-01T12:00:00Z",
+                "added": commit.get("added", []),
+                "modified": commit.get("modified", []),
+                "removed": commit.get("removed", []),
+            }
+            for i, commit in enumerate(commits)
+        ],
+        **extra,
+    }
+
+
+def post(port, payload, event="push", secret=None):
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"X-GitHub-Event": event, "Content-Type": "application/json"}
+    if secret:
+        digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Hub-Signature-256"] = f"sha256={digest}"
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("POST", "/webhook", body=body, headers=headers)
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+
+def serve(server, *payloads, **kwargs):
+    # Posts the payloads one after the other, then waits for the updates
+    async def run():
+        await server.start()
+        try:
+            loop = asyncio.get_running_loop()
+            responses = [
+                await loop.run_in_executor(None, lambda: post(server.port, p, **kwargs))
+                for p in payloads
+            ]
+            await server.drain()
+            return responses
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+class TestPushEvent:
+    def test_parse(self):
+        event = PushEvent.parse(
+            push_payload(
+                "c1",
+                "c2",
+                [{"added": ["new.py"], "modified": ["a.py"]}, {"removed": ["new.py"]}],
+            )
+        )
+
+        assert (event.repo_name, event.before, event.after) == ("owner/repo", "c1", "c2")
+        assert event.paths == {"new.py", "a.py"}
+        assert set(event.modified) == {"a.py"}
+        assert event.complete
+
+    def test_other_branches_and_deletions_ignored(self):
+        assert PushEvent.parse(push_payload("c1", "c2", [], ref="refs/heads/feature")) is None
+        assert PushEvent.parse(push_payload("c1", "0" * 40, [], deleted=True)) is None
+
+    def test_force_push_is_incomplete(self):
+        assert not PushEvent.parse(push_payload("c1", "c2", [], forced=True)).complete
+
+    def test_merge_detects_gaps(self):
+        first = PushEvent.parse(push_payload("c1", "c2", [{"modified": ["a.py"]}]))
+        second = PushEvent.parse(push_payload("c2", "c3", [{"modified": ["b.py"]}]))
+        skipped = PushEvent.parse(push_payload("c4", "c5", [{"modified": ["c.py"]}]))
+
+        merged = first.merge(second)
+        assert (merged.before, merged.after, merged.pushes) == ("c1", "c3", 2)
+        assert merged.paths == {"a.py", "b.py"} and merged.complete
+        assert not merged.merge(skipped).complete
+
+    def test_malformed(self):
+        with pytest.raises(ValueError, match="Malformed push payload"):
+            PushEvent.parse({"ref": "refs/heads/main"})
+
+
+class TestWebhookServer:
+    def test_bursts_coalesced_per_repo(self):
+        indexer = MagicMock()
+        indexer.apply.return_value = "applied"
+        server = WebhookServer(indexer, port=0, coalesce_seconds=0.5)
+
+        responses = serve(
+            server,
+            push_payload("c1", "c2", [{"modified": ["a.py"]}]),
+            push_payload("c2", "c3", [{"added": ["b.py"]}]),
+            push_payload("c3", "c4", [{"removed": ["a.py"]}]),
+            push_payload("c4", "c5", [], ref="refs/tags/v1"),
+        )
+
+        assert [status for status, _ in responses] == [202, 202, 202, 200]
+        assert [body["status"] for _, body in responses] == [
+            "queued",
+            "coalesced",
+            "coalesced",
+            "ignored",
+        ]
+        (event,), _ = indexer.apply.call_args
+        assert (event.before, event.after, event.pushes) == ("c1", "c4", 3)
+        assert event.paths == {"a.py", "b.py"} and event.complete
+        assert server.stats() == {
+            "pending": [],
+            "queued": 1,
+            "coalesced": 2,
+            "ignored": 1,
+            "applied": 1,
+        }
+
+    def test_signature_required_with_secret(self):
+        indexer = MagicMock()
+        indexer.apply.return_value = "applied"
+        payload = push_payload("c1", "c2", [{"modified": ["a.py"]}])
+
+        unsigned = serve(WebhookServer(indexer, port=0, secret="s3cret"), payload)
+        wrong = serve(WebhookServer(indexer, port=0, secret="other"), payload, secret="s3cret")
+        signed = serve(
+            WebhookServer(indexer, port=0, secret="s3cret", coalesce_seconds=0),
+            payload,
+            secret="s3cret",
+        )
+
+        assert unsigned[0][0] == wrong[0][0] == 401
+        assert signed[0][0] == 202
+        assert indexer.apply.call_count == 1
+
+    def test_ping(self):
+        assert serve(WebhookServer(MagicMock(), port=0), {"zen": "hi"}, event="ping") == [
+            (200, {"status": "pong"})
+        ]
+
+
+def make_content_file(path, text):
+    content_file = MagicMock(type="file", encoding="base64", size=len(text))
+    content_file.path = path
+    content_file.sha = git_blob_sha(text.encode("utf-8"))
+    content_file.content = base64.b64encode(text.encode("utf-8")).decode("ascii")
+    return content_file
+
+
+class TestPushIndexer:
+    @pytest.fixture
+    @patch("src.ingestion.github_client.Github")
+    @patch("src.ingestion.github_client.Auth")
+    def client(self, mock_auth, mock_github):
+        mock_github.return_value.get_user.return_value = MagicMock()
+        client = GitHubClient(token="test-token")
+        client.get_repo_metadata = MagicMock(
+            return_value=RepoMetadata(
+                name="repo",
+                full_name="owner/repo",
+                url="https://github.com/owner/repo",
+                private=False,
+            )
+        )
+        return client
+
+    @pytest.fixture
+    def repo(self, client):
+        # Head c1 on the tree listing, c2 through the contents API
+        repo = MagicMock(full_name="owner/repo", default_branch="main")
+        repo.html_url = "https://github.com/owner/repo"
+        repo.get_branch.return_value.commit.sha = "c1"
+        c1 = {"a.py": "def alpha():\n    return 1\n", "b.py": "def beta():\n    return 2\n"}
+        repo.get_git_tree.return_value = make_tree(
+            [
+                make_element(path, sha=git_blob_sha(text.encode("utf-8")))
+                for path, text in c1.items()
+            ]
+        )
+        blobs = {git_blob_sha(text.encode("utf-8")): text for text in c1.values()}
+        repo.get_git_blob.side_effect = lambda sha: make_blob(blobs[sha])
+
+        c2 = {
+            "a.py": "def alpha_changed():\n    return 10\n",
+            "c.py": "def gamma():\n    return 3\n",
+        }
+
+        def get_contents(path, ref):
+            assert ref == "c2"
+            if path not in c2:
+                raise GithubException(404, {"message": "Not Found"}, None)
+            return make_content_file(path, c2[path])
+
+        repo.get_contents.side_effect = get_contents
+        client.get_repo = MagicMock(return_value=repo)
+        return repo
+
+    @pytest.fixture
+    def indexer(self, client, repo, tmp_path):
+        crawler = RepoCrawler(
+            client=client, cache_dir=tmp_path / "repos", resolve_last_modified=False
+        )
+        embedding_stage = EmbeddingStage(HashingEmbedder(dim=32))
+        return PushIndexer(
+            crawler,
+            Chunker(),
+            ChunkCache(tmp_path / "chunks"),
+            embedding_stage,
+            VectorIndex(tmp_path / "vectors", dim=32),
+            LexicalIndex(tmp_path / "lexical"),
+            checkpoint_dir=tmp_path / "checkpoints",
+        )
+
+    def indexed(self, indexer):
+        return sorted(hit.path for hit in indexer.lexical_index.search("return", k=100))
+
+    def test_push_updates_only_changed_paths(self, indexer, repo):
+        # Unknown starting point: the repo is crawled in full
+        first = PushEvent.parse(push_payload("c0", "c1", [{"added": ["a.py", "b.py"]}]))
+        assert indexer.apply(first) == "resynced"
+        assert self.indexed(indexer) == ["a.py", "b.py"]
+
+        server = WebhookServer(indexer, port=0, coalesce_seconds=0)
+        responses = serve(
+            server,
+            push_payload(
+                "c1", "c2", [{"modified": ["a.py"], "removed": ["b.py"], "added": ["c.py"]}]
+            ),
+        )
+
+        assert responses[0][0] == 202
+        assert server.stats()["applied"] == 1
+        repo.get_git_tree.assert_called_once()
+        assert sorted(c.args[0] for c in repo.get_contents.call_args_list) == [
+            "a.py",
+            "b.py",
+            "c.py",
+        ]
+        assert self.indexed(indexer) == ["a.py", "c.py"]
+        assert [hit.path for hit in indexer.lexical_index.search("alpha_changed", k=5)] == ["a.py"]
+        assert not indexer.lexical_index.search("beta", k=5)
+        assert len(indexer.vector_index) == len(indexer.lexical_index)
+
+        cache = indexer.crawler._cache
+        assert indexer.crawler.cached_commit("owner/repo") == "c2"
+        assert cache.load_file("owner/repo", "b.py") is None
+        assert cache.load_file("owner/repo", "c.py").content.startswith("def gamma")
+
+    def test_push_from_unknown_commit_recrawls(self, indexer, repo):
+        indexer.apply(PushEvent.parse(push_payload("c0", "c1", [])))
+
+        skipped_ahead = PushEvent.parse(push_payload("c5", "c6", [{"modified": ["a.py"]}]))
+        assert indexer.apply(skipped_ahead) == "resynced"
+
+        repo.get_contents.assert_not_called()
+        assert self.indexed(indexer) == ["a.py", "b.py"]
+
+    def test_recrawl_does_not_block_other_repos(self, indexer, repo, client):
+        indexer.apply(PushEvent.parse(push_payload("c0", "c1", [])))
+        slow = MagicMock(full_name="owner/slow", default_branch="main")
+        client.get_repo = MagicMock(
+            side_effect=lambda name: slow if name == "owner/slow" else repo
+        )
+        started, release = threading.Event(), threading.Event()
+        iter_repo = indexer.crawler.iter_repo
+
+        def crawl(target):
+            if target is slow:
+                started.set()
+                release.wait(10)
+                return iter([])
+            return iter_repo(target)
+
+        indexer.crawler.iter_repo = crawl
+        slow_event = PushEvent(repo_name="owner/slow", before="x", after="y", complete=False)
+        recrawl = threading.Thread(target=indexer.apply, args=(slow_event,))
+        recrawl.start()
+        assert started.wait(5)
+
+        push = PushEvent.parse(push_payload("c1", "c2", [{"modified": ["a.py"]}]))
+        update = threading.Thread(target=indexer.apply, args=(push,))
+        update.start()
+        update.join(5)
+        blocked = update.is_alive()
+        release.set()
+        recrawl.join(5)
+
+        assert not blocked
+        assert [hit.path for hit in indexer.lexical_index.search("alpha_changed", k=5)] == ["a.py"]